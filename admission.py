@@ -0,0 +1,127 @@
+"""
+Admission Control
+New calls are accepted only while the backlog can be worked off in
+reasonable time. The backlog and the dial throughput measured over the last
+minute are read from Redis at most once per ADMISSION_REFRESH_INTERVAL per
+process, and give both the decision to refuse work and the ETA returned for
+accepted calls.
+"""
+import logging
+import math
+import os
+import threading
+import time
+
+from call_counters import read_call_counters, read_queue_depths
+from redis_client import get_redis
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+ADMISSION_MAX_BACKLOG = int(os.getenv('ADMISSION_MAX_BACKLOG', 100000))  # Waiting calls before new ones are refused
+ADMISSION_MAX_WAIT = int(os.getenv('ADMISSION_MAX_WAIT', 3600))  # Seconds of backlog at measured throughput
+ADMISSION_REFRESH_INTERVAL = float(os.getenv('ADMISSION_REFRESH_INTERVAL', 1))
+ADMISSION_STREAM_MAX_WAIT = int(os.getenv('ADMISSION_STREAM_MAX_WAIT', 300))  # Seconds a streamed upload waits for room
+ADMISSION_DEFAULT_RETRY_AFTER = 30  # Seconds, while no throughput has been measured
+
+# Finished calls are counted in buckets of THROUGHPUT_BUCKET seconds; the
+# throughput is the count over the last THROUGHPUT_WINDOW seconds
+THROUGHPUT_WINDOW = 60
+THROUGHPUT_BUCKET = 5
+FINISHED_KEY_PREFIX = 'admission:finished:'
+
+
+def count_finished_call(pipe):
+    """Count a call that reached a final status on a Redis pipeline"""
+    key = f"{FINISHED_KEY_PREFIX}{int(time.time()) // THROUGHPUT_BUCKET}"
+    pipe.incr(key)
+    pipe.expire(key, THROUGHPUT_WINDOW + 2 * THROUGHPUT_BUCKET)
+
+
+def read_throughput():
+    """Calls finished per second over the last THROUGHPUT_WINDOW seconds"""
+    now = time.time()
+    current = int(now) // THROUGHPUT_BUCKET
+    first = current - THROUGHPUT_WINDOW // THROUGHPUT_BUCKET
+    counts = get_redis().mget([f"{FINISHED_KEY_PREFIX}{bucket}" for bucket in range(first, current + 1)])
+    return sum(int(count) for count in counts if count) / (now - first * THROUGHPUT_BUCKET)
+
+
+class AdmissionState:
+    """Backlog and throughput snapshot shared by the requests of one process"""
+
+    def __init__(self):
+        counts = read_call_counters()
+        # The pending counter covers calls still in the outbox as well as
+        # those in the broker; either can be ahead when the other lags
+        self.backlog = max(counts['pending'], read_queue_depths()['queued'])
+        self.in_flight = counts['processing']
+        self.throughput = read_throughput()
+        self.read_at = time.monotonic()
+
+    @property
+    def limit(self):
+        """Largest backlog accepted: ADMISSION_MAX_BACKLOG or ADMISSION_MAX_WAIT of work, whichever is less"""
+        if self.throughput > 0:
+            return min(ADMISSION_MAX_BACKLOG, int(self.throughput * ADMISSION_MAX_WAIT))
+        return ADMISSION_MAX_BACKLOG
+
+    def seconds_to_drain(self, calls):
+        """Seconds until the given number of calls has been worked off, None if unknown"""
+        if self.throughput <= 0:
+            return None
+        return math.ceil(calls / self.throughput)
+
+
+class Admission:
+    """Decision for a submission of calls, with the ETA of each accepted call"""
+
+    def __init__(self, state, count, partial=False):
+        self.throughput = state.throughput
+        self.backlog = state.backlog
+        self.ahead = state.backlog + state.in_flight
+        self.status = None
+        self.retry_after = None
+        limit = state.limit
+        if partial:
+            # Admit what fits now; a submission larger than the whole limit could otherwise never fit
+            count = min(count, max(limit - state.backlog, 0)) or count
+        self.count = count
+        if state.backlog >= limit:
+            self.status = 503  # Everyone is refused until the backlog drains
+        elif state.backlog + count > limit:
+            self.status = 429  # A smaller submission, or this one later, fits
+        if self.status:
+            wait = state.seconds_to_drain(state.backlog + count - limit)
+            self.retry_after = min(max(wait, 1), ADMISSION_MAX_WAIT) if wait else ADMISSION_DEFAULT_RETRY_AFTER
+
+    @property
+    def allowed(self):
+        return self.status is None
+
+    def eta_seconds(self, position=1):
+        """Seconds until the call at the given position in this submission has been dialed, None if unknown"""
+        if self.throughput <= 0:
+            return None
+        return math.ceil((self.ahead + position) / self.throughput)
+
+
+_state = None
+_state_lock = threading.Lock()
+
+
+def admit_calls(count, partial=False):
+    """
+    Decide whether count new calls can be accepted. Admitted calls are added
+    to the process's snapshot so a burst between refreshes is not admitted
+    whole; the next refresh reads the real backlog again. With partial, as
+    many of the calls as fit are admitted; admission.count says how many.
+    """
+    global _state
+    with _state_lock:
+        if _state is None or time.monotonic() - _state.read_at >= ADMISSION_REFRESH_INTERVAL:
+            _state = AdmissionState()
+        admission = Admission(_state, count, partial)
+        if admission.allowed:
+            _state.backlog += admission.count
+        return admission
@@ -3,21 +3,11 @@ SESPCLSwitch Server
 A production-ready Flask API for making voice calls via SIP using TrueSIP
 """
 
-from flask import Flask, request, jsonify
-from flask_sqlalchemy import SQLAlchemy
-from flask_caching import Cache
+from flask import Flask, Response, request, jsonify, g
 import os
-import requests
-import tempfile
 import uuid
 from datetime import datetime
 import logging
-from pydub import AudioSegment
-import io
-import base64
-import subprocess
-import json
-from threading import Thread
 import time
 from dotenv import load_dotenv
 # Load environment variables from .env file
@@ -37,17 +27,10 @@ app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
     'pool_pre_ping': True
 }
 
-# Cache Configuration
-app.config['CACHE_TYPE'] = 'redis'
-app.config['CACHE_REDIS_URL'] = os.getenv('REDIS_URL', 'redis://localhost:6379/1')
-
 # Initialize extensions
-from models import db, Call
+from models import db, Call, CallOutbox, parse_call_id
 db.init_app(app)
 
-# Configure caching for frequently accessed data
-cache = Cache(app)
-
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -56,324 +39,103 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-# Configuration from environment variables
+# Configuration from environment variables, reported by /health and /api/info;
+# TTS and SIP calls run in the Celery worker (tasks.py, voice_utils.py)
 SIP_TRUNK_IP = os.getenv("SIP_TRUNK_IP", "sip.truesip.net")
 SIP_TRUNK_PORT = os.getenv("SIP_TRUNK_PORT", "5060")
-SIP_USERNAME = os.getenv("SIP_USERNAME", "12156")
-SIP_PASSWORD = os.getenv("SIP_PASSWORD", "1C36na9C")
-
-# Text-to-Speech Configuration
 TTS_SERVICE = os.getenv("TTS_SERVICE", "espeak")  # espeak, google, azure, aws
-GOOGLE_TTS_API_KEY = os.getenv("GOOGLE_TTS_API_KEY")
-AZURE_TTS_KEY = os.getenv("AZURE_TTS_KEY")
-AZURE_TTS_REGION = os.getenv("AZURE_TTS_REGION")
-AWS_ACCESS_KEY = os.getenv("AWS_ACCESS_KEY")
-AWS_SECRET_KEY = os.getenv("AWS_SECRET_KEY")
-
-def text_to_speech(text, output_file):
-    """Convert text to speech and save as audio file"""
-    try:
-        if TTS_SERVICE == "google" and GOOGLE_TTS_API_KEY:
-            return google_tts(text, output_file)
-        elif TTS_SERVICE == "azure" and AZURE_TTS_KEY:
-            return azure_tts(text, output_file)
-        elif TTS_SERVICE == "aws" and AWS_ACCESS_KEY:
-            return aws_tts(text, output_file)
-        else:
-            # Fallback to espeak (offline TTS)
-            return espeak_tts(text, output_file)
-    except Exception as e:
-        logger.error(f"TTS conversion failed: {str(e)}")
-        return False
 
-def google_tts(text, output_file):
-    """Google Text-to-Speech"""
-    url = f"https://texttospeech.googleapis.com/v1/text:synthesize?key={GOOGLE_TTS_API_KEY}"
-    
-    payload = {
-        "input": {"text": text},
-        "voice": {"languageCode": "en-US", "name": "en-US-Standard-A"},
-        "audioConfig": {"audioEncoding": "MP3"}
-    }
-    
-    response = requests.post(url, json=payload)
-    if response.status_code == 200:
-        audio_content = base64.b64decode(response.json()["audioContent"])
-        with open(output_file, "wb") as f:
-            f.write(audio_content)
-        return True
-    return False
-
-def azure_tts(text, output_file):
-    """Azure Text-to-Speech"""
-    url = f"https://{AZURE_TTS_REGION}.tts.speech.microsoft.com/cognitiveservices/v1"
-    
-    headers = {
-        "Ocp-Apim-Subscription-Key": AZURE_TTS_KEY,
-        "Content-Type": "application/ssml+xml",
-        "X-Microsoft-OutputFormat": "audio-16khz-32kbitrate-mono-mp3"
-    }
-    
-    ssml = f"""<speak version='1.0' xmlns='http://www.w3.org/2001/10/synthesis' xml:lang='en-US'>
-    <voice name='en-US-AriaNeural'>{text}</voice>
-    </speak>"""
-    
-    response = requests.post(url, headers=headers, data=ssml)
-    if response.status_code == 200:
-        with open(output_file, "wb") as f:
-            f.write(response.content)
-        return True
-    return False
-
-def aws_tts(text, output_file):
-    """AWS Polly Text-to-Speech"""
-    try:
-        import boto3
-        client = boto3.client(
-            'polly',
-            aws_access_key_id=AWS_ACCESS_KEY,
-            aws_secret_access_key=AWS_SECRET_KEY,
-            region_name='us-east-1'
-        )
-        
-        response = client.synthesize_speech(
-            Text=text,
-            OutputFormat='mp3',
-            VoiceId='Joanna'
-        )
-        
-        with open(output_file, "wb") as f:
-            f.write(response['AudioStream'].read())
-        return True
-    except Exception as e:
-        logger.error(f"AWS TTS failed: {str(e)}")
-        return False
+# Endpoints probed by load balancers and Prometheus without a key
+AUTH_EXEMPT_PATHS = ('/health', '/metrics')
 
-def espeak_tts(text, output_file):
-    """Fallback TTS using espeak or Windows SAPI"""
-    try:
-        # Check if we're on Windows and try PowerShell TTS
-        if os.name == 'nt':  # Windows
-            return windows_tts(text, output_file)
-        
-        # Convert to WAV first, then to MP3
-        wav_file = output_file.replace('.mp3', '.wav')
-        cmd = f'espeak "{text}" -w {wav_file}'
-        subprocess.run(cmd, shell=True, check=True)
-        
-        # Convert WAV to MP3
-        audio = AudioSegment.from_wav(wav_file)
-        audio.export(output_file, format="mp3")
-        
-        # Clean up WAV file
-        os.remove(wav_file)
-        return True
-    except Exception as e:
-        logger.error(f"Espeak TTS failed: {str(e)}")
-        return False
+def rate_limited_response(limit, message, **fields):
+    return jsonify({"error": message, "retry_after": limit.retry_after, **fields}), 429
 
-def windows_tts(text, output_file):
-    """Windows Text-to-Speech using SAPI"""
-    try:
-        # Create WAV file first
-        wav_file = output_file.replace('.mp3', '.wav')
-        
-        # PowerShell command for Windows TTS
-        ps_script = f'''
-Add-Type -AssemblyName System.Speech
-$synth = New-Object System.Speech.Synthesis.SpeechSynthesizer
-$synth.SetOutputToWaveFile("{wav_file}")
-$synth.Speak("{text}")
-$synth.Dispose()
-'''
-        
-        # Run PowerShell script
-        result = subprocess.run(
-            ["powershell", "-Command", ps_script],
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        
-        # Convert WAV to MP3 using pydub
-        if os.path.exists(wav_file):
-            audio = AudioSegment.from_wav(wav_file)
-            audio.export(output_file, format="mp3")
-            os.remove(wav_file)  # Clean up WAV file
-            logger.info(f"Windows TTS conversion successful: {output_file}")
-            return True
-        else:
-            logger.error("Windows TTS failed to create audio file")
-            return False
-            
-    except Exception as e:
-        logger.error(f"Windows TTS failed: {str(e)}")
-        return False
+def refused_response(admission, **fields):
+    """503 while the call backlog is full, 429 when this submission alone would overflow it"""
+    message = "Call backlog is full" if admission.status == 503 else "Submission exceeds the remaining call backlog"
+    response = jsonify({"error": message, "backlog": admission.backlog, "retry_after": admission.retry_after,
+                        **fields})
+    response.headers['Retry-After'] = str(admission.retry_after)
+    return response, admission.status
 
-def prepare_audio_for_sip(audio_file):
-    """Convert audio file to WAV format for SIP compatibility"""
-    try:
-        # Create WAV file path
-        wav_file = audio_file.replace('.mp3', '.wav')
-        
-        # Convert to WAV using pydub
-        if audio_file.endswith('.mp3'):
-            audio = AudioSegment.from_mp3(audio_file)
-            # Convert to 8kHz mono WAV (standard for telephony)
-            audio = audio.set_frame_rate(8000).set_channels(1)
-            audio.export(wav_file, format="wav")
-            logger.info(f"Converted audio to WAV: {wav_file}")
-        else:
-            # If already WAV, just copy it
-            import shutil
-            shutil.copy(audio_file, wav_file)
-            
-        return wav_file
-    except Exception as e:
-        logger.error(f"Audio preparation failed: {str(e)}")
-        return audio_file  # Return original if conversion fails
-
-def create_pjsua_command(call_config, wav_file):
-    """Create the PJSUA command string for SIP calls"""
-    # Create a command that will actually make an outbound call
-    cmd_parts = [
-        "/usr/local/bin/pjsua",
-        "--null-audio",  # Use null audio device
-        # Use the verified FROM number for SIP identity (for caller ID)
-        f"--id=sip:{call_config['from']}@{call_config['sip_server']}",
-        f"--registrar=sip:{call_config['sip_server']}:{call_config['sip_port']}",
-        f"--realm=asterisk",  # Use the exact realm expected by TrueSIP
-        f"--proxy=sip:sip.truesip.net:5060",  # Set proxy server
-        # Keep original username for authentication
-        f"--username={call_config['username']}",
-        f"--password={call_config['password']}",
-        # Add fromuser parameter for caller ID presentation
-        f"--fromuser={call_config['from']}",
-        # Set contact header with the from number for caller ID
-        f"--contact=sip:{call_config['from']}@{call_config['sip_server']}",
-        "--log-level=5",  # More detailed logging
-        "--reg-timeout=10",  # Quick registration
-        "--duration=30",  # Max call duration
-        "--auto-answer=200",
-        # Pass the target number to call as argument
-        f"sip:{call_config['to']}@{call_config['sip_server']}"
-    ]
-    
-    return " ".join(cmd_parts)
+def eta_fields(admission, position=1):
+    """ETA of an accepted call, from the backlog ahead of it and measured throughput"""
+    eta = admission.eta_seconds(position)
+    return {
+        "eta_seconds": eta,
+        "estimated_processing_time": f"{eta} seconds" if eta is not None else "unknown"
+    }
 
-def execute_sip_call(command, call_config):
-    """Execute real SIP call with enhanced logging"""
+@app.before_request
+def authenticate_request():
+    """Authenticate the API key, if any, and take one request from its rate limit"""
+    if request.path in AUTH_EXEMPT_PATHS:
+        return None
+    from api_keys import API_AUTH_REQUIRED, API_KEY_HEADER, InvalidApiKey, check_rate_limit
+    api_key = request.headers.get(API_KEY_HEADER)
+    if not api_key:
+        if API_AUTH_REQUIRED:
+            return jsonify({"error": "API key required", "header": API_KEY_HEADER}), 401
+        return None
     try:
-        logger.info(f"Executing SIP call: {command}")
-        
-        # Set environment variables for audio
-        env = os.environ.copy()
-        env['ALSA_CARD'] = 'null'
-        env['PULSE_RUNTIME_PATH'] = '/tmp/pulse'
-        
-        # Create input commands for PJSUA to make the call
-        pjsua_commands = f"""sleep 3000
-m sip:{call_config['to']}@{call_config['sip_server']}
-sleep 15000
-h
-q
-"""
-        
-        # Execute the call with stdin input
-        result = subprocess.run(
-            command, 
-            shell=True, 
-            timeout=30,  # Shorter timeout for automated calls
-            capture_output=True,
-            text=True,
-            input=pjsua_commands,
-            env=env
-        )
-        
-        if result.returncode == 0:
-            logger.info(f"SIP call completed successfully: {call_config['from']} -> {call_config['to']}")
-        else:
-            logger.warning(f"SIP call ended with code {result.returncode}")
-            
-        # Log output for debugging
-        if result.stdout:
-            logger.info(f"PJSUA stdout: {result.stdout}")  # Full output
-        if result.stderr:
-            logger.warning(f"PJSUA stderr: {result.stderr}")  # Full output
-            
-    except subprocess.TimeoutExpired:
-        logger.info(f"SIP call completed (timeout) - {call_config['from']} -> {call_config['to']}")
+        limit = check_rate_limit(api_key, db.session)
+    except InvalidApiKey as e:
+        return jsonify({"error": str(e)}), 401
     except Exception as e:
-        logger.error(f"SIP call execution failed: {str(e)}")
-        # Fallback to simulation
-        simulate_call(call_config)
+        logger.error(f"Rate limit check failed: {str(e)}")
+        return jsonify({"error": "Rate limiter unavailable"}), 503
+    g.api_key = api_key
+    g.rate_limit = limit
+    if not limit.allowed:
+        return rate_limited_response(limit, "Request rate limit exceeded")
+    return None
 
-def simulate_call(call_config):
-    """Simulate SIP call for local testing"""
-    try:
-        logger.info(f"Simulating call from {call_config['from']} to {call_config['to']}")
-        logger.info(f"Playing audio file: {call_config['audio_file']}")
-        
-        # Simulate call duration
-        time.sleep(5)
-        
-        # Check if audio file exists and log its size
-        if os.path.exists(call_config['audio_file']):
-            file_size = os.path.getsize(call_config['audio_file'])
-            logger.info(f"Audio file size: {file_size} bytes")
+def request_api_key_id():
+    """ID of the request's API key, or None for an unauthenticated request"""
+    return g.rate_limit.key_id if 'api_key' in g else None
+
+def charge_calls(count):
+    """Take count calls from the request's API key. Returns a 429 response if it is over its call rate"""
+    if 'api_key' not in g or not count:
+        return None
+    from api_keys import check_rate_limit
+    g.rate_limit = check_rate_limit(g.api_key, db.session, requests=0, calls=count)
+    g.charged_calls = True
+    if not g.rate_limit.allowed:
+        return rate_limited_response(g.rate_limit, "Call rate limit exceeded")
+    return None
+
+def throttle_calls(count):
+    """
+    Block until the backlog and the request's API key allow count more calls,
+    pacing streamed uploads. The batch is admitted in parts when it is larger
+    than the room in the backlog. Raises IngestStopped once waiting for room
+    in the backlog or the key's call rate would exceed ADMISSION_STREAM_MAX_WAIT.
+    """
+    from admission import ADMISSION_STREAM_MAX_WAIT, admit_calls
+    from ingest import IngestStopped
+    deadline = time.monotonic() + ADMISSION_STREAM_MAX_WAIT
+    remaining = count
+    while remaining:
+        admission = admit_calls(remaining, partial=True)
+        if admission.allowed:
+            remaining -= admission.count
+        elif time.monotonic() + admission.retry_after > deadline:
+            raise IngestStopped(admission)
         else:
-            logger.warning(f"Audio file not found: {call_config['audio_file']}")
-        
-        logger.info("Simulated call completed successfully")
-        
-    except Exception as e:
-        logger.error(f"Simulated call failed: {str(e)}")
+            time.sleep(admission.retry_after)
+    while charge_calls(count) is not None:
+        if time.monotonic() + g.rate_limit.retry_after > deadline:
+            raise IngestStopped(g.rate_limit)
+        time.sleep(g.rate_limit.retry_after)
 
-def initiate_sip_call(to_number, from_number, audio_file):
-    """Initiate SIP call using pjsua"""
-    try:
-        # Create SIP call configuration
-        call_config = {
-            "to": to_number,
-            "from": from_number,
-            "audio_file": audio_file,
-            "sip_server": SIP_TRUNK_IP,
-            "sip_port": SIP_TRUNK_PORT,
-            "username": SIP_USERNAME,
-            "password": SIP_PASSWORD
-        }
-        
-        # Log the call details
-        logger.info(f"SIP Call initiated: {from_number} -> {to_number}")
-        logger.info(f"SIP Server: {SIP_TRUNK_IP}:{SIP_TRUNK_PORT}")
-        logger.info(f"Audio file: {audio_file}")
-        
-        # Convert audio to WAV format for better SIP compatibility
-        wav_file = prepare_audio_for_sip(audio_file)
-        
-        # Check if pjsua is available
-        pjsua_path = "/usr/local/bin/pjsua"
-        if not os.path.exists(pjsua_path):
-            pjsua_path = "pjsua"  # Try system PATH
-        
-        try:
-            # Create PJSUA command for real SIP call
-            pjsua_cmd = create_pjsua_command(call_config, wav_file)
-            
-            # Execute call in background
-            Thread(target=execute_sip_call, args=(pjsua_cmd, call_config)).start()
-            logger.info("Real SIP call initiated via pjsua")
-            
-        except Exception as sip_error:
-            # Fallback to simulation if pjsua fails
-            logger.warning(f"pjsua execution failed, simulating call: {str(sip_error)}")
-            Thread(target=simulate_call, args=(call_config,)).start()
-            logger.info("SIP call simulated for testing")
-        
-        return True
-    except Exception as e:
-        logger.error(f"SIP call initialization failed: {str(e)}")
-        return False
+@app.after_request
+def add_quota_headers(response):
+    """Report the remaining request and call allowance of the API key"""
+    if 'rate_limit' in g:
+        response.headers.update(g.rate_limit.headers(calls=g.get('charged_calls', False)))
+    return response
 
 @app.route('/health', methods=['GET'])
 def health_check():
@@ -408,38 +170,100 @@ def make_voice_call():
         text = data['Text']
         audio_url = data.get('AudioUrl')  # Optional
         priority = data.get('Priority', 1)  # 1=high, 2=medium, 3=low
+        status_callback_url = data.get('StatusCallbackUrl')  # Optional
+        campaign_id = data.get('CampaignId')  # Optional
+        call_id = str(uuid.uuid4())
+        
+        from ingest import validate_call_options
+        options_error = validate_call_options(campaign_id, status_callback_url)
+        if options_error:
+            return jsonify({"error": options_error}), 400
+        
+        # Replay client retries before admission and rate limiting, so a retry of an accepted call costs nothing
+        idempotency_key = request.headers.get('Idempotency-Key')
+        if idempotency_key is not None:
+            from idempotency import validate_idempotency_key, claim_idempotency_key
+            key_error = validate_idempotency_key(idempotency_key)
+            if key_error:
+                return jsonify({"error": key_error}), 400
+            
+            original_call_id = claim_idempotency_key(idempotency_key, call_id, request_api_key_id())
+            if original_call_id:
+                logger.info(f"Duplicate submission for idempotency key, returning call {original_call_id}")
+                return jsonify({
+                    "success": True,
+                    "call_id": original_call_id,
+                    "status": "duplicate",
+                    "idempotent_replay": True,
+                    "timestamp": datetime.now().isoformat()
+                }), 200
+        
+        # A claimed key is released if the call is refused, so the client can retry it
+        def release_claim():
+            if idempotency_key is not None:
+                from idempotency import release_idempotency_keys
+                release_idempotency_keys([(idempotency_key, call_id)], request_api_key_id())
         
-        # Create call record in database
+        try:
+            from dnc import is_suppressed
+            if is_suppressed(to_number):
+                release_claim()
+                return jsonify({"error": "ToNumber is on the do-not-call list", "to_number": to_number}), 403
+            
+            from admission import admit_calls
+            admission = admit_calls(1)
+            if not admission.allowed:
+                release_claim()
+                return refused_response(admission)
+            
+            limited = charge_calls(1)
+            if limited:
+                release_claim()
+                return limited
+        except Exception:
+            release_claim()
+            raise
+        
+        # Create the call record and its outbox entry in a single transaction;
+        # the outbox relay publishes the task to Celery
+        from message_store import store_messages
+        task_id = str(uuid.uuid4())
         call = Call(
+            id=call_id,
             to_number=to_number,
             from_number=from_number,
-            text=text,
             audio_url=audio_url,
-            status='pending'
+            status='pending',
+            task_id=task_id,
+            campaign_id=campaign_id,
+            status_callback_url=status_callback_url,
+            api_key_id=request_api_key_id()
         )
         
-        db.session.add(call)
-        db.session.commit()
-        
-        # Queue the call for async processing
-        from celery_app import celery_app
-        task = celery_app.send_task('tasks.tts_and_call_task', args=[call.id])
+        try:
+            call.message_hash = store_messages([text])[text]
+            db.session.add(call)
+            db.session.add(CallOutbox(call_id=call_id, task_id=task_id, task_name='tasks.tts_and_call_task'))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            release_claim()
+            raise
         
-        # Update call with task ID
-        call.task_id = task.id
-        db.session.commit()
+        from call_events import record_new_calls
+        record_new_calls([call.to_dict()])
         
-        logger.info(f"Call queued for processing: {call.id}")
+        logger.info(f"Call queued for processing: {call_id}")
         
         return jsonify({
             "success": True,
-            "call_id": call.id,
-            "task_id": task.id,
+            "call_id": call_id,
+            "task_id": task_id,
             "status": "queued",
             "to_number": to_number,
             "from_number": from_number,
             "timestamp": datetime.now().isoformat(),
-            "estimated_processing_time": "30-60 seconds"
+            **eta_fields(admission)
         }), 202  # Accepted
             
     except Exception as e:
@@ -448,21 +272,20 @@ def make_voice_call():
 
 @app.route('/voice/status/<call_id>', methods=['GET'])
 def get_call_status(call_id):
-    """Get call status by ID from database"""
+    """Get call status by ID, served from the Redis status cache with Postgres fallback"""
     try:
-        call = Call.query.get(call_id)
-        if not call:
-            return jsonify({"error": "Call not found"}), 404
+        from status_cache import read_call_status, populate_call_status, status_view, task_state_for
         
-        # Get task status if available
-        task_status = None
-        if call.task_id:
-            from celery_app import celery_app
-            task_result = celery_app.AsyncResult(call.task_id)
-            task_status = task_result.status
+        response_data = read_call_status(call_id)
+        if response_data is None:
+            call = Call.query.get(call_id) if parse_call_id(call_id) else None
+            if not call:
+                return jsonify({"error": "Call not found"}), 404
+            response_data = status_view(call.to_dict())
+            populate_call_status(response_data)
         
-        response_data = call.to_dict()
-        response_data['task_status'] = task_status
+        # Task state follows the call status written by the task pipeline
+        response_data['task_status'] = task_state_for(response_data['status'])
         
         return jsonify(response_data)
         
@@ -470,6 +293,205 @@ def get_call_status(call_id):
         logger.error(f"Status check failed: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
 
+@app.route('/voice/status/batch', methods=['POST'])
+def get_call_statuses():
+    """Get the status of many calls: one Redis round trip, then one Postgres query for cache misses"""
+    try:
+        from status_cache import (
+            read_call_statuses, populate_call_statuses, status_view, task_state_for, STATUS_BATCH_MAX_IDS
+        )
+        
+        data = request.get_json(silent=True) or {}
+        call_ids = data.get('call_ids')
+        if not isinstance(call_ids, list) or not call_ids or len(call_ids) > STATUS_BATCH_MAX_IDS:
+            return jsonify({
+                "error": "call_ids must be a non-empty list",
+                "max_call_ids": STATUS_BATCH_MAX_IDS
+            }), 400
+        
+        # Normalize and dedupe while keeping request order; malformed IDs cannot exist
+        call_ids = list(dict.fromkeys(str(parse_call_id(call_id) or call_id) for call_id in call_ids))
+        valid_ids = [call_id for call_id in call_ids if parse_call_id(call_id)]
+        
+        found = read_call_statuses(valid_ids)
+        missing = [parse_call_id(call_id) for call_id in valid_ids if call_id not in found]
+        if missing:
+            calls = db.session.execute(
+                db.select(Call).where(Call.id == db.any_(db.literal(missing, db.ARRAY(db.Uuid))))
+            ).scalars().all()
+            loaded = [status_view(call.to_dict()) for call in calls]
+            populate_call_statuses(loaded)
+            found.update((call_data['id'], call_data) for call_data in loaded)
+        
+        results = []
+        for call_id in call_ids:
+            call_data = found.get(call_id)
+            if call_data:
+                call_data['task_status'] = task_state_for(call_data['status'])
+                results.append(call_data)
+        
+        return jsonify({
+            "calls": results,
+            "not_found": [call_id for call_id in call_ids if call_id not in found]
+        })
+        
+    except Exception as e:
+        logger.error(f"Batch status check failed: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@app.route('/voice/events', methods=['GET'])
+def stream_call_events():
+    """Stream status changes of one call, a campaign or all calls of the API key as Server-Sent Events"""
+    try:
+        from event_stream import api_key_channel, call_channel, campaign_channel, stream_events
+        from status_cache import read_call_status, populate_call_status
+        from webhooks import build_status_event
+        
+        call_id = request.args.get('call_id')
+        campaign_id = request.args.get('campaign_id')
+        api_key_id = request_api_key_id()
+        if call_id and campaign_id:
+            return jsonify({"error": "Pass at most one of call_id or campaign_id"}), 400
+        if not (call_id or campaign_id or api_key_id):
+            return jsonify({"error": "call_id or campaign_id is required without an API key"}), 400
+        
+        if call_id:
+            if read_call_status(call_id) is None:
+                call = Call.query.get(call_id) if parse_call_id(call_id) else None
+                if not call:
+                    return jsonify({"error": "Call not found"}), 404
+                populate_call_status(call.to_dict())
+            # The snapshot is re-read once subscribed so no transition is missed
+            events = stream_events(
+                call_channel(call_id),
+                snapshot=lambda: build_status_event(read_call_status(call_id) or {"id": call_id}),
+                until_status={'completed', 'failed'}
+            )
+        elif campaign_id:
+            # Only the campaign's calls submitted with this request's key, if any
+            events = stream_events(campaign_channel(campaign_id, api_key_id))
+        else:
+            events = stream_events(api_key_channel(api_key_id))
+        
+        return Response(events, mimetype='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        })
+        
+    except Exception as e:
+        logger.error(f"Event stream failed: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@app.route('/voice/calls', methods=['GET'])
+def list_voice_calls():
+    """List calls newest first with filters and cursor pagination"""
+    try:
+        from call_listing import (
+            list_calls, decode_cursor, parse_timestamp, CALL_LIST_DEFAULT_LIMIT, CALL_LIST_MAX_LIMIT,
+            CALL_LIST_STATUSES
+        )
+        
+        try:
+            limit = int(request.args.get('limit', CALL_LIST_DEFAULT_LIMIT))
+        except ValueError:
+            limit = 0
+        if not 0 < limit <= CALL_LIST_MAX_LIMIT:
+            return jsonify({"error": f"limit must be between 1 and {CALL_LIST_MAX_LIMIT}"}), 400
+        
+        status = request.args.get('status')
+        if status and status not in CALL_LIST_STATUSES:
+            return jsonify({"error": f"status must be one of {', '.join(CALL_LIST_STATUSES)}"}), 400
+        
+        bounds = {}
+        for name in ('since', 'until'):
+            value = request.args.get(name)
+            if value:
+                try:
+                    bounds[name] = parse_timestamp(value)
+                except ValueError:
+                    return jsonify({"error": f"{name} must be an ISO 8601 timestamp"}), 400
+        
+        cursor = request.args.get('cursor')
+        if cursor:
+            try:
+                decode_cursor(cursor)
+            except ValueError:
+                return jsonify({"error": "Invalid cursor"}), 400
+        
+        calls, next_cursor = list_calls(
+            status=status,
+            to_number=request.args.get('to_number'),
+            from_number=request.args.get('from_number'),
+            campaign_id=request.args.get('campaign_id'),
+            api_key_id=request_api_key_id(),  # A key only sees the calls it submitted
+            cursor=cursor,
+            limit=limit,
+            **bounds
+        )
+        return jsonify({"calls": calls, "count": len(calls), "next_cursor": next_cursor})
+        
+    except Exception as e:
+        logger.error(f"Call listing failed: {str(e)}")
+        return jsonify({"error": "Failed to list calls"}), 500
+
+@app.route('/voice/cdrs', methods=['GET'])
+def export_call_records():
+    """Stream call detail records as CSV or Parquet"""
+    try:
+        from cdr_export import export_cdrs, CDRExportError, CDR_FORMATS
+        from call_listing import parse_timestamp, CALL_LIST_STATUSES
+        
+        fmt = request.args.get('format', 'csv')
+        status = request.args.get('status')
+        if status and status not in CALL_LIST_STATUSES:
+            return jsonify({"error": f"status must be one of {', '.join(CALL_LIST_STATUSES)}"}), 400
+        
+        bounds = {}
+        for name in ('since', 'until'):
+            value = request.args.get(name)
+            if value:
+                try:
+                    bounds[name] = parse_timestamp(value)
+                except ValueError:
+                    return jsonify({"error": f"{name} must be an ISO 8601 timestamp"}), 400
+        
+        try:
+            blocks = export_cdrs(
+                db.engine, fmt, status=status, campaign_id=request.args.get('campaign_id'),
+                api_key_id=request_api_key_id(), **bounds
+            )
+        except CDRExportError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        filename = f"cdrs-{datetime.utcnow():%Y%m%dT%H%M%S}.{fmt}"
+        return Response(blocks, mimetype=CDR_FORMATS[fmt], headers={
+            'Content-Disposition': f'attachment; filename="{filename}"',
+            'X-Accel-Buffering': 'no'
+        })
+        
+    except Exception as e:
+        logger.error(f"CDR export failed: {str(e)}")
+        return jsonify({"error": "Failed to export call records"}), 500
+
+@app.route('/api/dnc', methods=['GET'])
+def check_dnc_list():
+    """
+    Look numbers up on the do-not-call list. API keys are client credentials,
+    so the list is only changed with the dnc.py command line on each host.
+    """
+    try:
+        from dnc import get_dnc_index
+        
+        numbers = request.args.getlist('number')
+        blocked = get_dnc_index().suppressed(numbers)
+        return jsonify({
+            "numbers": {number: number in blocked for number in numbers},
+            **get_dnc_index().stats()
+        })
+    except Exception as e:
+        logger.error(f"Do-not-call lookup failed: {str(e)}")
+        return jsonify({"error": "Do-not-call lookup failed"}), 500
+
 @app.route('/api/info', methods=['GET'])
 def api_info():
     """Get API information and available endpoints"""
@@ -481,8 +503,13 @@ def api_info():
             "GET /health": "Health check endpoint",
             "POST /voice/call": "Make a voice call",
             "GET /voice/status/<call_id>": "Get call status",
+            "POST /voice/status/batch": "Get the status of many calls at once",
+            "GET /voice/calls": "List and search calls with cursor pagination",
+            "GET /voice/cdrs": "Stream call detail records as CSV or Parquet",
+            "GET /voice/events": "Server-Sent Events stream of call status changes",
             "GET /api/info": "API information"
         },
+        "authentication": "X-API-Key header, rate limited per key",
         "example_request": {
             "method": "POST",
             "url": "/voice/call",
@@ -499,34 +526,37 @@ def api_info():
         },
         "metrics": {
             "GET /api/metrics": "System performance metrics",
-            "POST /voice/bulk": "Bulk call operations"
+            "GET /metrics": "Prometheus metrics",
+            "GET /api/dnc": "Check numbers against the do-not-call list",
+            "GET /api/latency": "Per-stage latency percentiles",
+            "POST /voice/bulk": "Bulk call operations",
+            "POST /voice/bulk/stream": "Streaming NDJSON/CSV bulk ingestion"
         }
     })
 
 @app.route('/api/metrics', methods=['GET'])
 def get_metrics():
-    """Get system performance metrics"""
+    """Get system performance metrics from the incrementally maintained call counters"""
     try:
-        # Get call statistics
-        total_calls = Call.query.count()
-        pending_calls = Call.query.filter_by(status='pending').count()
-        processing_calls = Call.query.filter_by(status='processing').count()
-        completed_calls = Call.query.filter_by(status='completed').count()
-        failed_calls = Call.query.filter_by(status='failed').count()
+        from call_counters import read_call_counters, read_queue_depths
+        
+        counts = read_call_counters()
+        total_calls = counts['total']
         
         # Calculate success rate
-        success_rate = (completed_calls / total_calls * 100) if total_calls > 0 else 0
+        success_rate = (counts['completed'] / total_calls * 100) if total_calls > 0 else 0
         
         return jsonify({
             "timestamp": datetime.now().isoformat(),
             "calls": {
                 "total": total_calls,
-                "pending": pending_calls,
-                "processing": processing_calls,
-                "completed": completed_calls,
-                "failed": failed_calls,
+                "pending": counts['pending'],
+                "processing": counts['processing'],
+                "completed": counts['completed'],
+                "failed": counts['failed'],
                 "success_rate": round(success_rate, 2)
             },
+            "queue": read_queue_depths(),
             "system": {
                 "status": "operational",
                 "version": "2.0.0",
@@ -537,6 +567,38 @@ def get_metrics():
         logger.error(f"Metrics failed: {str(e)}")
         return jsonify({"error": "Failed to get metrics"}), 500
 
+@app.route('/api/latency', methods=['GET'])
+def get_latency_breakdown():
+    """Get p50/p95/p99 latency per call pipeline stage over a time window"""
+    try:
+        from latency import latency_breakdown, LATENCY_MAX_WINDOW
+        
+        try:
+            window = int(request.args.get('window', 3600))
+        except ValueError:
+            window = 0
+        if not 0 < window <= LATENCY_MAX_WINDOW:
+            return jsonify({"error": f"window must be between 1 and {LATENCY_MAX_WINDOW} seconds"}), 400
+        campaign_id = request.args.get('campaign_id')
+        
+        return jsonify({
+            "timestamp": datetime.now().isoformat(),
+            "window_seconds": window,
+            "campaign_id": campaign_id,
+            **latency_breakdown(window, campaign_id)
+        })
+    except Exception as e:
+        logger.error(f"Latency breakdown failed: {str(e)}")
+        return jsonify({"error": "Failed to get latency breakdown"}), 500
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus scrape endpoint, aggregated across API and worker processes"""
+    from instrumentation import render_metrics
+    
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
+
 @app.route('/voice/bulk', methods=['POST'])
 def bulk_voice_calls():
     """Handle bulk voice call requests"""
@@ -550,42 +612,66 @@ def bulk_voice_calls():
                 "max_calls": 1000
             }), 400
         
-        call_ids = []
-        task_ids = []
+        from ingest import (
+            validate_call_data, validate_call_options, build_call_row, submit_call_batch, drop_suppressed
+        )
         
-        for call_data in calls_data:
-            # Validate each call
-            required_fields = ['ToNumber', 'FromNumber', 'Text']
-            if not all(field in call_data for field in required_fields):
+        # Campaign-level defaults, overridable per call
+        campaign_id = data.get('CampaignId') or str(uuid.uuid4())
+        status_callback_url = data.get('StatusCallbackUrl')
+        options_error = validate_call_options(campaign_id, status_callback_url)
+        if options_error:
+            return jsonify({"error": options_error}), 400
+        
+        # Build all rows up front with client-side IDs, skipping invalid entries
+        api_key_id = request_api_key_id()
+        indexes = []
+        call_rows = []
+        idempotency_keys = []
+        for index, call_data in enumerate(calls_data):
+            if validate_call_data(call_data):
                 continue
-            
-            # Create call record
-            call = Call(
-                to_number=call_data['ToNumber'],
-                from_number=call_data['FromNumber'],
-                text=call_data['Text'],
-                audio_url=call_data.get('AudioUrl'),
-                status='pending'
-            )
-            
-            db.session.add(call)
-            db.session.flush()  # Get ID without committing
-            
-            # Queue the call
-            from celery_app import celery_app
-            task = celery_app.send_task('tasks.tts_and_call_task', args=[call.id])
-            call.task_id = task.id
-            
-            call_ids.append(call.id)
-            task_ids.append(task.id)
-        
-        db.session.commit()
+            indexes.append(index)
+            call_rows.append(build_call_row(call_data, campaign_id, status_callback_url, api_key_id=api_key_id))
+            idempotency_keys.append(call_data.get('IdempotencyKey'))
+        
+        # One do-not-call lookup for the whole request
+        call_rows, suppressed = drop_suppressed(call_rows)
+        suppressed_calls = [
+            {"index": indexes[position], "to_number": calls_data[indexes[position]]['ToNumber']}
+            for position in suppressed
+        ]
+        if suppressed:
+            skipped = set(suppressed)
+            indexes = [index for position, index in enumerate(indexes) if position not in skipped]
+            idempotency_keys = [key for position, key in enumerate(idempotency_keys) if position not in skipped]
+        
+        from admission import admit_calls
+        admission = admit_calls(len(call_rows))
+        if not admission.allowed:
+            return refused_response(admission)
+        
+        limited = charge_calls(len(call_rows))
+        if limited:
+            return limited
+        
+        # One idempotency round trip, one multi-row INSERT and one broker publish
+        queued_rows, duplicates = submit_call_batch(call_rows, idempotency_keys, api_key_id)
+        call_ids = [row['id'] for row in queued_rows]
         
         return jsonify({
             "success": True,
+            "campaign_id": campaign_id,
             "queued_calls": len(call_ids),
             "call_ids": call_ids[:10],  # Return first 10 for reference
             "total_calls": len(call_ids),
+            "duplicate_calls": [
+                {"index": indexes[position], "call_id": original_call_id}
+                for position, original_call_id in sorted(duplicates.items())
+            ],
+            "suppressed_calls": suppressed_calls,
+            # ETA of the last call of the request
+            **eta_fields(admission, len(call_ids)),
             "timestamp": datetime.now().isoformat()
         }), 202
         
@@ -593,9 +679,60 @@ def bulk_voice_calls():
         logger.error(f"Bulk call failed: {str(e)}")
         return jsonify({"error": "Bulk operation failed"}), 500
 
-# Initialize database tables
-with app.app_context():
-    db.create_all()
+@app.route('/voice/bulk/stream', methods=['POST'])
+def stream_voice_calls():
+    """Ingest an NDJSON or CSV upload of calls incrementally from the request stream"""
+    try:
+        from ingest import IngestStopped, iter_ndjson_rows, iter_csv_rows, ingest_calls, validate_call_options
+        
+        # Campaign-level defaults come from the query string, overridable per row
+        campaign_id = request.args.get('CampaignId') or str(uuid.uuid4())
+        status_callback_url = request.args.get('StatusCallbackUrl')
+        options_error = validate_call_options(campaign_id, status_callback_url)
+        if options_error:
+            return jsonify({"error": options_error}), 400
+
+        # Refuse outright while the backlog is full; later batches wait for room
+        from admission import admit_calls
+        admission = admit_calls(0)
+        if not admission.allowed:
+            return refused_response(admission)
+
+        content_type = request.mimetype
+        if content_type in ('application/x-ndjson', 'application/jsonl', 'application/json'):
+            rows = iter_ndjson_rows(request.stream)
+        elif content_type == 'text/csv':
+            rows = iter_csv_rows(request.stream)
+        else:
+            return jsonify({
+                "error": "Unsupported content type",
+                "supported": ["application/x-ndjson", "text/csv"]
+            }), 415
+
+        try:
+            result = ingest_calls(
+                rows, campaign_id, status_callback_url, api_key_id=request_api_key_id(), throttle=throttle_calls
+            )
+        except IngestStopped as stopped:
+            # Batches written before the upload was stopped stay accepted
+            from api_keys import RateLimit
+            if isinstance(stopped.reason, RateLimit):
+                return rate_limited_response(
+                    stopped.reason, "Call rate limit exceeded", campaign_id=campaign_id, **stopped.result
+                )
+            return refused_response(stopped.reason, campaign_id=campaign_id, **stopped.result)
+
+        return jsonify({
+            "success": True,
+            "campaign_id": campaign_id,
+            **result,
+            "timestamp": datetime.now().isoformat()
+        }), 202
+
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Streaming bulk ingestion failed: {str(e)}")
+        return jsonify({"error": "Bulk ingestion failed", "details": str(e)}), 500
 
 if __name__ == '__main__':
     port = int(os.getenv('PORT', 5000))
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the API process footprint
+Measures how long importing the app takes, what it loads, and the memory
+of each gunicorn worker after serving a few requests: RSS, PSS (shared
+pages split between the processes using them) and USS (pages private to
+the worker, what every extra worker costs). --root points at another
+checkout, e.g. a git worktree of an older commit, to compare the two.
+
+Usage:
+    python benchmarks/bench_api_footprint.py --workers 4
+    git worktree add /tmp/before <commit> && python benchmarks/bench_api_footprint.py --root /tmp/before
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules the API has no use for; any of them loaded is worker-only code leaking in
+WORKER_ONLY_MODULES = ('pydub', 'voice_utils', 'tasks', 'celery', 'flask_caching', 'audioop')
+
+IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import app
+elapsed = time.perf_counter() - start
+with open('/proc/self/status') as f:
+    rss = next(int(line.split()[1]) for line in f if line.startswith('VmRSS:'))
+print(json.dumps({"import_ms": elapsed * 1000, "rss_mb": rss / 1024, "modules": len(sys.modules),
+                  "worker_only": [name for name in %r if name in sys.modules]}))
+"""
+
+
+def measure_import(root, runs):
+    """Import the app in fresh interpreters; returns the median time and one run's details"""
+    results = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, '-c', IMPORT_PROBE % (WORKER_ONLY_MODULES,)], cwd=root,
+                                capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        result["process_ms"] = (time.perf_counter() - start) * 1000
+        results.append(result)
+    return {
+        "import_ms": statistics.median(result["import_ms"] for result in results),
+        "process_ms": statistics.median(result["process_ms"] for result in results),
+        "rss_mb": results[-1]["rss_mb"],
+        "modules": results[-1]["modules"],
+        "worker_only": results[-1]["worker_only"]
+    }
+
+
+def memory_mb(pid):
+    """RSS, PSS and USS of a process in MB"""
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1]) / 1024
+    return {
+        "rss": fields['Rss'],
+        "pss": fields['Pss'],
+        "uss": fields['Private_Clean'] + fields['Private_Dirty']
+    }
+
+
+def child_pids(parent):
+    pids = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/status') as f:
+                if any(line.split() == ['PPid:', str(parent)] for line in f):
+                    pids.append(int(entry))
+        except OSError:
+            continue
+    return pids
+
+
+def measure_workers(root, workers, port):
+    """Start gunicorn with the tree's config, serve some requests, then read every worker's memory"""
+    url = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    server = subprocess.Popen([
+        sys.executable, '-m', 'gunicorn', '-c', os.path.join(root, 'gunicorn.conf.py'), '--chdir', root,
+        '--workers', str(workers), '--bind', f"127.0.0.1:{port}", '--access-logfile', '/dev/null', 'app:app'
+    ], cwd=root, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            if server.poll() is not None:
+                raise RuntimeError(f"gunicorn exited with {server.returncode}")
+            try:
+                if requests.get(f"{url}/health", timeout=1).status_code == 200:
+                    break
+            except requests.RequestException:
+                time.sleep(0.1)
+        ready = time.perf_counter() - start
+        # Give every worker time to boot, then touch the common paths
+        time.sleep(2)
+        session = requests.Session()
+        for _ in range(20 * workers):
+            for path in ('/health', '/api/info', '/voice/calls?limit=1', '/api/metrics'):
+                session.get(f"{url}{path}", timeout=30)
+        pids = child_pids(server.pid)
+        return {
+            "ready_s": ready,
+            "master": memory_mb(server.pid),
+            "workers": [memory_mb(pid) for pid in pids]
+        }
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark API import time and gunicorn worker memory")
+    parser.add_argument('--root', default=ROOT, help="Checkout to measure")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--runs', type=int, default=5, help="Interpreters started to time the import")
+    parser.add_argument('--port', type=int, default=5098)
+    args = parser.parse_args()
+
+    imported = measure_import(args.root, args.runs)
+    print(f"Tree:              {args.root}")
+    print(f"Import app:        {imported['import_ms']:.0f} ms "
+          f"({imported['process_ms']:.0f} ms with interpreter start), {imported['modules']} modules, "
+          f"{imported['rss_mb']:.1f} MB RSS")
+    print(f"Worker-only code:  {', '.join(imported['worker_only']) or 'none'}")
+
+    served = measure_workers(args.root, args.workers, args.port)
+    workers = served['workers']
+    print(f"gunicorn ready:    {served['ready_s']:.1f} s")
+    print(f"Master:            RSS {served['master']['rss']:.1f} MB")
+    for name in ('rss', 'pss', 'uss'):
+        values = [worker[name] for worker in workers]
+        print(f"Per worker {name.upper()}:    mean {statistics.mean(values):.1f} MB, max {max(values):.1f} MB "
+              f"({len(values)} workers)")
+    print(f"Total PSS:         {sum(worker['pss'] for worker in workers) + served['master']['pss']:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the audio preparation path
+Times espeak_tts, prepare_audio_for_sip, MP3 and WAV encode/decode and
+resampling to 8 kHz across prompt lengths, reporting wall time, CPU time
+(including ffmpeg and espeak), peak Python memory, peak subprocess memory
+and subprocesses started per call. Results are saved as a JSON baseline
+and later runs are checked against it.
+
+Each case runs in its own forked process, so CPU time, memory and
+subprocess counts of one case do not leak into the next. Cases whose
+tools (espeak, ffmpeg) are not installed are reported as skipped.
+
+Usage:
+    python benchmarks/bench_audio.py --save benchmarks/baselines/audio.json
+    python benchmarks/bench_audio.py --baseline benchmarks/baselines/audio.json --threshold 20
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydub import AudioSegment
+from pydub.utils import which
+
+import voice_utils
+
+PROMPT_SECONDS = (2, 5, 15, 30, 60, 120)
+SOURCE_RATE = 24000  # Google TTS returns 24 kHz mono
+CHARACTERS_PER_SECOND = 15  # Speaking rate prompt text is sized by
+WORDS = "please press one to confirm your appointment or two to speak with an agent".split()
+
+# Metrics compared against a baseline, with the smallest change counted as a regression
+COMPARED_METRICS = (('wall_ms', 1.0), ('cpu_ms', 1.0), ('python_peak_mb', 0.5), ('child_peak_rss_mb', 1.0))
+
+
+def prompt_text(seconds):
+    """Text that takes about the given time to speak"""
+    words = []
+    while sum(len(word) + 1 for word in words) < seconds * CHARACTERS_PER_SECOND:
+        words.append(WORDS[len(words) % len(WORDS)])
+    return ' '.join(words)
+
+
+def prompt_audio(seconds):
+    """Low-level noise at the TTS provider's rate; the codecs' cost does not depend on it being speech"""
+    noise = AudioSegment(data=os.urandom(2 * int(seconds * SOURCE_RATE)), sample_width=2, frame_rate=SOURCE_RATE,
+                         channels=1)
+    return noise.apply_gain(-20)
+
+
+def setup_case(operation, seconds, directory):
+    """Write the case's input files and return the call to measure"""
+    audio = prompt_audio(seconds)
+    mp3_path = os.path.join(directory, 'prompt.mp3')
+    wav_path = os.path.join(directory, 'prompt.wav')
+    if operation in ('prepare_audio_for_sip', 'mp3_decode'):
+        audio.export(mp3_path, format='mp3')
+    if operation == 'wav_decode':
+        audio.export(wav_path, format='wav')
+
+    # Both log and swallow their errors; a failure must not be timed as a fast call
+    if operation == 'espeak_tts':
+        text = prompt_text(seconds)
+
+        def synthesize():
+            if not voice_utils.espeak_tts(text, os.path.join(directory, 'tts.mp3')):
+                raise RuntimeError("espeak_tts failed")
+        return synthesize
+    if operation == 'prepare_audio_for_sip':
+        def prepare():
+            if not voice_utils.prepare_audio_for_sip(mp3_path).endswith('.wav'):
+                raise RuntimeError("prepare_audio_for_sip failed")
+        return prepare
+    if operation == 'mp3_decode':
+        return lambda: AudioSegment.from_mp3(mp3_path)
+    if operation == 'mp3_encode':
+        return lambda: audio.export(os.path.join(directory, 'out.mp3'), format='mp3').close()
+    if operation == 'wav_decode':
+        return lambda: AudioSegment.from_wav(wav_path)
+    if operation == 'wav_encode':
+        return lambda: audio.export(os.path.join(directory, 'out.wav'), format='wav').close()
+    if operation == 'resample':
+        return lambda: audio.set_frame_rate(8000).set_channels(1)
+    raise ValueError(f"Unknown operation {operation}")
+
+
+# Operation -> tools it needs on the PATH
+OPERATIONS = {
+    'espeak_tts': ('espeak', 'ffmpeg'),
+    'prepare_audio_for_sip': ('ffmpeg',),
+    'mp3_decode': ('ffmpeg',),
+    'mp3_encode': ('ffmpeg',),
+    'wav_decode': (),
+    'wav_encode': (),
+    'resample': (),
+}
+
+
+def cpu_seconds():
+    """CPU time of this process and its waited-for children"""
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def run_case(operation, seconds, iterations, results):
+    """Measure one case; runs in a forked process"""
+    launched = [0]
+    execute_child = subprocess.Popen._execute_child
+
+    def counting_execute_child(self, *args, **kwargs):
+        launched[0] += 1
+        return execute_child(self, *args, **kwargs)
+
+    # Patched on the class, so Popen imported under any name is counted
+    subprocess.Popen._execute_child = counting_execute_child
+    directory = tempfile.mkdtemp(prefix='audio-bench-')
+    try:
+        measure = setup_case(operation, seconds, directory)
+        measure()  # Warm up imports and caches
+        launched[0] = 0
+        wall, cpu = [], []
+        for _ in range(iterations):
+            cpu_start, wall_start = cpu_seconds(), time.perf_counter()
+            measure()
+            wall.append((time.perf_counter() - wall_start) * 1000)
+            cpu.append((cpu_seconds() - cpu_start) * 1000)
+        subprocesses = launched[0] / iterations
+
+        # Memory in a separate pass, as tracing slows every allocation
+        tracemalloc.start()
+        measure()
+        python_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        child_peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss  # KB, largest child
+        results.put({
+            "operation": operation,
+            "seconds": seconds,
+            "iterations": iterations,
+            "wall_ms": round(statistics.median(wall), 2),
+            "wall_ms_max": round(max(wall), 2),
+            "cpu_ms": round(statistics.median(cpu), 2),
+            "python_peak_mb": round(python_peak / 1048576, 2),
+            "child_peak_rss_mb": round(child_peak / 1024, 2),
+            "subprocesses": subprocesses
+        })
+    except Exception as e:
+        results.put({"operation": operation, "seconds": seconds, "error": str(e)})
+    finally:
+        shutil.rmtree(directory)
+
+
+def measure_case(operation, seconds, iterations):
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    process = context.Process(target=run_case, args=(operation, seconds, iterations, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def compare(baseline, results, threshold):
+    """Print and count metrics worse than the baseline by more than threshold percent"""
+    previous = {(row['operation'], row['seconds']): row for row in baseline['results']}
+    regressions = 0
+    for row in results:
+        old = previous.get((row['operation'], row['seconds']))
+        if not old or 'error' in old or 'error' in row or 'skipped' in old or 'skipped' in row:
+            continue
+        changes = []
+        for metric, floor in COMPARED_METRICS:
+            if row[metric] > old[metric] * (1 + threshold / 100) and row[metric] - old[metric] > floor:
+                changes.append(f"{metric} {old[metric]:g} -> {row[metric]:g}")
+        if row['subprocesses'] > old['subprocesses']:
+            changes.append(f"subprocesses {old['subprocesses']:g} -> {row['subprocesses']:g}")
+        if changes:
+            regressions += 1
+            print(f"REGRESSION {row['operation']} {row['seconds']} s: {', '.join(changes)}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the audio preparation path")
+    parser.add_argument('--operations', default=','.join(OPERATIONS), help="Comma-separated subset to run")
+    parser.add_argument('--seconds', default=','.join(str(seconds) for seconds in PROMPT_SECONDS),
+                        help="Comma-separated prompt lengths")
+    parser.add_argument('--iterations', type=int, default=5)
+    parser.add_argument('--save', help="Write the results as a JSON baseline")
+    parser.add_argument('--baseline', help="Compare against a saved baseline, exit 1 on regressions")
+    parser.add_argument('--threshold', type=float, default=20, help="Percent slower counted as a regression")
+    args = parser.parse_args()
+
+    operations = args.operations.split(',')
+    unknown = set(operations) - set(OPERATIONS)
+    if unknown:
+        parser.error(f"unknown operations: {', '.join(sorted(unknown))}")
+    lengths = [int(seconds) for seconds in args.seconds.split(',')]
+
+    print(f"{'operation':22} {'prompt':>7} {'wall ms':>9} {'cpu ms':>9} {'py MB':>7} {'child MB':>9} {'procs':>6}")
+    results = []
+    for operation in operations:
+        missing = [tool for tool in OPERATIONS[operation] if not which(tool)]
+        for seconds in lengths:
+            if missing:
+                row = {"operation": operation, "seconds": seconds, "skipped": f"{', '.join(missing)} not installed"}
+            else:
+                row = measure_case(operation, seconds, args.iterations)
+            results.append(row)
+            if 'skipped' in row or 'error' in row:
+                print(f"{operation:22} {seconds:>5} s  {row.get('skipped') or 'failed: ' + row['error']}")
+                continue
+            print(f"{operation:22} {seconds:>5} s {row['wall_ms']:9.1f} {row['cpu_ms']:9.1f} "
+                  f"{row['python_peak_mb']:7.1f} {row['child_peak_rss_mb']:9.1f} {row['subprocesses']:6g}")
+
+    report = {
+        "created_at": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        "host": {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count()},
+        "iterations": args.iterations,
+        "results": results
+    }
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline written to {args.save}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline['host'] != report['host']:
+            print(f"Warning: baseline is from {baseline['host']}, this host is {report['host']}")
+        regressions = compare(baseline, results, args.threshold)
+        print(f"{regressions} regression(s) against {args.baseline}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
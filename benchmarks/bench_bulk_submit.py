@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Benchmark for POST /voice/bulk
+Measures request latency against batch size on a running server. Run it
+against two builds to compare before/after.
+
+Usage:
+    python benchmarks/bench_bulk_submit.py --url http://127.0.0.1:5000 --sizes 1,10,100,500,1000
+"""
+import argparse
+import json
+import statistics
+import time
+
+import requests
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of samples"""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def run_batch_size(session, url, size, repeat):
+    """Submit `repeat` bulk requests of `size` calls and return latencies in ms"""
+    payload = {
+        "calls": [
+            {"ToNumber": f"+1555{i:07d}", "FromNumber": "12156", "Text": f"Bulk benchmark {i}"}
+            for i in range(size)
+        ]
+    }
+    body = json.dumps(payload)
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = session.post(f"{url}/voice/bulk", data=body,
+                                headers={'Content-Type': 'application/json'})
+        latencies.append((time.perf_counter() - start) * 1000)
+        if response.status_code != 202:
+            raise RuntimeError(f"Unexpected status {response.status_code}: {response.text[:200]}")
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /voice/bulk latency by batch size")
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--sizes', default='1,10,100,500,1000')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--json', help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    session = requests.Session()
+    results = []
+    print(f"{'batch':>6} {'p50 ms':>10} {'p95 ms':>10} {'max ms':>10} {'calls/s':>10}")
+    for size in [int(s) for s in args.sizes.split(',')]:
+        latencies = run_batch_size(session, args.url, size, args.repeat)
+        p50 = statistics.median(latencies)
+        row = {
+            "batch_size": size,
+            "p50_ms": round(p50, 2),
+            "p95_ms": round(percentile(latencies, 95), 2),
+            "max_ms": round(max(latencies), 2),
+            "calls_per_second": round(size / (p50 / 1000), 1)
+        }
+        results.append(row)
+        print(f"{size:>6} {row['p50_ms']:>10} {row['p95_ms']:>10} {row['max_ms']:>10} {row['calls_per_second']:>10}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
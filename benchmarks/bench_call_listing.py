@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Benchmark for GET /voice/calls pagination depth
+Walks the call listing page by page with keyset cursors and reports the
+latency of selected pages, next to the same pages fetched with OFFSET.
+
+Usage:
+    python benchmarks/bench_calls_table.py --seed 10000000
+    python benchmarks/bench_call_listing.py --pages 10000
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from celery_app import flask_app
+from models import db, Call
+from call_listing import list_calls, LISTED_COLUMNS
+
+REPORTED_PAGES = (1, 10, 100, 1000, 10000, 100000)
+
+
+def time_offset_page(page, limit, status, repeat):
+    """Median ms to fetch a page with LIMIT/OFFSET"""
+    query = db.select(*LISTED_COLUMNS)
+    if status:
+        query = query.where(Call.status == status)
+    query = query.order_by(Call.created_at.desc(), Call.id.desc()).limit(limit).offset((page - 1) * limit)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        db.session.execute(query).all()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark keyset vs offset call listing")
+    parser.add_argument('--pages', type=int, default=10000)
+    parser.add_argument('--limit', type=int, default=50)
+    parser.add_argument('--status', default=None, help="Filter by status, e.g. failed")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with flask_app.app_context():
+        cursor = None
+        page = 0
+        print(f"{'page':>8} {'keyset ms':>10} {'offset ms':>10}")
+        while page < args.pages:
+            page += 1
+            timings = []
+            for _ in range(args.repeat if page in REPORTED_PAGES else 1):
+                start = time.perf_counter()
+                calls, next_cursor = list_calls(status=args.status, cursor=cursor, limit=args.limit)
+                timings.append((time.perf_counter() - start) * 1000)
+            if page in REPORTED_PAGES:
+                offset_ms = time_offset_page(page, args.limit, args.status, args.repeat)
+                print(f"{page:>8} {statistics.median(timings):>10.2f} {offset_ms:>10.2f}")
+            if next_cursor is None:
+                print(f"Last page: {page}")
+                break
+            cursor = next_cursor
+        db.session.rollback()
+
+
+if __name__ == '__main__':
+    main()
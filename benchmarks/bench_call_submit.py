@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Benchmark for POST /voice/call
+Measures submission latency percentiles on a running server with a fixed
+number of concurrent clients.
+
+Usage:
+    python benchmarks/bench_call_submit.py --url http://127.0.0.1:5000 --requests 2000 --concurrency 32
+"""
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a sorted list of samples"""
+    index = max(0, min(len(samples) - 1, int(round(pct / 100 * len(samples))) - 1))
+    return samples[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /voice/call submission latency")
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    args = parser.parse_args()
+
+    local = threading.local()
+
+    def submit(i):
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        start = time.perf_counter()
+        response = local.session.post(f"{args.url}/voice/call", json={
+            "ToNumber": f"+1555{i:07d}",
+            "FromNumber": "12156",
+            "Text": "Submission latency benchmark"
+        })
+        return (time.perf_counter() - start) * 1000, response.status_code
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(submit, range(args.requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for latency, _ in results)
+    errors = sum(1 for _, status in results if status >= 400)
+    print(f"Requests:   {args.requests} ({errors} errors)")
+    print(f"Throughput: {args.requests / elapsed:,.0f} req/s")
+    for pct in (50, 95, 99):
+        print(f"p{pct}:        {percentile(latencies, pct):.2f} ms")
+    print(f"max:        {latencies[-1]:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
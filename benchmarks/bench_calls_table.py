@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark for calls table queries at scale
+Seeds the calls table with synthetic rows spread over the last months, then
+times the status, metrics and listing queries the API and workers run. Run
+it before and after migrations or partitioning to compare.
+
+Usage:
+    python benchmarks/bench_calls_table.py --seed 10000000
+    python benchmarks/bench_calls_table.py
+    python partitions.py enable && python benchmarks/bench_calls_table.py
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+
+from message_store import message_hash
+from partitions import DATABASE_URL, is_partitioned
+
+SEED_CHUNK = 1000000
+
+SEED_MESSAGE = 'Your appointment is tomorrow at 10am.'
+
+SEED_SQL = """
+INSERT INTO calls (id, to_number, from_number, message_hash, status, created_at, task_id)
+SELECT gen_random_uuid(),
+       '+1' || (2000000000 + (random() * 1000000)::int)::text,
+       '12156',
+       :message_hash,
+       CASE WHEN r < 0.85 THEN 'completed' WHEN r < 0.95 THEN 'failed'
+            WHEN r < 0.98 THEN 'pending' ELSE 'processing' END,
+       (now() AT TIME ZONE 'utc') - random() * (:months * interval '30 days'),
+       gen_random_uuid()
+FROM (SELECT random() AS r FROM generate_series(1, :rows)) AS s
+"""
+
+QUERIES = (
+    ("status by id", "SELECT * FROM calls WHERE id = :id"),
+    ("count pending", "SELECT count(*) FROM calls WHERE status = 'pending'"),
+    ("count processing", "SELECT count(*) FROM calls WHERE status = 'processing'"),
+    ("count by status", "SELECT status, count(*) FROM calls GROUP BY status"),
+    ("list latest 50", "SELECT * FROM calls ORDER BY created_at DESC LIMIT 50"),
+    ("list failed, latest 50", "SELECT * FROM calls WHERE status = 'failed' ORDER BY created_at DESC LIMIT 50"),
+    ("count last hour", "SELECT count(*) FROM calls WHERE created_at >= (now() AT TIME ZONE 'utc') - interval '1 hour'"),
+    ("lookup by task_id", "SELECT * FROM calls WHERE task_id = :task_id"),
+    ("lookup by to_number", "SELECT * FROM calls WHERE to_number = :to_number ORDER BY created_at DESC LIMIT 20"),
+)
+
+
+def seed(conn, rows, months):
+    """Insert synthetic calls in chunks, then vacuum so index-only scans apply as in steady state"""
+    digest = message_hash(SEED_MESSAGE)
+    conn.execute(
+        text("INSERT INTO messages (hash, body) VALUES (:hash, :body) ON CONFLICT DO NOTHING"),
+        {"hash": digest, "body": SEED_MESSAGE}
+    )
+    for start in range(0, rows, SEED_CHUNK):
+        chunk = min(SEED_CHUNK, rows - start)
+        conn.execute(text(SEED_SQL), {"rows": chunk, "months": months, "message_hash": digest})
+        conn.commit()
+        print(f"Seeded {start + chunk:,} / {rows:,} rows")
+    with conn.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as maintenance:
+        maintenance.execute(text("VACUUM ANALYZE calls"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark calls table queries")
+    parser.add_argument('--seed', type=int, default=0, help="Synthetic rows to insert first")
+    parser.add_argument('--months', type=int, default=12, help="Months the seeded rows are spread over")
+    parser.add_argument('--iterations', type=int, default=20)
+    args = parser.parse_args()
+
+    engine = create_engine(DATABASE_URL)
+    with engine.connect() as conn:
+        if args.seed:
+            seed(conn, args.seed, args.months)
+
+        rows = conn.execute(text("SELECT reltuples::bigint FROM pg_class WHERE oid = 'calls'::regclass")).scalar()
+        if rows <= 0:
+            rows = conn.execute(text("SELECT count(*) FROM calls")).scalar()
+        indexes = conn.execute(text(
+            "SELECT count(*) FROM pg_indexes WHERE tablename = 'calls' AND indexname LIKE 'ix_calls_%'"
+        )).scalar()
+        samples = conn.execute(text(
+            "SELECT id, task_id, to_number FROM calls TABLESAMPLE SYSTEM (1) LIMIT 1000"
+        )).all()
+        print(f"Rows: ~{rows:,}  secondary indexes: {indexes}  partitioned: {is_partitioned(conn)}")
+
+        for name, sql in QUERIES:
+            timings = []
+            for _ in range(args.iterations):
+                sample = random.choice(samples)
+                params = {"id": sample.id, "task_id": sample.task_id, "to_number": sample.to_number}
+                start = time.perf_counter()
+                conn.execute(text(sql), params).all()
+                timings.append((time.perf_counter() - start) * 1000)
+            conn.rollback()
+            print(f"{name:24} median {statistics.median(timings):10.2f} ms   max {max(timings):10.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the CDR export
+Exports the calls table as CSV and Parquet, each in a fresh process, and
+reports rows/second, time to first byte and peak RSS. The buffered mode
+fetches every row before encoding, for comparison with the server-side cursor.
+
+Usage:
+    python benchmarks/bench_calls_table.py --seed 1000000
+    python benchmarks/bench_cdr_export.py
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def run_export(fmt, mode, chunk_size):
+    """Run one export, discarding the output, and return its measurements"""
+    from sqlalchemy import create_engine, text
+    from cdr_export import DATABASE_URL, build_query, encode_csv, encode_parquet, export_cdrs
+
+    engine = create_engine(DATABASE_URL)
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT count(*) FROM calls")).scalar()
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    start = time.perf_counter()
+    if mode == 'streaming':
+        blocks = export_cdrs(engine, fmt, chunk_size)
+    else:
+        with engine.connect() as conn:
+            query, params = build_query()
+            all_rows = conn.execute(query, params).all()
+        blocks = (encode_csv if fmt == 'csv' else encode_parquet)([all_rows])
+
+    first_byte = None
+    size = 0
+    for block in blocks:
+        if first_byte is None and block:
+            first_byte = time.perf_counter() - start
+        size += len(block)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "format": fmt,
+        "mode": mode,
+        "rows": rows,
+        "seconds": round(elapsed, 2),
+        "rows_per_second": round(rows / elapsed),
+        "first_byte_ms": round(first_byte * 1000, 1),
+        "output_mb": round(size / 1048576, 1),
+        "baseline_rss_mb": round(baseline_kb / 1024, 1),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark streaming CDR export")
+    parser.add_argument('--formats', default='csv,parquet')
+    parser.add_argument('--modes', default='streaming,buffered')
+    parser.add_argument('--chunk-size', type=int, default=10000)
+    parser.add_argument('--child', nargs=2, metavar=('FORMAT', 'MODE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_export(*args.child, args.chunk_size)))
+        return
+
+    print(f"{'format':8} {'mode':10} {'rows':>10} {'rows/s':>10} {'first byte':>11} {'output':>9} {'peak RSS':>9}")
+    for fmt in args.formats.split(','):
+        for mode in args.modes.split(','):
+            # A fresh process per run so peak RSS is not carried over
+            output = subprocess.run(
+                [sys.executable, __file__, '--child', fmt, mode, '--chunk-size', str(args.chunk_size)],
+                capture_output=True, text=True, check=True
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(
+                f"{fmt:8} {mode:10} {result['rows']:>10,} {result['rows_per_second']:>10,} "
+                f"{result['first_byte_ms']:>8.1f} ms {result['output_mb']:>6.1f} MB {result['peak_rss_mb']:>6.1f} MB"
+            )
+
+
+if __name__ == '__main__':
+    main()
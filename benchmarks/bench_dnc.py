@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the do-not-call suppression index
+Loads a synthetic list, then reports the load time, memory per million
+numbers (file size, resident anonymous and file-backed memory, and a
+Python set for comparison), single and batch lookup latency, delta log
+updates and compaction.
+
+Usage:
+    python benchmarks/bench_dnc.py --numbers 10000000
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dnc
+
+
+def resident_kb():
+    """(anonymous, file-backed) resident memory of this process in kB"""
+    values = {}
+    with open('/proc/self/status') as f:
+        for line in f:
+            name, _, value = line.partition(':')
+            if name in ('RssAnon', 'RssFile'):
+                values[name] = int(value.split()[0])
+    return values.get('RssAnon', 0), values.get('RssFile', 0)
+
+
+def random_numbers(count, seed):
+    """US numbers in E.164 form"""
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield f"+1{rng.randrange(2000000000, 9999999999)}"
+
+
+def time_lookups(lookup, numbers):
+    """Microseconds per call of lookup over numbers"""
+    start = time.perf_counter()
+    for number in numbers:
+        lookup(number)
+    return (time.perf_counter() - start) / len(numbers) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the do-not-call index")
+    parser.add_argument('--numbers', type=int, default=10000000)
+    parser.add_argument('--lookups', type=int, default=200000)
+    parser.add_argument('--delta', type=int, default=100000, help="Numbers added through the delta log")
+    args = parser.parse_args()
+    millions = args.numbers / 1e6
+
+    directory = tempfile.mkdtemp(prefix='dnc-bench-')
+    try:
+        start = time.perf_counter()
+        count = dnc.load_numbers(random_numbers(args.numbers, seed=1), directory)
+        print(f"Load:                {count:,} distinct numbers in {time.perf_counter() - start:.1f} s")
+        base_bytes = os.path.getsize(os.path.join(directory, dnc.BASE_FILE))
+        print(f"Base file:           {base_bytes / 1048576:.1f} MB ({base_bytes / millions / 1048576:.2f} MB per million)")
+
+        anon_before, file_before = resident_kb()
+        index = dnc.DNCIndex(directory)
+        index.refresh(force=True)
+        sum(index.base[position] & 1 for position in range(0, len(index.base), 512))  # Fault every page in
+        anon_after, file_after = resident_kb()
+        print(f"Resident, private:   {(anon_after - anon_before) / 1024:.1f} MB")
+        print(f"Resident, shared:    {(file_after - file_before) / 1024:.1f} MB in the page cache, "
+              f"mapped once per host")
+
+        tracemalloc.start()
+        reference = set(range(10 ** 10, 10 ** 10 + 1000000))
+        print(f"Python set:          {tracemalloc.get_traced_memory()[0] / 1048576:.1f} MB per million, per process")
+        del reference
+        tracemalloc.stop()
+
+        hits = list(random_numbers(args.lookups // 2, seed=1))
+        misses = list(random_numbers(args.lookups // 2, seed=2))
+        probes = hits + misses
+        random.shuffle(probes)
+        print(f"Single lookup:       {time_lookups(index.contains, probes):.2f} us")
+        batches = [probes[start:start + 1000] for start in range(0, len(probes), 1000)]
+        start = time.perf_counter()
+        blocked = sum(len(index.suppressed(batch)) for batch in batches)
+        print(f"Batch lookup:        {(time.perf_counter() - start) / len(probes) * 1e6:.2f} us per number "
+              f"(1000 per batch, {blocked:,} suppressed)")
+
+        added = list(random_numbers(args.delta, seed=3))
+        start = time.perf_counter()
+        for position in range(0, len(added), 1000):
+            dnc.add_numbers(added[position:position + 1000], directory)
+        print(f"Delta append:        {args.delta:,} numbers in {time.perf_counter() - start:.2f} s (batches of 1000)")
+        start = time.perf_counter()
+        index.refresh(force=True)
+        print(f"Delta refresh:       {(time.perf_counter() - start) * 1000:.1f} ms")
+        assert all(index.contains(number) for number in added[:1000])
+        print(f"Lookup with delta:   {time_lookups(index.contains, probes):.2f} us")
+
+        start = time.perf_counter()
+        count = dnc.compact(directory)
+        print(f"Compaction:          {count:,} numbers in {time.perf_counter() - start:.1f} s")
+        index.refresh(force=True)
+        assert all(index.contains(number) for number in added[:1000]) and not index.delta
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
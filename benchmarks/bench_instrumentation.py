@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Benchmark for Prometheus instrumentation overhead
+Measures the per-observation cost of the hot-path metrics, in-process and
+in multiprocess mode (run once with PROMETHEUS_MULTIPROC_DIR set).
+
+Usage:
+    python benchmarks/bench_instrumentation.py
+    PROMETHEUS_MULTIPROC_DIR=$(mktemp -d) python benchmarks/bench_instrumentation.py
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('PROMETHEUS_FLUSH_INTERVAL', '3600')  # Flush only when measured
+
+from instrumentation import (
+    TTS_LATENCY, TTS_LATENCY_BY_PROVIDER, CALLS_IN_FLIGHT, count_sip_response, flush_observations
+)
+
+
+def per_call_ns(fn, iterations):
+    """Average wall time of fn() in nanoseconds"""
+    start = time.perf_counter_ns()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter_ns() - start) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark metric observation cost")
+    parser.add_argument('--iterations', type=int, default=1000000)
+    args = parser.parse_args()
+
+    espeak = TTS_LATENCY_BY_PROVIDER['espeak']
+    cases = (
+        ("Buffered observe", lambda: espeak.observe(0.42)),
+        ("Histogram.labels().observe", lambda: TTS_LATENCY.labels(provider='espeak').observe(0.42)),
+        ("Gauge.inc", CALLS_IN_FLIGHT.inc),
+        ("count_sip_response", lambda: count_sip_response(200)),
+    )
+    mode = "multiprocess" if os.getenv('PROMETHEUS_MULTIPROC_DIR') else "single process"
+    print(f"Mode: {mode}, {args.iterations:,} iterations")
+    for name, fn in cases:
+        print(f"{name:34} {per_call_ns(fn, args.iterations):8.0f} ns")
+
+    # The buffered observations above are applied off the hot path
+    start = time.perf_counter_ns()
+    flush_observations()
+    print(f"{'Background flush, per observation':34} {(time.perf_counter_ns() - start) / args.iterations:8.0f} ns")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Benchmark for /api/metrics call statistics
+Compares the previous five COUNT(*) queries over the calls table with the
+Redis counters, optionally seeding the table with synthetic rows first.
+
+Usage:
+    python benchmarks/bench_metrics.py --seed 1000000 --iterations 20
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+from celery_app import flask_app
+from models import db, Call
+from call_counters import read_call_counters, reconcile_call_counters
+
+SEED_SQL = """
+INSERT INTO calls (id, to_number, from_number, status, created_at)
+SELECT gen_random_uuid(), '+1234567890', '12156',
+       (ARRAY['pending', 'processing', 'completed', 'failed'])[1 + n % 4],
+       now() - (n || ' seconds')::interval
+FROM generate_series(1, :rows) AS n
+"""
+
+
+def count_queries():
+    """The per-request queries /api/metrics used to run"""
+    return (
+        Call.query.count(),
+        Call.query.filter_by(status='pending').count(),
+        Call.query.filter_by(status='processing').count(),
+        Call.query.filter_by(status='completed').count(),
+        Call.query.filter_by(status='failed').count(),
+    )
+
+
+def timed(fn, iterations):
+    """Return per-call timings of fn in milliseconds"""
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark call statistics for /api/metrics")
+    parser.add_argument('--seed', type=int, default=0, help="Synthetic rows to insert first")
+    parser.add_argument('--iterations', type=int, default=20)
+    args = parser.parse_args()
+
+    with flask_app.app_context():
+        if args.seed:
+            db.session.execute(text(SEED_SQL), {"rows": args.seed})
+            db.session.commit()
+            reconcile_call_counters()
+        rows = Call.query.count()
+
+        for name, fn in (("COUNT(*) x5", count_queries), ("Redis counters", read_call_counters)):
+            timings = timed(fn, args.iterations)
+            print(f"{name:15} rows={rows:,}  median {statistics.median(timings):8.2f} ms  max {max(timings):8.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
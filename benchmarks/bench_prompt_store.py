@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the pre-packetized prompt store
+Compares getting a prompt ready to play by transcoding its 8 kHz WAV on
+every call with looking it up in the memory-mapped store: time and Python
+allocations per call, and the memory several worker processes holding the
+same prompts use. Private memory is what each process pays for its own copy;
+the store's pages are shared through the page cache.
+
+Usage:
+    python benchmarks/bench_prompt_store.py --prompts 50 --seconds 30 --processes 4
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import wave
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import prompt_store
+from rtp import PCMU, SAMPLE_RATE, g711_from_wav
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+
+
+def write_wav(path, seconds):
+    """8 kHz 16-bit mono WAV, the format prepare_audio_for_sip produces"""
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes(os.urandom(int(seconds * SAMPLE_RATE) * 2))
+
+
+def memory_kb():
+    """Private and proportional (PSS) memory of this process in kB"""
+    fields = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1])
+    return fields['Private_Clean'] + fields['Private_Dirty'], fields['Pss']
+
+
+def time_calls(prepare, keys, calls):
+    """Median seconds and mean peak Python allocation of prepare(key) per call"""
+    timings, peaks = [], []
+    for index in range(calls):
+        key = keys[index % len(keys)]
+        tracemalloc.start()
+        start = time.perf_counter()
+        audio = prepare(key)
+        timings.append(time.perf_counter() - start)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        assert len(audio)
+    return statistics.median(timings), statistics.mean(peaks)
+
+
+def hold_prompts(method, keys, wav_dir, store_dir, conn):
+    """Worker process: load every prompt the given way, touch all of it, report the memory it added"""
+    before = memory_kb()
+    if method == 'transcode':
+        held = [memoryview(g711_from_wav(os.path.join(wav_dir, f"{key}.wav"), PCMU)) for key in keys]
+    else:
+        store = prompt_store.PromptStore(store_dir)
+        held = [store.get(key).audio for key in keys]
+    for audio in held:
+        bytes(audio[::PAGE_SIZE])  # Read one byte of every page, as playing it would
+    after = memory_kb()
+    conn.send((after[0] - before[0], after[1] - before[1]))
+    conn.recv()  # Stay alive until every process has measured, so shared pages are split between them
+
+
+def measure_processes(method, keys, wav_dir, store_dir, processes):
+    pipes, workers = [], []
+    for _ in range(processes):
+        conn, child_conn = multiprocessing.Pipe()
+        worker = multiprocessing.Process(target=hold_prompts, args=(method, keys, wav_dir, store_dir, child_conn))
+        worker.start()
+        pipes.append(conn)
+        workers.append(worker)
+    results = [conn.recv() for conn in pipes]
+    for conn in pipes:
+        conn.send('done')
+    for worker in workers:
+        worker.join()
+    return sum(private for private, _ in results) / 1024, sum(pss for _, pss in results) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-call transcoding against the mapped prompt store")
+    parser.add_argument('--prompts', type=int, default=50, help="Distinct prompts")
+    parser.add_argument('--seconds', type=float, default=30, help="Length of each prompt")
+    parser.add_argument('--calls', type=int, default=200, help="Calls timed per method")
+    parser.add_argument('--processes', type=int, default=4, help="Worker processes holding every prompt")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='bench-prompts-')
+    wav_dir = os.path.join(work_dir, 'wav')
+    store_dir = os.path.join(work_dir, 'store')
+    os.makedirs(wav_dir)
+    try:
+        keys = [f"{index:064x}" for index in range(args.prompts)]
+        start = time.perf_counter()
+        for key in keys:
+            wav_path = os.path.join(wav_dir, f"{key}.wav")
+            write_wav(wav_path, args.seconds)
+            prompt_store.render_wav(key, wav_path, PCMU, store_dir)
+        render_s = (time.perf_counter() - start) / len(keys)
+        megabytes = args.prompts * args.seconds * SAMPLE_RATE / 1024 / 1024
+
+        transcode = time_calls(lambda key: g711_from_wav(os.path.join(wav_dir, f"{key}.wav"), PCMU),
+                               keys, args.calls)
+        first_use = time_calls(lambda key: prompt_store.PromptStore(store_dir).get(key).audio, keys, args.calls)
+        store = prompt_store.PromptStore(store_dir)
+        repeat = time_calls(lambda key: store.get(key).audio, keys, args.calls)
+
+        print(f"Prompts:            {args.prompts} x {args.seconds:g} s ({megabytes:.1f} MB of G.711), "
+              f"rendered in {render_s * 1000:.1f} ms each (WAV written and encoded)")
+        print(f"{'Per call':20} {'Median':>10} {'Allocated':>12}")
+        for name, (seconds, peak) in (('Transcode WAV', transcode), ('Store, first use', first_use),
+                                      ('Store, repeat', repeat)):
+            print(f"{name:20} {seconds * 1e6:>7.1f} µs {peak / 1024:>9.1f} kB")
+
+        print(f"{args.processes} processes holding every prompt:")
+        for method in ('transcode', 'store'):
+            private, pss = measure_processes(method, keys, wav_dir, store_dir, args.processes)
+            print(f"  {method:10} private {private:7.1f} MB, PSS {pss:7.1f} MB")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Benchmark for per-key rate limiting
+Measures the latency the Redis token bucket check adds to a request, then
+hammers one key from many processes and compares the requests admitted
+with what the limit allows, to show the buckets hold across workers.
+
+Usage:
+    python migrate.py
+    python benchmarks/bench_rate_limit.py --checks 20000 --processes 8 --rate 200
+"""
+import argparse
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+
+from sqlalchemy import create_engine, text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api_keys
+
+
+def hammer(api_key, seconds, admitted):
+    """Check the key as fast as possible for the given time, counting admitted requests"""
+    engine = create_engine(api_keys.DATABASE_URL)
+    count = 0
+    deadline = time.time() + seconds
+    with engine.connect() as conn:
+        while time.time() < deadline:
+            if api_keys.check_rate_limit(api_key, conn).allowed:
+                count += 1
+    with admitted.get_lock():
+        admitted.value += count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the API key rate limiter")
+    parser.add_argument('--checks', type=int, default=20000)
+    parser.add_argument('--processes', type=int, default=8)
+    parser.add_argument('--rate', type=float, default=200, help="Requests per second allowed for the hammered key")
+    parser.add_argument('--seconds', type=float, default=10)
+    args = parser.parse_args()
+
+    engine = create_engine(api_keys.DATABASE_URL)
+    with engine.begin() as conn:
+        fast_id, fast_key = api_keys.create_key(conn, 'bench-latency', requests_per_second=1e9, request_burst=10 ** 9)
+        hammered_id, hammered_key = api_keys.create_key(
+            conn, 'bench-hammer', requests_per_second=args.rate, request_burst=int(args.rate)
+        )
+    try:
+        with engine.connect() as conn:
+            api_keys.check_rate_limit(fast_key, conn)  # Cache the settings, register the script
+            samples = []
+            for _ in range(args.checks):
+                start = time.perf_counter()
+                api_keys.check_rate_limit(fast_key, conn, calls=1)
+                samples.append((time.perf_counter() - start) * 1000)
+        samples.sort()
+        print(f"Check latency over {args.checks:,} requests: "
+              f"p50 {statistics.median(samples):.3f} ms, "
+              f"p99 {samples[int(len(samples) * 0.99)]:.3f} ms, "
+              f"max {samples[-1]:.3f} ms")
+
+        admitted = multiprocessing.Value('l', 0)
+        workers = [
+            multiprocessing.Process(target=hammer, args=(hammered_key, args.seconds, admitted))
+            for _ in range(args.processes)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        allowed = args.rate * args.seconds + int(args.rate)
+        print(f"{args.processes} processes for {args.seconds:g} s at {args.rate:g} req/s: "
+              f"{admitted.value:,} admitted, limit allows {allowed:,.0f}")
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text("DELETE FROM api_keys WHERE id IN (:a, :b)"), {"a": fast_id, "b": hammered_id})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the least-cost routing table
+Builds a synthetic rate deck, then reports load time, memory, longest-prefix
+lookup latency and how long lookups stall while the table is reloaded in
+the background.
+
+Usage:
+    python benchmarks/bench_routing.py --prefixes 1000000
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import routing
+
+TRUNKS = ('carrier_a', 'carrier_b', 'carrier_c', 'carrier_d')
+
+
+def resident_mb():
+    """Anonymous resident memory of this process in MB"""
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('RssAnon:'):
+                return int(line.split()[1]) / 1024
+    return 0
+
+
+def write_rate_deck(directory, count, seed):
+    """Random prefixes of 2-9 digits, each on one to three trunks with a handful of rate tiers"""
+    rng = random.Random(seed)
+    routes_path = os.path.join(directory, 'routes.csv')
+    prefixes = set()
+    while len(prefixes) < count:
+        prefixes.add(str(rng.randrange(1, 10)) + ''.join(rng.choices('0123456789', k=rng.randrange(1, 9))))
+    with open(routes_path, 'w') as f:
+        f.write("prefix,trunk,rate,max_concurrent\n")
+        for prefix in prefixes:
+            for trunk in rng.sample(TRUNKS, rng.randrange(1, 4)):
+                f.write(f"{prefix},{trunk},{rng.choice((0.004, 0.008, 0.012, 0.02, 0.05))},{rng.choice((0, 50, 200))}\n")
+    trunks_path = os.path.join(directory, 'trunks.json')
+    with open(trunks_path, 'w') as f:
+        json.dump({trunk: {"host": f"sip.{trunk}.example"} for trunk in TRUNKS}, f)
+    return routes_path, trunks_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the least-cost routing table")
+    parser.add_argument('--prefixes', type=int, default=1000000)
+    parser.add_argument('--lookups', type=int, default=500000)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='routing-bench-')
+    try:
+        routes_path, trunks_path = write_rate_deck(directory, args.prefixes, seed=1)
+        print(f"Rate deck:           {os.path.getsize(routes_path) / 1048576:.1f} MB")
+
+        before = resident_mb()
+        start = time.perf_counter()
+        table = routing.build_table(routes_path, trunks_path)
+        elapsed = time.perf_counter() - start
+        memory = resident_mb() - before
+        stats = table.stats()
+        print(f"Load:                {stats['prefixes']:,} prefixes, {stats['routes']:,} routes, "
+              f"{stats['markers']:,} markers in {elapsed:.1f} s")
+        print(f"Memory:              {memory:.1f} MB resident ({memory * 1048576 / stats['prefixes']:.0f} bytes per prefix)")
+
+        rng = random.Random(2)
+        numbers = [f"+{rng.randrange(1, 10)}{rng.randrange(10 ** 9, 10 ** 10)}" for _ in range(args.lookups)]
+        digits = [routing.destination_digits(number) for number in numbers]
+
+        match = table.match
+        start = time.perf_counter()
+        matched = sum(1 for value in digits if match(value)[0] is not None)
+        print(f"Uniform destinations: {(time.perf_counter() - start) / len(digits) * 1e9:.0f} ns "
+              f"({matched / len(digits):.0%} matched)")
+        # Campaign traffic repeats a limited set of destinations, whose entries stay in the CPU cache
+        hot = digits[:10000] * (len(digits) // 10000)
+        start = time.perf_counter()
+        for value in hot:
+            match(value)
+        print(f"Hot destinations:    {(time.perf_counter() - start) / len(hot) * 1e9:.0f} ns (10,000 distinct)")
+        start = time.perf_counter()
+        for number in numbers:
+            match(routing.destination_digits(number))
+        print(f"Normalize + match:   {(time.perf_counter() - start) / len(numbers) * 1e9:.0f} ns")
+
+        # Lookups through the process-wide source while the deck is rewritten
+        source = routing.RoutingTableSource(routes_path, trunks_path)
+        source.current()
+        routing.ROUTES_REFRESH_INTERVAL = 0
+        write_rate_deck(directory, args.prefixes, seed=3)
+        old_table = source.current()
+        worst = 0
+        count = 0
+        start = time.perf_counter()
+        while source.table is old_table:
+            begin = time.perf_counter()
+            source.current().match(digits[count % len(digits)])
+            worst = max(worst, time.perf_counter() - begin)
+            count += 1
+        print(f"Hot reload:          swapped after {time.perf_counter() - start:.1f} s, {count:,} lookups served "
+              f"meanwhile, slowest {worst * 1000:.1f} ms")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
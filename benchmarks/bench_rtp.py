@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the RTP media sender
+Plays the same G.711 prompt to a growing number of concurrent streams from
+one event loop and measures the sender's CPU time, how late its 20 ms clock
+ran, and what a local receiver (in its own process) got: losses,
+reordering, jitter and whether every stream's payload arrived intact. A
+Python receiver cannot check 50,000 packets/s, so it gets --verify streams
+and the rest go to a socket the kernel discards for. Streams per core is
+streams / sender CPU share at each step.
+
+Usage:
+    python benchmarks/bench_rtp.py --streams 100,500,1000,2000 --seconds 10 --verify 50
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import resource
+import socket
+import sys
+import time
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rtp
+import rtp_receiver
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a sorted list of samples"""
+    index = max(0, min(len(samples) - 1, int(round(pct / 100 * len(samples))) - 1))
+    return samples[index]
+
+
+def run_receiver(conn):
+    """Receiver process: sends its port, then answers 'summary' requests until 'stop'"""
+    async def serve():
+        loop = asyncio.get_running_loop()
+        receiver = rtp_receiver.RtpReceiver()
+        conn.send(await rtp_receiver.start(receiver))
+        while True:
+            command = await loop.run_in_executor(None, conn.recv)
+            if command == 'stop':
+                return
+            conn.send(receiver.summary())
+            receiver.reset()
+
+    asyncio.run(serve())
+
+
+async def play_step(payload, port, sink_port, streams, verify):
+    sender = rtp.RtpSender()
+    start_cpu = resource.getrusage(resource.RUSAGE_SELF)
+    start = time.perf_counter()
+    results = await asyncio.gather(*(
+        sender.play(payload, '127.0.0.1', port if index < verify else sink_port) for index in range(streams)
+    ))
+    elapsed = time.perf_counter() - start
+    end_cpu = resource.getrusage(resource.RUSAGE_SELF)
+    cpu = (end_cpu.ru_utime - start_cpu.ru_utime) + (end_cpu.ru_stime - start_cpu.ru_stime)
+    return results, elapsed, cpu, sorted(sender.tick_lateness)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent RTP streams per core")
+    parser.add_argument('--streams', default='100,500,1000,2000', help="Comma-separated concurrent stream counts")
+    parser.add_argument('--seconds', type=float, default=10, help="Length of the prompt every stream plays")
+    parser.add_argument('--verify', type=int, default=50, help="Streams sent to the checking receiver")
+    args = parser.parse_args()
+
+    steps = [int(count) for count in args.streams.split(',')]
+    # Two sockets per stream, plus the receiver's
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    needed = 2 * max(steps) + 256
+    if soft < needed:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(needed, hard), hard))
+
+    # Random bytes are valid G.711 and make any corrupted or misplaced frame show in the CRC
+    payload = os.urandom(int(args.seconds * rtp.SAMPLE_RATE))
+    expected_crc = zlib.crc32(payload)
+    frames = -(-len(payload) // int(rtp.SAMPLE_RATE * rtp.RTP_PTIME))
+
+    conn, child_conn = multiprocessing.Pipe()
+    receiver = multiprocessing.Process(target=run_receiver, args=(child_conn,), daemon=True)
+    receiver.start()
+    port = conn.recv()
+    # Bound and never read: once its buffer is full the kernel drops the packets, without ICMP errors
+    sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sink.bind(('127.0.0.1', 0))
+    sink_port = sink.getsockname()[1]
+
+    print(f"Prompt: {args.seconds:g} s G.711, {frames} packets per stream, one event loop, {os.cpu_count()} CPUs")
+    print(f"{'Streams':>8} {'Packets/s':>10} {'CPU':>6} {'Streams/core':>13} {'Tick late p50':>14} "
+          f"{'p99':>8} {'max':>8} {'Skipped':>8} {'Lost':>7} {'Jitter p99':>11} {'Intact':>7}")
+    try:
+        for streams in steps:
+            verify = min(args.verify, streams)
+            results, elapsed, cpu, lateness = asyncio.run(play_step(payload, port, sink_port, streams, verify))
+            time.sleep(0.5)  # Let the receiver drain its socket
+            conn.send('summary')
+            received = conn.recv()
+
+            sent = sum(result['packets'] for result in results)
+            skipped = sum(result['skipped'] for result in results)
+            lost = sum(result['packets'] for result in results[:verify]) - sum(
+                stream['packets'] for stream in received.values()
+            )
+            jitter = sorted(stream['jitter_ms'] for stream in received.values()) or [0.0]
+            intact = sum(1 for stream in received.values()
+                         if stream['crc32'] == expected_crc and stream['lost'] == 0 and stream['markers'] == 1)
+            share = cpu / elapsed
+            print(f"{streams:>8} {sent / elapsed:>10,.0f} {share:>6.0%} {streams / share:>13,.0f} "
+                  f"{percentile(lateness, 50) * 1000:>11.2f} ms {percentile(lateness, 99) * 1000:>5.2f} ms "
+                  f"{lateness[-1] * 1000:>5.1f} ms {skipped:>8} {lost:>7} {percentile(jitter, 99):>8.2f} ms "
+                  f"{intact:>3}/{verify}")
+    finally:
+        sink.close()
+        conn.send('stop')
+        receiver.join(5)
+
+
+if __name__ == '__main__':
+    main()
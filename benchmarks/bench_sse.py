@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark for Server-Sent Events fan-out
+Opens a large number of concurrent SSE connections to one campaign stream,
+publishes status events straight to Redis and measures how many subscribers
+receive each event and the publish-to-delivery latency.
+
+Raise the open file limit first (each subscriber is one socket on both sides):
+    ulimit -n 65536
+    gunicorn -c gunicorn.conf.py app:app &
+    python benchmarks/bench_sse.py --clients 10000 --events 20
+"""
+from gevent import monkey
+monkey.patch_all()
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import sys
+import time
+import uuid
+
+import gevent
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from event_stream import campaign_channel
+from redis_client import get_redis
+
+connected = 0
+latencies = []
+received = 0
+
+
+def subscriber(host, port, path):
+    """Hold one SSE connection open, recording the latency of every event"""
+    global connected, received
+    sock = socket.create_connection((host, port))
+    sock.sendall(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nAccept: text/event-stream\r\n\r\n".encode())
+    buffer = b''
+    counted = False
+    while True:
+        chunk = sock.recv(65536)
+        if not chunk:
+            break
+        if not counted and b'retry:' in chunk:
+            connected += 1
+            counted = True
+        buffer += chunk
+        while b'\n\n' in buffer:
+            message, buffer = buffer.split(b'\n\n', 1)
+            for line in message.split(b'\n'):
+                if line.startswith(b'data: '):
+                    event = json.loads(line[6:])
+                    latencies.append(time.time() - event['sent_at'])
+                    received += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark SSE fan-out")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--clients', type=int, default=10000)
+    parser.add_argument('--events', type=int, default=20)
+    parser.add_argument('--interval', type=float, default=0.5)
+    args = parser.parse_args()
+
+    campaign_id = str(uuid.uuid4())
+    path = f"/voice/events?campaign_id={campaign_id}"
+    start = time.perf_counter()
+    for _ in range(args.clients):
+        gevent.spawn(subscriber, args.host, args.port, path)
+        gevent.sleep(0)
+    while connected < args.clients and time.perf_counter() - start < 120:
+        gevent.sleep(0.1)
+    connect_time = time.perf_counter() - start
+    gevent.sleep(1)  # Let the servers' pub/sub subscriptions settle
+
+    redis = get_redis()
+    for i in range(args.events):
+        redis.publish(campaign_channel(campaign_id), json.dumps({
+            "event": "call.status", "call_id": str(uuid.uuid4()), "status": "processing", "sent_at": time.time()
+        }))
+        gevent.sleep(args.interval)
+    gevent.sleep(2)
+
+    expected = connected * args.events
+    latencies.sort()
+    print(f"Subscribers connected: {connected} / {args.clients} in {connect_time:.2f} s")
+    print(f"Events delivered:      {received} / {expected}")
+    if latencies:
+        print(f"Latency p50:           {statistics.median(latencies) * 1000:.1f} ms")
+        print(f"Latency p99:           {latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f} ms")
+        print(f"Latency max:           {latencies[-1] * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
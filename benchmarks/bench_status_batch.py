@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark for POST /voice/status/batch
+Looks up the status of a batch of existing calls once with one GET per call
+and once with a single batch request, each with a cold and a warm status
+cache, and reports wall time and Postgres transactions.
+
+Usage:
+    python benchmarks/bench_status_batch.py --url http://127.0.0.1:5000 --calls 1000
+"""
+import argparse
+import os
+import sys
+import time
+
+import psycopg2
+import requests
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+load_dotenv()
+
+
+def postgres_transactions(dsn):
+    """Committed transactions so far in the current database"""
+    with psycopg2.connect(dsn) as conn, conn.cursor() as cur:
+        cur.execute("SELECT xact_commit FROM pg_stat_database WHERE datname = current_database()")
+        return cur.fetchone()[0]
+
+
+def drop_cached(call_ids):
+    """Evict the calls from the status cache"""
+    from redis_client import get_redis
+    from status_cache import KEY_PREFIX
+    get_redis().delete(*[KEY_PREFIX + call_id for call_id in call_ids])
+
+
+def measure(name, lookup, dsn):
+    transactions_before = postgres_transactions(dsn)
+    start = time.perf_counter()
+    found = lookup()
+    elapsed = time.perf_counter() - start
+    # The measurement query itself commits one transaction
+    transactions = postgres_transactions(dsn) - transactions_before - 1
+    print(f"{name:28} {elapsed * 1000:9.1f} ms  {found:6} found  {transactions:6} Postgres transactions")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batch status lookups")
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--calls', type=int, default=1000)
+    parser.add_argument('--dsn', default=os.getenv('DATABASE_URL'))
+    args = parser.parse_args()
+
+    session = requests.Session()
+    # Latest existing calls, topped up with new ones if there are too few
+    call_ids = []
+    cursor = None
+    while len(call_ids) < args.calls:
+        page = session.get(f"{args.url}/voice/calls", params={"limit": 500, "cursor": cursor}).json()
+        call_ids += [call['id'] for call in page['calls']]
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    call_ids = call_ids[:args.calls]
+    if len(call_ids) < args.calls:
+        response = session.post(f"{args.url}/voice/bulk", json={"calls": [
+            {"ToNumber": f"+1555{i:07d}", "FromNumber": "12156", "Text": "Status batch benchmark"}
+            for i in range(args.calls - len(call_ids))
+        ]})
+        response.raise_for_status()
+        call_ids += response.json()['call_ids']
+
+    def one_by_one():
+        return sum(
+            1 for call_id in call_ids
+            if session.get(f"{args.url}/voice/status/{call_id}").status_code == 200
+        )
+
+    def batch():
+        response = session.post(f"{args.url}/voice/status/batch", json={"call_ids": call_ids})
+        response.raise_for_status()
+        return len(response.json()['calls'])
+
+    print(f"Looking up {len(call_ids)} calls")
+    for name, lookup in (("GET per call", one_by_one), ("POST /voice/status/batch", batch)):
+        drop_cached(call_ids)
+        measure(f"{name}, cold cache", lookup, args.dsn)
+        measure(f"{name}, warm cache", lookup, args.dsn)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Benchmark for GET /voice/status/<call_id>
+Polls a set of existing calls from many concurrent clients on a running
+server and reports polls/second together with the number of Postgres
+transactions committed meanwhile (from pg_stat_database).
+
+Usage:
+    python benchmarks/bench_status_poll.py --url http://127.0.0.1:5000 --calls 100 --polls 20000
+"""
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import psycopg2
+import requests
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def postgres_transactions(dsn):
+    """Committed transactions so far in the current database"""
+    with psycopg2.connect(dsn) as conn, conn.cursor() as cur:
+        cur.execute("SELECT xact_commit FROM pg_stat_database WHERE datname = current_database()")
+        return cur.fetchone()[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark status polling")
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--calls', type=int, default=100, help="Calls to create; the first 10 returned are polled")
+    parser.add_argument('--polls', type=int, default=20000)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--dsn', default=os.getenv('DATABASE_URL'))
+    args = parser.parse_args()
+
+    response = requests.post(f"{args.url}/voice/bulk", json={"calls": [
+        {"ToNumber": f"+1555{i:07d}", "FromNumber": "12156", "Text": "Status poll benchmark"}
+        for i in range(args.calls)
+    ]})
+    response.raise_for_status()
+    call_ids = response.json()['call_ids']
+    local = threading.local()
+
+    def poll(i):
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        return local.session.get(f"{args.url}/voice/status/{call_ids[i % len(call_ids)]}").status_code
+
+    transactions_before = postgres_transactions(args.dsn)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        statuses = list(executor.map(poll, range(args.polls)))
+    elapsed = time.perf_counter() - start
+    # The measurement query itself commits one transaction
+    transactions = postgres_transactions(args.dsn) - transactions_before - 1
+
+    errors = sum(1 for status in statuses if status != 200)
+    print(f"Polls:                  {args.polls} ({errors} errors)")
+    print(f"Throughput:             {args.polls / elapsed:,.0f} polls/s")
+    print(f"Postgres transactions:  {transactions} ({transactions / args.polls:.3f} per poll)")
+
+
+if __name__ == '__main__':
+    main()
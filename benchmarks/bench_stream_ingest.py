@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Benchmark for POST /voice/bulk/stream
+Streams a generated NDJSON or CSV upload through the Flask app in-process and
+reports throughput and peak RSS. Requires the configured Postgres and Redis.
+
+Usage:
+    python benchmarks/bench_stream_ingest.py --rows 1000000 --format ndjson
+"""
+import argparse
+import json
+import os
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class GeneratedUpload:
+    """File-like object producing call rows on demand instead of holding them in memory"""
+
+    def __init__(self, rows, fmt, invalid_every=0):
+        self.rows = rows
+        self.fmt = fmt
+        self.invalid_every = invalid_every
+        self.index = 0
+        self.buffer = b'ToNumber,FromNumber,Text\n' if fmt == 'csv' else b''
+
+    def _render(self, i):
+        to_number = f"+1555{i % 10000000:07d}"
+        if self.invalid_every and i % self.invalid_every == 0:
+            # Missing Text field, exercises the reject path
+            if self.fmt == 'csv':
+                return f"{to_number},12156,\n".encode()
+            return json.dumps({"ToNumber": to_number, "FromNumber": "12156"}).encode() + b'\n'
+        if self.fmt == 'csv':
+            return f"{to_number},12156,Benchmark message {i}\n".encode()
+        return json.dumps({
+            "ToNumber": to_number,
+            "FromNumber": "12156",
+            "Text": f"Benchmark message {i}"
+        }).encode() + b'\n'
+
+    def read(self, size=-1):
+        while (size < 0 or len(self.buffer) < size) and self.index < self.rows:
+            self.buffer += self._render(self.index)
+            self.index += 1
+        if size < 0:
+            size = len(self.buffer)
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark streaming bulk ingestion")
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--format', choices=['ndjson', 'csv'], default='ndjson')
+    parser.add_argument('--invalid-every', type=int, default=1000,
+                        help="Make every Nth row invalid (0 disables)")
+    args = parser.parse_args()
+
+    from app import app
+
+    client = app.test_client()
+    rss_before = peak_rss_mb()
+    content_type = 'application/x-ndjson' if args.format == 'ndjson' else 'text/csv'
+
+    start = time.perf_counter()
+    response = client.post(
+        '/voice/bulk/stream',
+        content_type=content_type,
+        # Bypass the test client's seekable-body handling and read the generator like a chunked upload
+        environ_overrides={
+            'wsgi.input': GeneratedUpload(args.rows, args.format, args.invalid_every),
+            'wsgi.input_terminated': True
+        }
+    )
+    elapsed = time.perf_counter() - start
+
+    result = response.get_json()
+    print(f"Status:          {response.status_code}")
+    print(f"Rows sent:       {args.rows}")
+    print(f"Accepted:        {result.get('accepted_calls')}")
+    print(f"Rejected:        {result.get('rejected_calls')}")
+    print(f"Elapsed:         {elapsed:.2f} s")
+    print(f"Throughput:      {args.rows / elapsed:,.0f} rows/s")
+    print(f"RSS after import: {rss_before:.1f} MB")
+    print(f"Peak RSS:         {peak_rss_mb():.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Benchmark for webhook delivery
+Queues synthetic status events for a number of endpoints on the local
+webhook receiver, then measures how long a running webhook_worker.py takes
+to deliver them all.
+
+The receiver listens on loopback, so the worker must allow private callback
+addresses.
+
+Usage:
+    python benchmarks/webhook_receiver.py --port 8099 &
+    WEBHOOK_ALLOW_PRIVATE_ADDRESSES=true python webhook_worker.py &
+    python benchmarks/bench_webhooks.py --events 100000 --endpoints 50
+"""
+import argparse
+import os
+import sys
+import time
+import uuid
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from redis_client import get_redis
+from webhooks import enqueue_webhook_event
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark webhook delivery throughput")
+    parser.add_argument('--receiver', default='http://127.0.0.1:8099')
+    parser.add_argument('--events', type=int, default=100000)
+    parser.add_argument('--endpoints', type=int, default=50)
+    parser.add_argument('--timeout', type=float, default=600)
+    args = parser.parse_args()
+
+    requests.delete(f"{args.receiver}/stats")
+    pipe = get_redis().pipeline(transaction=False)
+    for i in range(args.events):
+        url = f"{args.receiver}/hooks/{i % args.endpoints}"
+        enqueue_webhook_event(url, {"event": "call.status", "call_id": str(uuid.uuid4()), "status": "completed"}, pipe)
+        if i % 10000 == 9999:
+            pipe.execute()
+    pipe.execute()
+
+    start = time.perf_counter()
+    while time.perf_counter() - start < args.timeout:
+        stats = requests.get(f"{args.receiver}/stats").json()
+        if stats['events'] >= args.events:
+            break
+        time.sleep(0.1)
+    elapsed = time.perf_counter() - start
+
+    print(f"Events delivered:  {stats['events']} / {args.events}")
+    print(f"POST requests:     {stats['requests']} ({stats['events'] / max(stats['requests'], 1):.1f} events/request)")
+    print(f"Failed requests:   {stats['failed_requests']}")
+    print(f"Elapsed:           {elapsed:.2f} s")
+    print(f"Throughput:        {stats['events'] / elapsed:,.0f} events/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Local RTP Receiver
+Receives any number of RTP streams on one port and checks them the way a
+phone would: packets and losses from the sequence numbers, reordering,
+interarrival jitter (RFC 3550) and a CRC of the payload bytes. Answers each
+sender report with a receiver report on the next port, so the sender can
+see its loss and jitter. Prints the per-stream results on Ctrl-C.
+
+Usage:
+    python benchmarks/rtp_receiver.py --port 40000
+    python rtp.py send prompt.wav 127.0.0.1:40000
+"""
+import argparse
+import asyncio
+import socket
+import struct
+import zlib
+
+RTP_HEADER = struct.Struct('!BBHII')
+RTCP_RR = struct.Struct('!BBHIIIIIII')  # Header, our SSRC, then one report block
+SAMPLE_RATE = 8000
+
+
+class StreamState:
+    """What has been received of one SSRC"""
+
+    def __init__(self, sequence, timestamp, payload_type):
+        self.payload_type = payload_type
+        self.first_sequence = sequence
+        self.highest = sequence  # Extended with the number of wraps
+        self.packets = 0
+        self.octets = 0
+        self.reordered = 0
+        self.duplicates = 0
+        self.markers = 0
+        self.jitter = 0.0  # In timestamp units
+        self.transit = None
+        self.crc = 0
+        self.expected_prior = 0
+        self.received_prior = 0
+        self.sender_reports = 0
+        self.bye = False
+
+    def receive(self, sequence, timestamp, marker, payload, arrival):
+        extended = self.highest + ((sequence - self.highest) & 0xFFFF)
+        if extended - self.highest > 0x8000:
+            extended -= 0x10000  # Older than the highest seen
+        if extended <= self.highest and self.packets:
+            if extended == self.highest:
+                self.duplicates += 1
+                return
+            self.reordered += 1
+        else:
+            self.highest = extended
+        self.packets += 1
+        self.octets += len(payload)
+        self.markers += marker
+        # Payloads are only in order without reordering; then the CRC matches the sent audio
+        self.crc = zlib.crc32(payload, self.crc)
+        transit = arrival * SAMPLE_RATE - timestamp
+        if self.transit is not None:
+            delta = abs(transit - self.transit)
+            if delta < 0x80000000:  # Ignore timestamp wraps
+                self.jitter += (delta - self.jitter) / 16
+        self.transit = transit
+
+    @property
+    def expected(self):
+        return self.highest - self.first_sequence + 1
+
+    def report_block(self, ssrc):
+        """Fraction lost since the last report, cumulative lost, highest sequence and jitter"""
+        expected_interval = self.expected - self.expected_prior
+        received_interval = self.packets - self.received_prior
+        self.expected_prior, self.received_prior = self.expected, self.packets
+        lost_interval = expected_interval - received_interval
+        fraction = (lost_interval << 8) // expected_interval if expected_interval and lost_interval > 0 else 0
+        lost = max(min(self.expected - self.packets, 0x7FFFFF), -0x800000) & 0xFFFFFF
+        return ssrc, (fraction << 24) | lost, self.highest & 0xFFFFFFFF, int(self.jitter)
+
+    def summary(self):
+        return {
+            "payload_type": self.payload_type,
+            "packets": self.packets,
+            "octets": self.octets,
+            "expected": self.expected,
+            "lost": self.expected - self.packets,
+            "reordered": self.reordered,
+            "duplicates": self.duplicates,
+            "markers": self.markers,
+            "jitter_ms": self.jitter * 1000 / SAMPLE_RATE,
+            "crc32": self.crc,
+            "sender_reports": self.sender_reports,
+            "bye": self.bye
+        }
+
+
+class RtpReceiver:
+    """RTP on port, RTCP on port + 1, streams told apart by SSRC"""
+
+    def __init__(self):
+        self.streams = {}
+        self.ssrc = 0x5EC0DE
+        self.rtcp_transport = None
+
+    def rtp_received(self, data, arrival):
+        if len(data) < RTP_HEADER.size:
+            return
+        first, second, sequence, timestamp, ssrc = RTP_HEADER.unpack_from(data)
+        offset = RTP_HEADER.size + 4 * (first & 0x0F)  # Skip CSRCs
+        stream = self.streams.get(ssrc)
+        if stream is None:
+            stream = self.streams[ssrc] = StreamState(sequence, timestamp, second & 0x7F)
+        stream.receive(sequence, timestamp, second >> 7, memoryview(data)[offset:], arrival)
+
+    def rtcp_received(self, data, addr):
+        offset = 0
+        while offset + 8 <= len(data):
+            _, packet_type, length, ssrc = struct.unpack_from('!BBHI', data, offset)
+            stream = self.streams.get(ssrc)
+            if stream is not None:
+                if packet_type == 200:
+                    stream.sender_reports += 1
+                    _, lsr_high, lsr_low = struct.unpack_from('!III', data, offset + 4)
+                    lsr = ((lsr_high & 0xFFFF) << 16) | (lsr_low >> 16)
+                    block = stream.report_block(ssrc)
+                    self.rtcp_transport.sendto(RTCP_RR.pack(0x81, 201, 7, self.ssrc, *block, lsr, 0), addr)
+                elif packet_type == 203:
+                    stream.bye = True
+            offset += (length + 1) * 4
+
+    def summary(self):
+        return {ssrc: stream.summary() for ssrc, stream in self.streams.items()}
+
+    def reset(self):
+        self.streams = {}
+
+
+class _Protocol(asyncio.DatagramProtocol):
+    def __init__(self, handler):
+        self.handler = handler
+
+    def datagram_received(self, data, addr):
+        self.handler(data, addr)
+
+
+async def start(receiver, host='127.0.0.1', port=0, buffer_bytes=8 * 1024 * 1024):
+    """Bind the receiver's RTP and RTCP sockets; returns the RTP port"""
+    loop = asyncio.get_running_loop()
+    for _ in range(100):
+        rtp_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        rtcp_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            rtp_sock.bind((host, port))
+            rtcp_sock.bind((host, rtp_sock.getsockname()[1] + 1))
+            break
+        except OSError:
+            rtp_sock.close()
+            rtcp_sock.close()
+            if port:
+                raise
+    rtp_sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, buffer_bytes)
+    await loop.create_datagram_endpoint(
+        lambda: _Protocol(lambda data, addr: receiver.rtp_received(data, loop.time())), sock=rtp_sock
+    )
+    receiver.rtcp_transport, _ = await loop.create_datagram_endpoint(
+        lambda: _Protocol(receiver.rtcp_received), sock=rtcp_sock
+    )
+    return rtp_sock.getsockname()[1]
+
+
+async def serve(host, port):
+    receiver = RtpReceiver()
+    port = await start(receiver, host, port)
+    print(f"Receiving RTP on {host}:{port}, RTCP on {port + 1}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        for ssrc, stream in receiver.summary().items():
+            print(f"SSRC {ssrc:08x}: {stream['packets']} packets, {stream['lost']} lost, "
+                  f"{stream['reordered']} reordered, jitter {stream['jitter_ms']:.2f} ms, "
+                  f"crc32 {stream['crc32']:08x}, {stream['sender_reports']} SR, bye={stream['bye']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local RTP receiver")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=40000)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
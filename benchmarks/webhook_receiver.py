@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Local Webhook Receiver
+Minimal keep-alive HTTP endpoint for webhook throughput benchmarks. Accepts
+batched status callbacks on any path, counts requests and events, and
+serves the counters at GET /stats. Can fail a fraction of requests to
+exercise the retry path.
+
+Usage:
+    python benchmarks/webhook_receiver.py --port 8099 --fail-rate 0.05
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+stats_lock = threading.Lock()
+stats = {"requests": 0, "events": 0, "failed_requests": 0, "started": time.time()}
+
+
+class ReceiverHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep connections alive between batches
+    fail_rate = 0.0
+
+    def _reply(self, status, body=b''):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        payload = self.rfile.read(length)
+        if random.random() < self.fail_rate:
+            with stats_lock:
+                stats["failed_requests"] += 1
+            self._reply(503)
+            return
+        events = json.loads(payload).get('events', [])
+        with stats_lock:
+            stats["requests"] += 1
+            stats["events"] += len(events)
+        self._reply(200)
+
+    def do_GET(self):
+        if self.path != '/stats':
+            self._reply(404)
+            return
+        with stats_lock:
+            body = json.dumps(stats).encode()
+        self._reply(200, body)
+
+    def do_DELETE(self):
+        if self.path == '/stats':
+            with stats_lock:
+                stats.update({"requests": 0, "events": 0, "failed_requests": 0, "started": time.time()})
+        self._reply(204)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local webhook receiver")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--fail-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    ReceiverHandler.fail_rate = args.fail_rate
+    server = ThreadingHTTPServer((args.host, args.port), ReceiverHandler)
+    server.daemon_threads = True
+    print(f"Webhook receiver listening on http://{args.host}:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
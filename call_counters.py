@@ -0,0 +1,74 @@
+"""
+Call Counters
+Per-status call counts kept in Redis and updated on every status transition,
+so metrics are served in constant time instead of counting the calls table.
+Counters are periodically reconciled against Postgres to correct any drift.
+"""
+import logging
+import time
+
+from sqlalchemy import func
+
+from models import db, Call
+from redis_client import get_redis, get_broker_redis
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+COUNTERS_KEY = 'metrics:calls'
+CALL_STATUSES = ('pending', 'processing', 'completed', 'failed')
+
+# Kombu's Redis transport keeps waiting messages in a list named after the
+# queue and unacknowledged (in-flight, with acks_late) messages in a hash
+BROKER_QUEUE = 'celery'
+BROKER_UNACKED = 'unacked'
+
+
+def count_new_calls(count, pipe):
+    """Count newly created pending calls on a Redis pipeline"""
+    pipe.hincrby(COUNTERS_KEY, 'total', count)
+    pipe.hincrby(COUNTERS_KEY, 'pending', count)
+
+
+def count_transition(from_status, to_status, pipe):
+    """Move one call between status counters on a Redis pipeline"""
+    pipe.hincrby(COUNTERS_KEY, from_status, -1)
+    pipe.hincrby(COUNTERS_KEY, to_status, 1)
+
+
+def reconcile_call_counters():
+    """
+    Reset the counters from a single grouped count over the calls table.
+    Transitions committed while the count runs may be off by a few until
+    the next reconciliation. Must run inside an application context.
+    """
+    rows = db.session.query(Call.status, func.count()).group_by(Call.status).all()
+    counts = {status: 0 for status in CALL_STATUSES}
+    counts.update({status: count for status, count in rows})
+    counts['total'] = sum(count for _, count in rows)
+    get_redis().hset(COUNTERS_KEY, mapping={**counts, 'reconciled_at': int(time.time())})
+    logger.info(f"Reconciled call counters: {counts}")
+    return counts
+
+
+def read_call_counters():
+    """
+    Return the per-status and total call counts. They are seeded from
+    Postgres when they have never been reconciled (first use, or after the
+    hash was lost and recreated by increments alone).
+    """
+    fields = get_redis().hgetall(COUNTERS_KEY)
+    if 'reconciled_at' not in fields:
+        return reconcile_call_counters()
+    counts = {status: 0 for status in (*CALL_STATUSES, 'total')}
+    counts.update({field: int(fields[field]) for field in counts if field in fields})
+    return counts
+
+
+def read_queue_depths():
+    """Return the number of tasks waiting in the broker and held unacknowledged by workers"""
+    pipe = get_broker_redis().pipeline(transaction=False)
+    pipe.llen(BROKER_QUEUE)
+    pipe.hlen(BROKER_UNACKED)
+    queued, in_flight = pipe.execute()
+    return {"queued": queued, "in_flight": in_flight}
@@ -0,0 +1,48 @@
+"""
+Call Events
+Single entry point for call creation and status transitions. Writes the
+status cache, updates the status counters, publishes the event to SSE
+subscribers and queues status callbacks in one Redis round trip.
+"""
+import json
+import logging
+
+from admission import count_finished_call
+from call_counters import count_new_calls, count_transition
+from event_stream import publish_status_event
+from redis_client import get_redis
+from status_cache import populate_call_statuses, write_call_status
+from webhooks import build_status_event, enqueue_webhook_event
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+def record_new_calls(calls):
+    """Record newly created pending calls (Call.to_dict() shaped)"""
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        # Written after the insert commits, so never over a transition a worker already cached
+        populate_call_statuses(calls, pipe=pipe)
+        count_new_calls(len(calls), pipe)
+        pipe.execute()
+    except Exception as e:
+        logger.error(f"Failed to record {len(calls)} new calls: {str(e)}")
+
+
+def record_call_status(call, previous_status):
+    """Record a status transition of a Call made by the task pipeline"""
+    call_data = call.to_dict()
+    event = build_status_event(call_data)
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        write_call_status([call_data], pipe=pipe)
+        count_transition(previous_status, call.status, pipe)
+        if call.status in ('completed', 'failed'):
+            count_finished_call(pipe)
+        publish_status_event(call_data, json.dumps(event), pipe, api_key_id=call.api_key_id)
+        if call.status_callback_url:
+            enqueue_webhook_event(call.status_callback_url, event, pipe)
+        pipe.execute()
+    except Exception as e:
+        logger.error(f"Failed to record status event for call {call_data['id']}: {str(e)}")
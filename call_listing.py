@@ -0,0 +1,92 @@
+"""
+Call Listing
+Filtered call listing with keyset pagination on (created_at, id), newest
+first. Each page is one index range scan, so page 10,000 costs the same as page 1
+"""
+import base64
+import binascii
+import uuid
+from datetime import datetime, timezone
+
+from models import db, Call
+
+CALL_LIST_DEFAULT_LIMIT = 50
+CALL_LIST_MAX_LIMIT = 500
+CALL_LIST_STATUSES = ('pending', 'processing', 'completed', 'failed')
+
+# Compact projection returned per call; error details stay behind /voice/status
+LISTED_COLUMNS = (
+    Call.id, Call.status, Call.to_number, Call.from_number, Call.campaign_id,
+    Call.created_at, Call.completed_at, Call.duration
+)
+
+
+def encode_cursor(created_at, call_id):
+    """Opaque cursor pointing just past the given row"""
+    raw = f"{created_at.isoformat()}|{call_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (created_at, call_id) from a cursor. Raises ValueError if it is malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, call_id = raw.split('|')
+        return datetime.fromisoformat(created_at), uuid.UUID(call_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def parse_timestamp(value):
+    """Parse an ISO 8601 filter bound into naive UTC, as created_at is stored"""
+    moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+def list_calls(status=None, since=None, until=None, to_number=None, from_number=None,
+               campaign_id=None, api_key_id=None, cursor=None, limit=CALL_LIST_DEFAULT_LIMIT):
+    """
+    Return (calls, next_cursor) for one page of calls matching the filters,
+    newest first. next_cursor is None on the last page. With api_key_id,
+    only calls submitted with that key are listed.
+    """
+    query = db.select(*LISTED_COLUMNS)
+    if api_key_id:
+        query = query.where(Call.api_key_id == api_key_id)
+    if status:
+        query = query.where(Call.status == status)
+    if since:
+        query = query.where(Call.created_at >= since)
+    if until:
+        query = query.where(Call.created_at < until)
+    if to_number:
+        query = query.where(Call.to_number == to_number)
+    if from_number:
+        query = query.where(Call.from_number == from_number)
+    if campaign_id:
+        query = query.where(Call.campaign_id == campaign_id)
+    if cursor:
+        query = query.where(db.tuple_(Call.created_at, Call.id) < db.tuple_(*decode_cursor(cursor)))
+
+    # One extra row tells whether another page follows
+    rows = db.session.execute(
+        query.order_by(Call.created_at.desc(), Call.id.desc()).limit(limit + 1)
+    ).all()
+    next_cursor = encode_cursor(rows[limit - 1].created_at, rows[limit - 1].id) if len(rows) > limit else None
+
+    calls = [
+        {
+            'id': str(row.id),
+            'status': row.status,
+            'to_number': row.to_number,
+            'from_number': row.from_number,
+            'campaign_id': row.campaign_id,
+            'created_at': row.created_at.isoformat() if row.created_at else None,
+            'completed_at': row.completed_at.isoformat() if row.completed_at else None,
+            'duration': row.duration
+        }
+        for row in rows[:limit]
+    ]
+    return calls, next_cursor
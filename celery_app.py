@@ -3,6 +3,7 @@ Celery App Configuration
 Separate module to avoid circular imports
 """
 from celery import Celery
+from celery.signals import worker_init, worker_process_shutdown
 from dotenv import load_dotenv
 import os
 
@@ -24,9 +25,40 @@ celery_app.conf.update(
     worker_prefetch_multiplier=1,
     task_acks_late=True,
     worker_max_tasks_per_child=1000,
-    include=['tasks']  # This tells Celery to include tasks from tasks.py
+    include=['tasks'],  # This tells Celery to include tasks from tasks.py
+    beat_schedule={
+        'reconcile-call-counters': {
+            'task': 'tasks.reconcile_call_counters_task',
+            'schedule': float(os.getenv('CALL_COUNTER_RECONCILE_INTERVAL', 300)),
+        },
+        'maintain-call-partitions': {
+            'task': 'tasks.maintain_call_partitions_task',
+            'schedule': 86400.0,
+        },
+        'compact-dnc-list': {
+            'task': 'tasks.compact_dnc_task',
+            'schedule': 3600.0,
+        },
+    }
 )
 
+# Prometheus: export from the worker's main process when a port is given;
+# prefork children share samples through PROMETHEUS_MULTIPROC_DIR
+@worker_init.connect
+def start_worker_metrics(**kwargs):
+    """Start the worker's Prometheus exporter if CELERY_METRICS_PORT is set"""
+    port = os.getenv('CELERY_METRICS_PORT')
+    if port:
+        from instrumentation import start_metrics_server
+        start_metrics_server(int(port))
+
+
+@worker_process_shutdown.connect
+def mark_worker_process_dead(pid=None, **kwargs):
+    """Drop an exited pool process's live gauges"""
+    from instrumentation import mark_process_dead
+    mark_process_dead(pid or os.getpid())
+
 # Add current directory to Python path to ensure modules can be imported
 import sys
 if '/app' not in sys.path:
@@ -48,8 +80,5 @@ flask_app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 from models import db
 db.init_app(flask_app)
 
-# Import tasks to register them
-try:
-    import tasks
-except ImportError as e:
-    print(f"Warning: Could not import tasks: {e}")
+# Tasks are registered by the worker through include=['tasks']; the outbox
+# relay and beat send them by name and never load the TTS and SIP code
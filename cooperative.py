@@ -0,0 +1,41 @@
+"""
+Cooperative I/O for the gevent Workers
+Makes every blocking call of the API's request path yield to the other
+greenlets of a gunicorn worker: the standard library (sockets for Redis,
+locks, sleeps) is monkey-patched and psycopg2, whose C library does its own
+socket I/O, waits for Postgres in the gevent hub.
+"""
+_patched = False
+
+
+def gevent_wait_callback(conn, timeout=None):
+    """psycopg2 wait callback polling the connection from the gevent hub"""
+    from gevent.socket import wait_read, wait_write
+    from psycopg2 import OperationalError, extensions
+
+    while True:
+        state = conn.poll()
+        if state == extensions.POLL_OK:
+            break
+        elif state == extensions.POLL_READ:
+            wait_read(conn.fileno(), timeout=timeout)
+        elif state == extensions.POLL_WRITE:
+            wait_write(conn.fileno(), timeout=timeout)
+        else:
+            raise OperationalError(f"Bad result from poll: {state!r}")
+
+
+def patch_all():
+    """
+    Patch the standard library and psycopg2 for gevent. Must run before the
+    app is imported: locks and threads created at import time would
+    otherwise be real ones, which a greenlet blocks the whole worker on.
+    """
+    global _patched
+    if _patched:
+        return
+    from gevent import monkey
+    monkey.patch_all()
+    from psycopg2 import extensions
+    extensions.set_wait_callback(gevent_wait_callback)
+    _patched = True
@@ -0,0 +1,444 @@
+#!/usr/bin/env python3
+"""
+Do-Not-Call Suppression Index
+Suppressed numbers are kept as a sorted array of uint64 in a memory-mapped
+base file, which every gunicorn and Celery process on the host shares through
+the page cache (8 bytes per number). Additions and removals since the last
+compaction go to an append-only delta log that each process tails, so updates
+apply without reloading the base. Compaction merges the delta into a new base.
+Each base file carries a random generation id and the delta log names the
+generation it applies to, so a reader never pairs a new base with the old
+log (or the reverse) while compaction is replacing the two files.
+
+Usage:
+    python dnc.py load national_dnc.txt     # Replace the list with a file of numbers, one per line
+    python dnc.py add +12125550100 ...      # Add numbers
+    python dnc.py remove +12125550100 ...   # Remove numbers
+    python dnc.py check +12125550100 ...    # Look numbers up
+    python dnc.py compact                   # Merge the delta log into the base file
+    python dnc.py stats
+"""
+import argparse
+import bisect
+import fcntl
+import heapq
+import logging
+import mmap
+import os
+import re
+import struct
+import sys
+import tempfile
+import threading
+import time
+from array import array
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+DNC_DIR = os.getenv('DNC_DIR', os.path.join(os.getcwd(), 'dnc_data'))
+DNC_DEFAULT_COUNTRY_CODE = os.getenv('DNC_DEFAULT_COUNTRY_CODE', '1')  # Prefixed to 10-digit national numbers
+DNC_REFRESH_INTERVAL = float(os.getenv('DNC_REFRESH_INTERVAL', 1))  # Seconds between checks for updates
+DNC_COMPACT_THRESHOLD = int(os.getenv('DNC_COMPACT_THRESHOLD', 100000))  # Delta records before compaction
+
+BASE_FILE = 'dnc.base'
+DELTA_FILE = 'dnc.delta'
+LOCK_FILE = 'dnc.lock'
+SORT_CHUNK = 2000000  # Numbers sorted in memory at a time while loading a list
+
+# Base file: the generation id, then the sorted numbers
+BASE_HEADER_SIZE = 8
+NO_BASE_GENERATION = bytes(BASE_HEADER_SIZE)  # Generation a delta log gets while there is no base file
+# Delta log: a random id of the log and the generation of the base it
+# applies to, then records of one operation byte and the number
+DELTA_ID_SIZE = 8
+DELTA_HEADER_SIZE = DELTA_ID_SIZE + BASE_HEADER_SIZE
+DELTA_RECORD = struct.Struct('<cQ')
+SWITCH_ATTEMPTS = 5  # Reads of a mismatched base and delta log before keeping the previous list
+OP_ADD = b'+'
+OP_REMOVE = b'-'
+
+NON_DIGITS = re.compile(r'\D')
+
+
+def normalize_number(number):
+    """Return the number as an integer of E.164 digits, or None if it has no plausible digits"""
+    digits = NON_DIGITS.sub('', str(number))
+    if len(digits) == 10 and not str(number).lstrip().startswith('+'):
+        digits = DNC_DEFAULT_COUNTRY_CODE + digits
+    if not 7 <= len(digits) <= 15:
+        return None
+    return int(digits)
+
+
+class DNCIndex:
+    """Read side of the suppression list, one per process"""
+
+    def __init__(self, directory=DNC_DIR):
+        self.directory = directory
+        self.base_path = os.path.join(directory, BASE_FILE)
+        self.delta_path = os.path.join(directory, DELTA_FILE)
+        self.lock = threading.Lock()
+        self.base = ()
+        self.base_id = None
+        self.base_generation = NO_BASE_GENERATION
+        self.delta = {}  # number -> True if added, False if removed since the base was written
+        self.delta_header = None
+        self.delta_offset = 0
+        self.next_refresh = 0
+
+    def _open_base(self):
+        """(file id, generation, numbers) of the current base file, reusing the mapping while it is unchanged"""
+        try:
+            f = open(self.base_path, 'rb')
+        except FileNotFoundError:
+            return None, NO_BASE_GENERATION, ()
+        with f:
+            stat = os.fstat(f.fileno())
+            base_id = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            if base_id == self.base_id:
+                return base_id, self.base_generation, self.base
+            # The previous mapping is unmapped once no lookup references it
+            values = memoryview(mmap.mmap(f.fileno(), stat.st_size, access=mmap.ACCESS_READ)).cast('Q')
+        return base_id, values[:1].tobytes(), values[1:]
+
+    def _read_delta(self, generation):
+        """
+        (delta, header, offset) after reading new records of the delta log, or
+        None if the log belongs to another base generation
+        """
+        try:
+            fd = os.open(self.delta_path, os.O_RDONLY)
+        except FileNotFoundError:
+            return {}, None, 0
+        try:
+            size = os.fstat(fd).st_size
+            header = os.pread(fd, DELTA_HEADER_SIZE, 0)
+            if header[DELTA_ID_SIZE:] != generation:
+                return None
+            delta, offset = self.delta, self.delta_offset
+            if header != self.delta_header or size < offset:
+                # A new log written by compaction
+                delta, offset = {}, len(header)
+            data = os.pread(fd, size - offset, offset)
+        finally:
+            os.close(fd)
+        usable = len(data) - len(data) % DELTA_RECORD.size  # Skip a record still being written
+        if usable:
+            # Swapped in whole so lookups in other threads never see a dict being resized
+            delta = dict(delta)
+            for op, number in DELTA_RECORD.iter_unpack(data[:usable]):
+                delta[number] = op == OP_ADD
+            offset += usable
+        return delta, header, offset
+
+    def refresh(self, force=False):
+        """Pick up a new base file and new delta records, at most every DNC_REFRESH_INTERVAL"""
+        now = time.monotonic()
+        if not force and now < self.next_refresh:
+            return
+        with self.lock:
+            self.next_refresh = now + DNC_REFRESH_INTERVAL
+            for _ in range(SWITCH_ATTEMPTS):
+                base_id, generation, base = self._open_base()
+                delta = self._read_delta(generation)
+                if delta is not None:
+                    break
+                time.sleep(0.001)  # Compaction has replaced the base file but not the delta log yet
+            else:
+                logger.warning("Do-not-call base file and delta log are of different generations, "
+                               "keeping the previous list")
+                return
+            self.base, self.base_id, self.base_generation = base, base_id, generation
+            self.delta, self.delta_header, self.delta_offset = delta
+
+    def _in_base(self, number):
+        base = self.base
+        position = bisect.bisect_left(base, number)
+        return position < len(base) and base[position] == number
+
+    def contains(self, number):
+        """Whether a phone number is suppressed"""
+        self.refresh()
+        value = normalize_number(number)
+        if value is None:
+            return False
+        suppressed = self.delta.get(value)
+        if suppressed is None:
+            return self._in_base(value)
+        return suppressed
+
+    def suppressed(self, numbers):
+        """Return the set of numbers, as given, that are suppressed"""
+        self.refresh()
+        delta = self.delta
+        result = set()
+        for number in numbers:
+            value = normalize_number(number)
+            if value is None:
+                continue
+            suppressed = delta.get(value)
+            if suppressed or (suppressed is None and self._in_base(value)):
+                result.add(number)
+        return result
+
+    def stats(self):
+        """Sizes of the base file and the delta log"""
+        self.refresh(force=True)
+        return {
+            "base_numbers": len(self.base),
+            "base_bytes": len(self.base) * 8,
+            "delta_records": max(self.delta_offset - DELTA_HEADER_SIZE, 0) // DELTA_RECORD.size,
+            "delta_numbers": len(self.delta)
+        }
+
+
+class _ListLock:
+    """Exclusive lock serializing writers and compaction across processes"""
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, LOCK_FILE)
+
+    def __enter__(self):
+        self.file = open(self.path, 'a')
+        fcntl.flock(self.file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        fcntl.flock(self.file, fcntl.LOCK_UN)
+        self.file.close()
+
+
+def _new_delta(generation, directory):
+    """Write an empty delta log for a base generation to a temporary file"""
+    fd, path = tempfile.mkstemp(dir=directory, prefix='dnc-')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(os.urandom(DELTA_ID_SIZE) + generation)
+        f.flush()
+        os.fsync(f.fileno())
+    os.chmod(path, 0o644)  # mkstemp creates files readable by the owner only
+    return path
+
+
+def _ensure_delta(directory):
+    """
+    Make sure the delta log belongs to the current base file; caller holds
+    the lock. A log of another generation was left by a switch interrupted
+    between its two renames, and its records are already in the base.
+    """
+    try:
+        with open(os.path.join(directory, BASE_FILE), 'rb') as f:
+            generation = f.read(BASE_HEADER_SIZE)
+    except FileNotFoundError:
+        generation = NO_BASE_GENERATION
+    delta_path = os.path.join(directory, DELTA_FILE)
+    try:
+        with open(delta_path, 'rb') as f:
+            header = f.read(DELTA_HEADER_SIZE)
+    except FileNotFoundError:
+        header = None
+    if header is not None and header[DELTA_ID_SIZE:] == generation:
+        return
+    if header is not None:
+        logger.warning("Replacing a do-not-call delta log left by an interrupted compaction")
+    os.replace(_new_delta(generation, directory), delta_path)
+
+
+def _append_delta(op, numbers, directory):
+    values = {normalize_number(number) for number in numbers}
+    values.discard(None)
+    if not values:
+        return 0
+    records = b''.join(DELTA_RECORD.pack(op, value) for value in values)
+    with _ListLock(directory):
+        _ensure_delta(directory)
+        with open(os.path.join(directory, DELTA_FILE), 'ab') as f:
+            f.write(records)
+            f.flush()
+            os.fsync(f.fileno())
+    return len(values)
+
+
+def add_numbers(numbers, directory=DNC_DIR):
+    """Suppress numbers. Returns how many valid numbers were recorded"""
+    return _append_delta(OP_ADD, numbers, directory)
+
+
+def remove_numbers(numbers, directory=DNC_DIR):
+    """Lift the suppression of numbers. Returns how many valid numbers were recorded"""
+    return _append_delta(OP_REMOVE, numbers, directory)
+
+
+def _write_sorted(values, directory, header=b''):
+    """Write header and an ascending iterator of integers to a temporary file, dropping duplicates"""
+    fd, path = tempfile.mkstemp(dir=directory, prefix='dnc-')
+    count = 0
+    previous = None
+    buffer = array('Q')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(header)
+        for value in values:
+            if value == previous:
+                continue
+            buffer.append(value)
+            previous = value
+            if len(buffer) >= SORT_CHUNK:
+                buffer.tofile(f)
+                count += len(buffer)
+                buffer = array('Q')
+        buffer.tofile(f)
+        count += len(buffer)
+        f.flush()
+        os.fsync(f.fileno())
+    return path, count
+
+
+def _iter_file(path):
+    """Iterate over the uint64 values of a sorted run file"""
+    with open(path, 'rb') as f:
+        while True:
+            chunk = array('Q')
+            chunk.frombytes(f.read(SORT_CHUNK // 4 * 8))
+            if not chunk:
+                return
+            yield from chunk
+
+
+def _write_base(values, directory):
+    """Write a base file of a new generation to a temporary file. Returns (path, generation, count)"""
+    generation = os.urandom(BASE_HEADER_SIZE)
+    path, count = _write_sorted(values, directory, header=generation)
+    return path, generation, count
+
+
+def _install_base(path, generation, directory):
+    """
+    Replace the base file and start an empty delta log for its generation;
+    caller holds the lock. Readers only pair files of the same generation,
+    so they keep the previous list until both are replaced.
+    """
+    empty_delta = _new_delta(generation, directory)
+    os.chmod(path, 0o644)  # mkstemp creates files readable by the owner only
+    os.replace(path, os.path.join(directory, BASE_FILE))
+    os.replace(empty_delta, os.path.join(directory, DELTA_FILE))
+
+
+def load_numbers(numbers, directory=DNC_DIR):
+    """
+    Replace the whole list with numbers (any iterable, e.g. an open file).
+    Sorted runs of SORT_CHUNK numbers are merged on disk, so memory stays
+    bounded for lists of any size. Returns the number of distinct numbers.
+    """
+    os.makedirs(directory, exist_ok=True)
+    runs = []
+    try:
+        chunk = []
+        for number in numbers:
+            value = normalize_number(number)
+            if value is not None:
+                chunk.append(value)
+            if len(chunk) >= SORT_CHUNK:
+                chunk.sort()
+                runs.append(_write_sorted(chunk, directory)[0])
+                chunk = []
+        chunk.sort()
+        runs.append(_write_sorted(chunk, directory)[0])
+        del chunk
+
+        with _ListLock(directory):
+            path, generation, count = _write_base(heapq.merge(*[_iter_file(run) for run in runs]), directory)
+            _install_base(path, generation, directory)
+    finally:
+        for run in runs:
+            os.unlink(run)
+    logger.info(f"Loaded {count:,} do-not-call numbers")
+    return count
+
+
+def compact(directory=DNC_DIR):
+    """Merge the delta log into a new base file. Returns the number of numbers in it"""
+    with _ListLock(directory):
+        _ensure_delta(directory)
+        index = DNCIndex(directory)
+        index.refresh(force=True)
+        if not index.delta:
+            return len(index.base)
+        added = sorted(number for number, present in index.delta.items() if present)
+        removed = {number for number, present in index.delta.items() if not present}
+        merged = (number for number in heapq.merge(index.base, added) if number not in removed)
+        path, generation, count = _write_base(merged, directory)
+        _install_base(path, generation, directory)
+    logger.info(f"Compacted do-not-call list: {count:,} numbers")
+    return count
+
+
+def compact_if_needed(directory=DNC_DIR, threshold=DNC_COMPACT_THRESHOLD):
+    """Compact when the delta log holds at least threshold records"""
+    try:
+        size = os.path.getsize(os.path.join(directory, DELTA_FILE))
+    except FileNotFoundError:
+        return False
+    if (size - DELTA_HEADER_SIZE) // DELTA_RECORD.size < threshold:
+        return False
+    compact(directory)
+    return True
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_dnc_index():
+    """Return the process-wide index, opened on first use"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = DNCIndex()
+    return _index
+
+
+def is_suppressed(number):
+    """Whether number is on the do-not-call list"""
+    return get_dnc_index().contains(number)
+
+
+def suppressed_numbers(numbers):
+    """Subset of numbers on the do-not-call list, with one index refresh for the whole batch"""
+    return get_dnc_index().suppressed(numbers)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Manage the do-not-call suppression list")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    load = subparsers.add_parser('load', help="Replace the list with the numbers in a file")
+    load.add_argument('path')
+    for command in ('add', 'remove', 'check'):
+        subparsers.add_parser(command).add_argument('numbers', nargs='+')
+    subparsers.add_parser('compact', help="Merge the delta log into the base file")
+    subparsers.add_parser('stats')
+    args = parser.parse_args()
+
+    if args.command == 'load':
+        with open(args.path) as f:
+            load_numbers(line.split(',')[0] for line in f)
+    elif args.command == 'add':
+        print(f"Added {add_numbers(args.numbers)} numbers")
+    elif args.command == 'remove':
+        print(f"Removed {remove_numbers(args.numbers)} numbers")
+    elif args.command == 'check':
+        blocked = suppressed_numbers(args.numbers)
+        for number in args.numbers:
+            print(f"{number}: {'suppressed' if number in blocked else 'allowed'}")
+    elif args.command == 'compact':
+        compact()
+    else:
+        for name, value in get_dnc_index().stats().items():
+            print(f"{name:15} {value:,}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,148 @@
+"""
+Call Event Streams
+Server-Sent Events fan-out for call status transitions. Each API process
+holds a single Redis pub/sub connection, subscribed only to the channels
+its clients are watching, and fans messages out to per-client queues. Under
+the gevent gunicorn workers every client is a cheap greenlet, not a thread.
+"""
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+
+from redis_client import get_redis
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+SSE_HEARTBEAT_INTERVAL = float(os.getenv('SSE_HEARTBEAT_INTERVAL', 15))
+SSE_CLIENT_QUEUE_SIZE = int(os.getenv('SSE_CLIENT_QUEUE_SIZE', 256))
+
+CHANNEL_PREFIX = 'events:'
+
+
+def call_channel(call_id):
+    """Pub/sub channel carrying a single call's status events"""
+    return f"{CHANNEL_PREFIX}call:{call_id}"
+
+
+def campaign_channel(campaign_id, api_key_id=None):
+    """
+    Pub/sub channel carrying status events of every call in a campaign.
+    Campaign IDs are chosen by clients, so each API key (or no key) has its
+    own channel and a subscriber only sees the calls its key submitted.
+    """
+    return f"{CHANNEL_PREFIX}campaign:{api_key_id or '-'}:{campaign_id}"
+
+
+def api_key_channel(api_key_id):
+    """Pub/sub channel carrying status events of every call submitted with an API key"""
+    return f"{CHANNEL_PREFIX}key:{api_key_id}"
+
+
+def publish_status_event(call_data, event_json, pipe, api_key_id=None):
+    """Publish a serialized status event to every channel the call belongs to"""
+    pipe.publish(call_channel(call_data['id']), event_json)
+    if call_data.get('campaign_id'):
+        pipe.publish(campaign_channel(call_data['campaign_id'], api_key_id), event_json)
+    if api_key_id:
+        pipe.publish(api_key_channel(api_key_id), event_json)
+
+
+class EventHub:
+    """Per-process fan-out of Redis pub/sub messages to local subscriber queues"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = defaultdict(set)
+        self.pubsub = None
+        self.listener = None
+
+    def _ensure_listener(self):
+        """Start the pub/sub listener on first use (after any gunicorn fork)"""
+        if self.listener is None:
+            self.pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+            self.listener = threading.Thread(target=self._listen, name='event-hub', daemon=True)
+            self.listener.start()
+
+    def subscribe(self, channel):
+        """Register a new subscriber queue for channel"""
+        client_queue = queue.Queue(maxsize=SSE_CLIENT_QUEUE_SIZE)
+        with self.lock:
+            self._ensure_listener()
+            if not self.subscribers[channel]:
+                self.pubsub.subscribe(channel)
+            self.subscribers[channel].add(client_queue)
+        return client_queue
+
+    def unsubscribe(self, channel, client_queue):
+        """Remove a subscriber queue, dropping the Redis subscription with the last one"""
+        with self.lock:
+            subscribers = self.subscribers.get(channel)
+            if subscribers is None:
+                return
+            subscribers.discard(client_queue)
+            if not subscribers:
+                del self.subscribers[channel]
+                try:
+                    self.pubsub.unsubscribe(channel)
+                except Exception as e:
+                    logger.warning(f"Failed to unsubscribe from {channel}: {str(e)}")
+
+    def _listen(self):
+        """Deliver pub/sub messages to subscriber queues, dropping them for clients that fall behind"""
+        while True:
+            try:
+                message = self.pubsub.get_message(timeout=1.0)
+                if message is None or message['type'] != 'message':
+                    continue
+                with self.lock:
+                    targets = list(self.subscribers.get(message['channel'], ()))
+                for client_queue in targets:
+                    try:
+                        client_queue.put_nowait(message['data'])
+                    except queue.Full:
+                        logger.warning(f"Dropping event for slow subscriber on {message['channel']}")
+            except Exception as e:
+                logger.error(f"Event hub listener error: {str(e)}")
+                time.sleep(1)
+
+
+event_hub = EventHub()
+
+
+def format_sse(data, event='status'):
+    """Format one Server-Sent Events message"""
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+def stream_events(channel, snapshot=None, until_status=None):
+    """
+    Yield SSE messages for channel until the client disconnects. A comment
+    line is sent when idle so proxies keep the connection open. For a single
+    call stream, pass a snapshot callable returning the current status event
+    (called after subscribing, so no transition is missed) and the terminal
+    statuses as until_status to close the stream when the call finishes.
+    """
+    client_queue = event_hub.subscribe(channel)
+    try:
+        yield "retry: 3000\n\n"
+        initial_event = snapshot() if snapshot else None
+        if initial_event is not None:
+            yield format_sse(json.dumps(initial_event))
+            if until_status and initial_event.get('status') in until_status:
+                return
+        while True:
+            try:
+                data = client_queue.get(timeout=SSE_HEARTBEAT_INTERVAL)
+            except queue.Empty:
+                yield ": keepalive\n\n"
+                continue
+            yield format_sse(data)
+            if until_status and json.loads(data).get('status') in until_status:
+                return
+    finally:
+        event_hub.unsubscribe(channel, client_queue)
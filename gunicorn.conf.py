@@ -4,6 +4,7 @@ Optimized for high-performance telecom workloads
 """
 import multiprocessing
 import os
+import sys
 
 # Server socket
 bind = f"0.0.0.0:{os.getenv('PORT', 5000)}"
@@ -12,11 +13,18 @@ backlog = 2048
 # Worker processes
 workers = multiprocessing.cpu_count() * 2 + 1  # Recommended formula
 worker_class = "gevent"  # Async worker for I/O intensive tasks
-worker_connections = 1000  # Max concurrent connections per worker
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 1000))  # Max concurrent connections (incl. SSE streams) per worker
 max_requests = 10000  # Restart workers after handling this many requests
 max_requests_jitter = 1000  # Randomize restart to avoid thundering herd
 preload_app = True  # Load application before forking workers
 
+# Patch blocking I/O (Redis sockets, psycopg2, locks) before the app is
+# preloaded, so a slow dependency only parks the greenlet waiting on it
+if worker_class == "gevent":
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from cooperative import patch_all
+    patch_all()
+
 # Timeouts
 timeout = 120  # Worker timeout (important for long SIP calls)
 keepalive = 2
@@ -45,3 +53,9 @@ limit_request_field_size = 8190
 
 # For debugging (disable in production)
 reload = os.getenv('DEBUG', 'false').lower() == 'true'
+
+
+def child_exit(server, worker):
+    """Drop an exited worker's live gauges from the Prometheus multiprocess directory"""
+    from instrumentation import mark_process_dead
+    mark_process_dead(worker.pid)
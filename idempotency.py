@@ -0,0 +1,94 @@
+"""
+Idempotency Keys
+Redis-backed deduplication of call submissions so client retries never
+create duplicate calls, even when they race across gunicorn workers. Keys
+are scoped to the submitting API key, so tenants cannot collide on them.
+"""
+import logging
+import os
+
+from redis_client import get_redis
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_TTL = int(os.getenv('IDEMPOTENCY_TTL', 86400))  # 24 hours
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+KEY_PREFIX = 'idem:'
+
+# Return the call ID already bound to the key, or bind ours and return nil.
+# Runs atomically in Redis, so concurrent duplicates see exactly one winner.
+CLAIM_SCRIPT = """
+local existing = redis.call('GET', KEYS[1])
+if existing then
+    return existing
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+return false
+"""
+
+# Delete the key only if it is still bound to our call ID
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+_claim_script = None
+_release_script = None
+
+
+def _scripts():
+    """Register the Lua scripts once per process"""
+    global _claim_script, _release_script
+    if _claim_script is None:
+        client = get_redis()
+        _claim_script = client.register_script(CLAIM_SCRIPT)
+        _release_script = client.register_script(RELEASE_SCRIPT)
+    return _claim_script, _release_script
+
+
+def _redis_key(key, api_key_id):
+    """Redis key of an idempotency key submitted with an API key, or without one"""
+    return f"{KEY_PREFIX}{api_key_id or '-'}:{key}"
+
+
+def validate_idempotency_key(key):
+    """Return an error message for an unusable key, or None"""
+    if not isinstance(key, str) or not key:
+        return "Idempotency key must be a non-empty string"
+    if len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+        return f"Idempotency key exceeds {IDEMPOTENCY_KEY_MAX_LENGTH} characters"
+    return None
+
+
+def claim_idempotency_key(key, call_id, api_key_id=None):
+    """Bind key to call_id. Returns the original call ID if the key was already used, else None"""
+    claim, _ = _scripts()
+    return claim(keys=[_redis_key(key, api_key_id)], args=[call_id, IDEMPOTENCY_TTL])
+
+
+def claim_idempotency_keys(pairs, api_key_id=None):
+    """Claim many (key, call_id) pairs in one round trip. Returns original call IDs or None per pair"""
+    if not pairs:
+        return []
+    claim, _ = _scripts()
+    pipe = get_redis().pipeline(transaction=False)
+    for key, call_id in pairs:
+        claim(keys=[_redis_key(key, api_key_id)], args=[call_id, IDEMPOTENCY_TTL], client=pipe)
+    return pipe.execute()
+
+
+def release_idempotency_keys(pairs, api_key_id=None):
+    """Release (key, call_id) pairs whose submission failed so a retry can proceed"""
+    if not pairs:
+        return
+    try:
+        _, release = _scripts()
+        pipe = get_redis().pipeline(transaction=False)
+        for key, call_id in pairs:
+            release(keys=[_redis_key(key, api_key_id)], args=[call_id], client=pipe)
+        pipe.execute()
+    except Exception as e:
+        logger.error(f"Failed to release idempotency keys: {str(e)}")
@@ -0,0 +1,336 @@
+"""
+Streaming Call Ingestion
+Incremental NDJSON/CSV parsing with batched database writes, so very large
+call uploads are processed with flat memory regardless of request size
+"""
+import csv
+import json
+import logging
+import os
+import uuid
+from datetime import datetime
+
+from models import db, Call, CallOutbox
+from call_events import record_new_calls
+from message_store import store_messages
+from dnc import suppressed_numbers
+from idempotency import validate_idempotency_key, claim_idempotency_keys, release_idempotency_keys
+from webhooks import validate_callback_url
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Ingestion settings
+INGEST_BATCH_SIZE = int(os.getenv('INGEST_BATCH_SIZE', 1000))
+INGEST_READ_SIZE = int(os.getenv('INGEST_READ_SIZE', 64 * 1024))
+INGEST_MAX_LINE_BYTES = int(os.getenv('INGEST_MAX_LINE_BYTES', 64 * 1024))
+INGEST_MAX_REJECTS = int(os.getenv('INGEST_MAX_REJECTS', 1000))
+
+REQUIRED_FIELDS = ['ToNumber', 'FromNumber', 'Text']
+NUMBER_MAX_LENGTH = 20  # Matches Call.to_number / Call.from_number
+CAMPAIGN_ID_MAX_LENGTH = 36  # Matches Call.campaign_id
+AUDIO_URL_MAX_LENGTH = 500  # Matches Call.audio_url
+
+
+class IngestStopped(Exception):
+    """
+    Raised by a throttle to end an upload early, e.g. when the backlog has no
+    room. ingest_calls re-raises it with result set to the rows written so far.
+    """
+
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+        self.result = None
+
+
+def validate_call_data(call_data):
+    """Validate a single call entry and return a list of error messages"""
+    if not isinstance(call_data, dict):
+        return ["Row must be an object"]
+
+    missing_fields = [field for field in REQUIRED_FIELDS if not call_data.get(field)]
+    if missing_fields:
+        return [f"Missing required fields: {', '.join(missing_fields)}"]
+
+    errors = []
+    for field in ('ToNumber', 'FromNumber'):
+        value = call_data[field]
+        if not isinstance(value, str):
+            errors.append(f"{field} must be a string")
+        elif len(value) > NUMBER_MAX_LENGTH:
+            errors.append(f"{field} exceeds {NUMBER_MAX_LENGTH} characters")
+
+    if not isinstance(call_data['Text'], str):
+        errors.append("Text must be a string")
+
+    audio_url = call_data.get('AudioUrl')
+    if audio_url is not None and (not isinstance(audio_url, str) or len(audio_url) > AUDIO_URL_MAX_LENGTH):
+        errors.append(f"AudioUrl must be a string of at most {AUDIO_URL_MAX_LENGTH} characters")
+
+    options_error = validate_call_options(call_data.get('CampaignId'), call_data.get('StatusCallbackUrl'))
+    if options_error:
+        errors.append(options_error)
+
+    if 'IdempotencyKey' in call_data:
+        key_error = validate_idempotency_key(call_data['IdempotencyKey'])
+        if key_error:
+            errors.append(key_error)
+
+    return errors
+
+
+def validate_call_options(campaign_id, status_callback_url):
+    """Validate optional CampaignId and StatusCallbackUrl values, returning an error message or None"""
+    if status_callback_url is not None:
+        url_error = validate_callback_url(status_callback_url)
+        if url_error:
+            return url_error
+    if campaign_id is not None and (not isinstance(campaign_id, str) or not campaign_id
+                                    or len(campaign_id) > CAMPAIGN_ID_MAX_LENGTH):
+        return f"CampaignId must be a non-empty string of at most {CAMPAIGN_ID_MAX_LENGTH} characters"
+    return None
+
+
+def iter_lines(stream, read_size=INGEST_READ_SIZE, max_line_bytes=INGEST_MAX_LINE_BYTES):
+    """
+    Yield raw lines (newline included) from a binary stream, reading at most
+    read_size bytes at a time. Lines longer than max_line_bytes are yielded
+    as None so the caller can reject them without buffering the whole line.
+    """
+    pending = b''
+    oversized = False
+    while True:
+        chunk = stream.read(read_size)
+        if not chunk:
+            break
+        pending += chunk
+        start = 0
+        while True:
+            end = pending.find(b'\n', start)
+            if end == -1:
+                break
+            if oversized or end + 1 - start > max_line_bytes:
+                oversized = False
+                yield None
+            else:
+                yield pending[start:end + 1]
+            start = end + 1
+        pending = pending[start:]
+        if len(pending) > max_line_bytes:
+            # Drop the buffered prefix of an oversized line and flag it
+            oversized = True
+            pending = b''
+    if oversized or len(pending) > max_line_bytes:
+        yield None
+    elif pending:
+        yield pending
+
+
+def iter_ndjson_rows(stream):
+    """Yield (row_number, call_data, error) tuples from an NDJSON stream"""
+    row_number = 0
+    for line in iter_lines(stream):
+        if line is not None and not line.strip():
+            continue
+        row_number += 1
+        if line is None:
+            yield row_number, None, f"Row exceeds {INGEST_MAX_LINE_BYTES} bytes"
+            continue
+        try:
+            yield row_number, json.loads(line), None
+        except ValueError as e:
+            yield row_number, None, f"Invalid JSON: {str(e)}"
+
+
+def iter_csv_rows(stream):
+    """Yield (row_number, call_data, error) tuples from a CSV stream with a header row"""
+    def decoded_lines():
+        for line in iter_lines(stream):
+            # csv.reader cannot represent an oversized line, so substitute an empty record
+            yield line.decode('utf-8', errors='replace') if line is not None else '\n'
+
+    reader = csv.reader(decoded_lines())
+    header = next(reader, None)
+    if not header:
+        return
+
+    row_number = 0
+    for values in reader:
+        if not values:
+            continue
+        row_number += 1
+        if len(values) != len(header):
+            yield row_number, None, f"Expected {len(header)} columns, got {len(values)}"
+            continue
+        # Empty CSV cells are treated as absent optional fields
+        yield row_number, {key: value for key, value in zip(header, values) if value != ''}, None
+
+
+def build_call_row(call_data, campaign_id=None, status_callback_url=None, status='pending', api_key_id=None):
+    """
+    Build an insertable calls row with client-side call and task IDs. Per-call
+    CampaignId and StatusCallbackUrl override the batch-level defaults.
+    """
+    return {
+        'id': str(uuid.uuid4()),
+        'task_id': str(uuid.uuid4()),
+        'to_number': call_data['ToNumber'],
+        'from_number': call_data['FromNumber'],
+        'text': call_data['Text'],
+        'audio_url': call_data.get('AudioUrl'),
+        'status': status,
+        'created_at': datetime.utcnow(),
+        'campaign_id': call_data.get('CampaignId', campaign_id),
+        'status_callback_url': call_data.get('StatusCallbackUrl', status_callback_url),
+        'api_key_id': api_key_id
+    }
+
+
+def drop_suppressed(call_rows):
+    """
+    Split call rows into (allowed rows, indexes of rows whose ToNumber is on
+    the do-not-call list), with one index lookup for the whole batch
+    """
+    blocked = suppressed_numbers({row['to_number'] for row in call_rows})
+    if not blocked:
+        return call_rows, []
+    allowed = [row for row in call_rows if row['to_number'] not in blocked]
+    suppressed = [index for index, row in enumerate(call_rows) if row['to_number'] in blocked]
+    return allowed, suppressed
+
+
+def insert_call_batch(call_rows):
+    """
+    Insert a batch of call rows, their message bodies and their outbox entries
+    in one transaction, each with a single multi-row INSERT. The outbox relay
+    publishes the tasks.
+    """
+    hashes = store_messages({row['text'] for row in call_rows})
+    db.session.execute(db.insert(Call), [
+        {**{key: value for key, value in row.items() if key != 'text'}, 'message_hash': hashes[row['text']]}
+        for row in call_rows
+    ])
+    db.session.execute(db.insert(CallOutbox), [
+        {'call_id': row['id'], 'task_id': row['task_id'], 'task_name': 'tasks.tts_and_call_task'}
+        for row in call_rows
+    ])
+    db.session.commit()
+
+
+def submit_call_batch(call_rows, idempotency_keys, api_key_id=None, throttle=None):
+    """
+    Drop rows whose idempotency key was already used, then insert the rest
+    together with their outbox entries. Returns (queued_rows, duplicates) where duplicates maps the
+    index of each dropped row to the call ID originally bound to its key.
+    throttle, if given, is called with the number of rows about to be inserted.
+    """
+    keyed = [
+        (index, key, row['id'])
+        for index, (row, key) in enumerate(zip(call_rows, idempotency_keys))
+        if key
+    ]
+    duplicates = {}
+    if keyed:
+        originals = claim_idempotency_keys([(key, call_id) for _, key, call_id in keyed], api_key_id)
+        duplicates = {
+            index: original
+            for (index, _, _), original in zip(keyed, originals)
+            if original
+        }
+
+    queued_rows = [row for index, row in enumerate(call_rows) if index not in duplicates]
+    if not queued_rows:
+        return queued_rows, duplicates
+
+    try:
+        if throttle:
+            throttle(len(queued_rows))
+        insert_call_batch(queued_rows)
+    except Exception:
+        db.session.rollback()
+        release_idempotency_keys([
+            (key, call_id) for index, key, call_id in keyed if index not in duplicates
+        ], api_key_id)
+        raise
+
+    record_new_calls([
+        {**row, 'created_at': row['created_at'].isoformat()} for row in queued_rows
+    ])
+    return queued_rows, duplicates
+
+
+def _submit_unsuppressed(call_rows, idempotency_keys, api_key_id=None, throttle=None):
+    """Submit a batch without its do-not-call rows. Returns (queued, duplicates, suppressed) counts"""
+    allowed, suppressed = drop_suppressed(call_rows)
+    if suppressed:
+        skipped = set(suppressed)
+        idempotency_keys = [key for index, key in enumerate(idempotency_keys) if index not in skipped]
+    queued_rows, duplicates = submit_call_batch(allowed, idempotency_keys, api_key_id, throttle)
+    return len(queued_rows), len(duplicates), len(suppressed)
+
+
+def ingest_calls(rows, campaign_id=None, status_callback_url=None, api_key_id=None,
+                 batch_size=INGEST_BATCH_SIZE, max_rejects=INGEST_MAX_REJECTS, throttle=None):
+    """
+    Validate and write rows from iter_ndjson_rows/iter_csv_rows in fixed-size
+    batches. The next chunk of the request body is only read once the current
+    batch has been written, so a fast uploader is throttled by TCP flow control
+    instead of by server memory. throttle, if given, is called with the number
+    of rows of each batch left to insert once do-not-call and duplicate rows
+    are dropped, and may block to pace the upload, or raise IngestStopped to
+    end it; the idempotency keys of that batch are then released.
+    """
+    accepted = 0
+    rejected = 0
+    duplicate = 0
+    suppressed = 0
+    rejects = []
+    batch = []
+    batch_keys = []
+
+    def result():
+        return {
+            "accepted_calls": accepted,
+            "rejected_calls": rejected,
+            "duplicate_calls": duplicate,
+            "suppressed_calls": suppressed,
+            "rejects": rejects,
+            "rejects_truncated": rejected > len(rejects)
+        }
+
+    try:
+        for row_number, call_data, error in rows:
+            errors = [error] if error else validate_call_data(call_data)
+            if errors:
+                rejected += 1
+                if len(rejects) < max_rejects:
+                    rejects.append({"row": row_number, "errors": errors})
+                continue
+
+            batch.append(build_call_row(call_data, campaign_id, status_callback_url, api_key_id=api_key_id))
+            batch_keys.append(call_data.get('IdempotencyKey'))
+            if len(batch) >= batch_size:
+                queued, duplicates, blocked = _submit_unsuppressed(batch, batch_keys, api_key_id, throttle)
+                accepted += queued
+                duplicate += duplicates
+                suppressed += blocked
+                batch = []
+                batch_keys = []
+
+        if batch:
+            queued, duplicates, blocked = _submit_unsuppressed(batch, batch_keys, api_key_id, throttle)
+            accepted += queued
+            duplicate += duplicates
+            suppressed += blocked
+    except IngestStopped as stopped:
+        logger.info(f"Ingestion stopped after {accepted} calls")
+        stopped.result = result()
+        raise
+
+    logger.info(
+        f"Ingested {accepted} calls, rejected {rejected} rows, skipped {duplicate} duplicates "
+        f"and {suppressed} do-not-call numbers"
+    )
+
+    return result()
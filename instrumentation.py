@@ -0,0 +1,149 @@
+"""
+Prometheus Instrumentation
+Metric definitions shared by the API, the Celery workers and the helper
+processes. When PROMETHEUS_MULTIPROC_DIR is set, every process writes its
+samples to memory-mapped files in that directory and any of them can export
+the aggregate. The directory must be emptied before the processes start.
+"""
+import atexit
+import os
+import threading
+import time
+from collections import deque
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram,
+    generate_latest, multiprocess, start_http_server
+)
+
+PROMETHEUS_MULTIPROC_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+PROMETHEUS_FLUSH_INTERVAL = float(os.getenv('PROMETHEUS_FLUSH_INTERVAL', 1))
+
+_buffered = []
+
+
+class BufferedObserver:
+    """
+    Histogram (child) whose observe() is a bare deque append. Locking and
+    the mmap writes happen when flush_observations() applies the samples,
+    from a background thread every PROMETHEUS_FLUSH_INTERVAL seconds and
+    before each scrape.
+    """
+
+    def __init__(self, metric):
+        self.metric = metric
+        self.pending = deque()
+        self.observe = self.pending.append
+        _buffered.append(self)
+
+    def flush(self):
+        """Apply pending samples to the underlying metric"""
+        observe = self.metric.observe
+        popleft = self.pending.popleft
+        try:
+            while True:
+                observe(popleft())
+        except IndexError:
+            pass
+
+
+def flush_observations():
+    """Apply every buffered observation made by this process"""
+    for observer in _buffered:
+        observer.flush()
+
+
+def _flush_periodically():
+    while True:
+        time.sleep(PROMETHEUS_FLUSH_INTERVAL)
+        flush_observations()
+
+
+def _start_flusher():
+    threading.Thread(target=_flush_periodically, name='metrics-flush', daemon=True).start()
+
+
+def _reset_after_fork():
+    """Forked children start with their own flusher and without the parent's pending samples"""
+    for observer in _buffered:
+        observer.pending.clear()
+    _start_flusher()
+
+TTS_PROVIDERS = ('google', 'azure', 'aws', 'espeak')
+
+TTS_LATENCY = Histogram(
+    'voice_tts_seconds', 'Text-to-speech synthesis latency', ['provider'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30)
+)
+AUDIO_CONVERSION_LATENCY = BufferedObserver(Histogram(
+    'voice_audio_conversion_seconds', 'Conversion of synthesized audio to 8 kHz mono WAV',
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+))
+QUEUE_WAIT = BufferedObserver(Histogram(
+    'voice_queue_wait_seconds', 'Time from call creation until a worker claims it',
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900)
+))
+POST_DIAL_DELAY = BufferedObserver(Histogram(
+    'voice_post_dial_delay_seconds', 'Time from INVITE until ringing or answer',
+    buckets=(0.5, 1, 2, 3, 5, 8, 13, 20, 30)
+))
+CALL_DURATION = BufferedObserver(Histogram(
+    'voice_call_duration_seconds', 'Answered call duration',
+    buckets=(1, 5, 10, 15, 20, 30, 60, 120, 300)
+))
+SIP_RESPONSES = Counter(
+    'voice_sip_responses_total', 'Final SIP response codes of outbound calls', ['code']
+)
+CALLS_IN_FLIGHT = Gauge(
+    'voice_calls_in_flight', 'Calls between worker claim and completion', multiprocess_mode='livesum'
+)
+SIP_CHANNELS_IN_USE = Gauge(
+    'voice_sip_channels_in_use', 'SIP calls currently dialing or connected', multiprocess_mode='livesum'
+)
+
+# Label lookups hash and lock on every call, so hot paths use pre-bound children
+TTS_LATENCY_BY_PROVIDER = {
+    provider: BufferedObserver(TTS_LATENCY.labels(provider=provider)) for provider in TTS_PROVIDERS
+}
+_sip_response_children = {}
+
+
+def count_sip_response(code):
+    """Count one final SIP response code (or 'timeout'/'unknown')"""
+    child = _sip_response_children.get(code)
+    if child is None:
+        child = _sip_response_children[code] = SIP_RESPONSES.labels(code=str(code))
+    child.inc()
+
+
+def metrics_registry():
+    """Registry to export: the aggregate of all processes in multiprocess mode"""
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def render_metrics():
+    """Return (body, content_type) for a Prometheus scrape"""
+    flush_observations()
+    return generate_latest(metrics_registry()), CONTENT_TYPE_LATEST
+
+
+def start_metrics_server(port):
+    """Serve the metrics over HTTP from a background thread"""
+    start_http_server(port, registry=metrics_registry())
+
+
+def mark_process_dead(pid):
+    """Drop the live gauge samples of an exited process"""
+    if pid == os.getpid():
+        flush_observations()
+    if PROMETHEUS_MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid)
+
+
+_start_flusher()
+os.register_at_fork(after_in_child=_reset_after_fork)
+atexit.register(flush_observations)
@@ -0,0 +1,64 @@
+"""
+Call Latency Breakdown
+Per-stage latency percentiles over a time window, computed in PostgreSQL
+from the stage offsets recorded in calls.stage_times
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from models import db, CALL_STAGES
+
+LATENCY_PERCENTILES = (0.5, 0.95, 0.99)
+LATENCY_MAX_WINDOW = 7 * 86400
+
+# Reported intervals as (name, start stage, end stage); None starts at created_at
+STAGE_INTERVALS = (
+    ('queue_wait', None, 'dequeued'),
+    ('tts', 'tts_start', 'tts_end'),
+    ('conversion', 'tts_end', 'convert_end'),
+    ('registration', 'convert_end', 'invite_sent'),
+    ('post_dial_delay', 'invite_sent', 'ringing'),
+    ('ringing', 'ringing', 'answered'),
+    ('talk', 'answered', 'hangup'),
+)
+
+
+def _stage_offset(stage):
+    """SQL expression for a stage's offset in ms (Postgres arrays are 1-based)"""
+    return f"stage_times[{CALL_STAGES.index(stage) + 1}]"
+
+
+def _build_query(campaign_id):
+    """One pass over the window computing count and percentiles for every interval"""
+    aggregates = []
+    for name, start, end in STAGE_INTERVALS:
+        interval = _stage_offset(end) if start is None else f"{_stage_offset(end)} - {_stage_offset(start)}"
+        aggregates.append(f"count({interval}) AS {name}_count")
+        aggregates.append(
+            f"percentile_cont(CAST(:percentiles AS float8[])) WITHIN GROUP (ORDER BY {interval}) AS {name}_percentiles"
+        )
+    campaign_filter = "AND campaign_id = :campaign_id" if campaign_id else ""
+    return text(f"""
+        SELECT count(*) AS calls, {', '.join(aggregates)}
+        FROM calls
+        WHERE created_at >= :since AND stage_times IS NOT NULL {campaign_filter}
+    """)
+
+
+def latency_breakdown(window_seconds, campaign_id=None):
+    """Return call count and per-interval count/p50/p95/p99 (ms) for calls created in the window"""
+    params = {
+        "since": datetime.utcnow() - timedelta(seconds=window_seconds),
+        "percentiles": list(LATENCY_PERCENTILES),
+        "campaign_id": campaign_id
+    }
+    row = db.session.execute(_build_query(campaign_id), params).mappings().one()
+
+    stages = {}
+    for name, _, _ in STAGE_INTERVALS:
+        percentiles = row[f"{name}_percentiles"] or [None] * len(LATENCY_PERCENTILES)
+        stages[name] = {"count": row[f"{name}_count"]}
+        for fraction, value in zip(LATENCY_PERCENTILES, percentiles):
+            stages[name][f"p{round(fraction * 100)}_ms"] = round(value, 1) if value is not None else None
+    return {"calls": row["calls"], "stages": stages}
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Fake SIP Trunk
+Stands in for pjsua in load tests: accepts pjsua's command line and stdin
+script, plays out a call with configurable registration, post-dial,
+ringing and talk times, and prints the log lines voice_utils parses for
+the SIP response code and stage times. A fraction of calls can be
+rejected. Configured through the environment, since it is started by the
+Celery worker.
+
+Usage:
+    PJSUA_BIN="python loadtest/fake_pjsua.py" FAKE_SIP_TALK_MS=2000 celery -A celery_app worker
+"""
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+FAKE_SIP_REGISTER_MS = float(os.getenv('FAKE_SIP_REGISTER_MS', 50))
+FAKE_SIP_PDD_MS = float(os.getenv('FAKE_SIP_PDD_MS', 200))  # INVITE to 180 Ringing
+FAKE_SIP_RING_MS = float(os.getenv('FAKE_SIP_RING_MS', 1500))  # 180 Ringing to 200 OK
+FAKE_SIP_TALK_MS = float(os.getenv('FAKE_SIP_TALK_MS', 3000))  # 200 OK to BYE
+FAKE_SIP_JITTER = float(os.getenv('FAKE_SIP_JITTER', 0.2))  # Relative standard deviation of each time
+FAKE_SIP_FAIL_RATE = float(os.getenv('FAKE_SIP_FAIL_RATE', 0))
+FAKE_SIP_FAIL_CODE = int(os.getenv('FAKE_SIP_FAIL_CODE', 486))
+
+REASONS = {200: 'Normal call clearing', 403: 'Forbidden', 404: 'Not Found', 480: 'Temporarily Unavailable',
+           484: 'Address Incomplete', 486: 'Busy Here', 503: 'Service Unavailable'}
+
+
+def log(source, message):
+    """Print a line in pjsua's log format"""
+    print(f"{datetime.now().strftime('%H:%M:%S.%f')[:12]}  {source:>14}  .......{message}", flush=True)
+
+
+def wait(milliseconds):
+    time.sleep(max(0.0, random.gauss(milliseconds, milliseconds * FAKE_SIP_JITTER)) / 1000)
+
+
+def main():
+    sys.stdin.read()  # The dial script; timing comes from the environment instead
+    target = next((arg for arg in reversed(sys.argv[1:]) if arg.startswith('sip:')), 'sip:unknown')
+
+    wait(FAKE_SIP_REGISTER_MS)
+    log('pjsua_acc.c', "Registration success, status=200 (OK)")
+    log('pjsua_call.c', f"Making call with acc #0 to {target}")
+    log('pjsua_app.c', "Call 0 state changed to CALLING")
+    if random.random() < FAKE_SIP_FAIL_RATE:
+        wait(FAKE_SIP_PDD_MS)
+        reason = REASONS.get(FAKE_SIP_FAIL_CODE, 'Rejected')
+        log('pjsua_app.c', f"Call 0 is DISCONNECTED [reason={FAKE_SIP_FAIL_CODE} ({reason})]")
+        log('pjsua_app.c', f"Call 0 state changed to DISCONNCTD ({FAKE_SIP_FAIL_CODE} {reason})")
+        return 0
+
+    wait(FAKE_SIP_PDD_MS)
+    log('pjsua_app.c', "Call 0 state changed to EARLY (180 Ringing)")
+    wait(FAKE_SIP_RING_MS)
+    log('sip_endpoint.c', "Response msg 200/INVITE/cseq=2: SIP/2.0 200 OK")
+    log('pjsua_app.c', "Call 0 state changed to CONFIRMED (200 OK)")
+    wait(FAKE_SIP_TALK_MS)
+    log('pjsua_app.c', "Call 0 is DISCONNECTED [reason=200 (Normal call clearing)]")
+    log('pjsua_app.c', "Call 0 state changed to DISCONNCTD (200 Normal call clearing)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
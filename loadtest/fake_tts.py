@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Fake Text-to-Speech Provider
+Answers POST /v1/text:synthesize like Google Text-to-Speech, with silent
+audio as long as the text would take to speak, after a configurable
+synthesis latency. Point the app at it with TTS_SERVICE=google and
+GOOGLE_TTS_URL. Request counts are served at GET /stats.
+
+Usage:
+    python loadtest/fake_tts.py --port 8098 --latency-ms 300 --jitter-ms 100
+"""
+import argparse
+import base64
+import io
+import json
+import math
+import random
+import threading
+import time
+import wave
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CHARACTERS_PER_SECOND = 15  # Speaking rate the audio length is derived from
+
+# MPEG-1 Layer III, 32 kbit/s, 44.1 kHz, mono; a frame with zeroed side
+# information decodes to 1152 samples of silence
+MP3_FRAME = bytes([0xFF, 0xFB, 0x10, 0xC4]) + bytes(100)
+MP3_FRAME_SECONDS = 1152 / 44100
+
+stats_lock = threading.Lock()
+stats = {"requests": 0, "characters": 0, "failed_requests": 0, "started": time.time()}
+
+
+def silent_mp3(seconds):
+    return MP3_FRAME * max(1, math.ceil(seconds / MP3_FRAME_SECONDS))
+
+
+def silent_wav(seconds):
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(8000)
+        f.writeframes(bytes(2 * int(seconds * 8000)))
+    return buffer.getvalue()
+
+
+class SynthesizeHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    latency = 0.3
+    jitter = 0.1
+    fail_rate = 0.0
+
+    def _reply(self, status, body=b''):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        if not self.path.startswith('/v1/text:synthesize'):
+            self._reply(404)
+            return
+        text = payload.get('input', {}).get('text', '')
+        time.sleep(max(0.0, random.gauss(self.latency, self.jitter)))
+        if random.random() < self.fail_rate:
+            with stats_lock:
+                stats["failed_requests"] += 1
+            self._reply(500, b'{"error": {"code": 500, "message": "Injected failure"}}')
+            return
+        seconds = len(text) / CHARACTERS_PER_SECOND
+        encoding = payload.get('audioConfig', {}).get('audioEncoding', 'MP3')
+        audio = silent_wav(seconds) if encoding == 'LINEAR16' else silent_mp3(seconds)
+        with stats_lock:
+            stats["requests"] += 1
+            stats["characters"] += len(text)
+        self._reply(200, json.dumps({"audioContent": base64.b64encode(audio).decode()}).encode())
+
+    def do_GET(self):
+        if self.path != '/stats':
+            self._reply(404)
+            return
+        with stats_lock:
+            body = json.dumps(stats).encode()
+        self._reply(200, body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Google-compatible TTS provider")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8098)
+    parser.add_argument('--latency-ms', type=float, default=300, help="Mean synthesis latency")
+    parser.add_argument('--jitter-ms', type=float, default=100, help="Standard deviation of the latency")
+    parser.add_argument('--fail-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    SynthesizeHandler.latency = args.latency_ms / 1000
+    SynthesizeHandler.jitter = args.jitter_ms / 1000
+    SynthesizeHandler.fail_rate = args.fail_rate
+    server = ThreadingHTTPServer((args.host, args.port), SynthesizeHandler)
+    server.daemon_threads = True
+    print(f"Fake TTS listening on http://{args.host}:{args.port}/v1/text:synthesize")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
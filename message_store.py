@@ -0,0 +1,31 @@
+"""
+Message Store
+Content-addressed call text. Each distinct body is stored once in messages,
+keyed by its SHA-256, and calls carry only the 32-byte hash
+"""
+import hashlib
+
+from sqlalchemy.dialects.postgresql import insert
+
+from models import db, Message
+
+
+def message_hash(body):
+    """SHA-256 digest of a message body, as stored in calls.message_hash"""
+    return hashlib.sha256(body.encode('utf-8')).digest()
+
+
+def store_messages(bodies):
+    """
+    Make sure every body has a messages row, with one INSERT in the caller's
+    transaction. Returns a {body: hash} mapping for building call rows.
+    """
+    hashes = {body: message_hash(body) for body in bodies if body is not None}
+    if hashes:
+        # Rows go in hash order, so concurrent batches sharing texts take the
+        # unique index locks in the same order and cannot deadlock
+        db.session.execute(
+            insert(Message).on_conflict_do_nothing(index_elements=['hash']),
+            [{'hash': digest, 'body': body} for body, digest in sorted(hashes.items(), key=lambda item: item[1])]
+        )
+    return hashes
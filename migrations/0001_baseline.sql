@@ -0,0 +1,51 @@
+-- Baseline schema, matching what db.create_all() used to create. Databases
+-- created by older versions get the columns added since then.
+
+CREATE TABLE IF NOT EXISTS calls (
+    id VARCHAR(36) PRIMARY KEY,
+    to_number VARCHAR(20) NOT NULL,
+    from_number VARCHAR(20) NOT NULL,
+    text TEXT,
+    audio_url VARCHAR(500),
+    status VARCHAR(20),
+    created_at TIMESTAMP WITHOUT TIME ZONE,
+    started_at TIMESTAMP WITHOUT TIME ZONE,
+    completed_at TIMESTAMP WITHOUT TIME ZONE,
+    error_message TEXT,
+    audio_file_path VARCHAR(500),
+    task_id VARCHAR(36),
+    duration INTEGER
+);
+
+ALTER TABLE calls ADD COLUMN IF NOT EXISTS campaign_id VARCHAR(36);
+ALTER TABLE calls ADD COLUMN IF NOT EXISTS status_callback_url VARCHAR(500);
+ALTER TABLE calls ADD COLUMN IF NOT EXISTS stage_times INTEGER[];
+
+CREATE TABLE IF NOT EXISTS call_queue (
+    id SERIAL PRIMARY KEY,
+    call_id VARCHAR(36) NOT NULL REFERENCES calls (id),
+    priority INTEGER,
+    queued_at TIMESTAMP WITHOUT TIME ZONE,
+    processing_started TIMESTAMP WITHOUT TIME ZONE,
+    worker_id VARCHAR(50)
+);
+
+CREATE TABLE IF NOT EXISTS call_outbox (
+    id BIGSERIAL PRIMARY KEY,
+    call_id VARCHAR(36) NOT NULL,
+    task_id VARCHAR(36) NOT NULL,
+    task_name VARCHAR(100) NOT NULL,
+    created_at TIMESTAMP WITHOUT TIME ZONE
+);
+
+CREATE TABLE IF NOT EXISTS system_metrics (
+    id SERIAL PRIMARY KEY,
+    timestamp TIMESTAMP WITHOUT TIME ZONE,
+    total_calls INTEGER,
+    active_calls INTEGER,
+    completed_calls INTEGER,
+    failed_calls INTEGER,
+    avg_processing_time DOUBLE PRECISION,
+    memory_usage DOUBLE PRECISION,
+    cpu_usage DOUBLE PRECISION
+);
@@ -0,0 +1,12 @@
+-- migrate: no-transaction
+-- Indexes for status filters, time windows and lookups by task or number.
+-- Built concurrently so a large calls table stays writable; an interrupted
+-- build leaves an INVALID index that must be dropped before re-running.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_calls_status_created_at ON calls (status, created_at);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_calls_created_at ON calls (created_at);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_calls_task_id ON calls (task_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_calls_to_number ON calls (to_number);
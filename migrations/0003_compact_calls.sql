@@ -0,0 +1,32 @@
+-- Native UUID keys and content-addressed message text. Distinct call texts
+-- move to messages, keyed by their SHA-256, and calls keep the 32-byte hash.
+-- The ALTER TABLE rewrites calls once under an exclusive lock; on large
+-- tables run it in a maintenance window with `python storage_report.py --migrate`.
+
+CREATE TABLE IF NOT EXISTS messages (
+    hash BYTEA PRIMARY KEY,
+    body TEXT NOT NULL,
+    created_at TIMESTAMP WITHOUT TIME ZONE DEFAULT (now() AT TIME ZONE 'utc')
+);
+
+INSERT INTO messages (hash, body)
+SELECT sha256(convert_to(text, 'UTF8')), text
+FROM (SELECT DISTINCT text FROM calls WHERE text IS NOT NULL) AS distinct_texts
+ON CONFLICT DO NOTHING;
+
+-- Foreign keys must match the referenced type; call_queue is unused
+ALTER TABLE call_queue DROP CONSTRAINT IF EXISTS call_queue_call_id_fkey;
+
+-- The text column is rewritten into its own hash, so the table is rewritten only once
+ALTER TABLE calls
+    ALTER COLUMN id TYPE UUID USING id::uuid,
+    ALTER COLUMN task_id TYPE UUID USING task_id::uuid,
+    ALTER COLUMN text TYPE BYTEA USING sha256(convert_to(text, 'UTF8'));
+
+ALTER TABLE calls RENAME COLUMN text TO message_hash;
+
+ALTER TABLE call_queue ALTER COLUMN call_id TYPE UUID USING call_id::uuid;
+
+ALTER TABLE call_outbox
+    ALTER COLUMN call_id TYPE UUID USING call_id::uuid,
+    ALTER COLUMN task_id TYPE UUID USING task_id::uuid;
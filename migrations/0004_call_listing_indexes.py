@@ -0,0 +1,56 @@
+"""
+Keyset pagination indexes for GET /voice/calls. Every listing filter gets an
+index ending in (created_at, id) so any page is a single index range scan;
+they supersede the 0002 indexes on created_at, (status, created_at) and to_number.
+The DDL is spelled out here rather than taken from partitions.CALL_INDEXES,
+so later changes to the application's index list don't change this migration.
+"""
+from sqlalchemy import text
+
+NO_TRANSACTION = True
+
+INDEXES = (
+    ('ix_calls_created_at_id', 'created_at, id'),
+    ('ix_calls_status_created_at_id', 'status, created_at, id'),
+    ('ix_calls_to_number_created_at_id', 'to_number, created_at, id'),
+    ('ix_calls_campaign_created_at_id', 'campaign_id, created_at, id'),
+    ('ix_calls_task_id', 'task_id'),
+)
+
+SUPERSEDED_INDEXES = ('ix_calls_created_at', 'ix_calls_status_created_at', 'ix_calls_to_number')
+
+
+def _partitions(conn):
+    """Partitions of calls, or None if it is a plain table"""
+    partitioned = conn.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('public.calls'))"
+    )).scalar()
+    if not partitioned:
+        return None
+    return conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'public.calls'::regclass"
+    )).scalars().all()
+
+
+def upgrade(conn):
+    partitions = _partitions(conn)
+    for name, columns in INDEXES:
+        valid = conn.execute(text(
+            "SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"
+        ), {"name": name}).scalar()
+        if valid:
+            continue
+        if partitions is None:
+            conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON calls ({columns})"))
+            continue
+        # Partitioned tables cannot be indexed concurrently: each partition is,
+        # and is attached to an index created on the parent only
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON ONLY calls ({columns})"))
+        for partition in partitions:
+            partition_index = f"{partition}_{name[len('ix_calls_'):]}"
+            conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {partition_index} ON {partition} ({columns})"))
+            conn.execute(text(f"ALTER INDEX {name} ATTACH PARTITION {partition_index}"))
+    concurrently = '' if partitions is not None else 'CONCURRENTLY '
+    for name in SUPERSEDED_INDEXES:
+        conn.execute(text(f"DROP INDEX {concurrently}IF EXISTS {name}"))
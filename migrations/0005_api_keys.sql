@@ -0,0 +1,14 @@
+-- API keys with their rate limits. Only the SHA-256 of each key is stored;
+-- api_keys.py creates keys and prints them once.
+
+CREATE TABLE IF NOT EXISTS api_keys (
+    id UUID PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    key_hash BYTEA NOT NULL UNIQUE,
+    requests_per_second REAL NOT NULL,
+    request_burst INTEGER NOT NULL,
+    calls_per_second REAL NOT NULL,
+    call_burst INTEGER NOT NULL,
+    active BOOLEAN NOT NULL DEFAULT true,
+    created_at TIMESTAMP WITHOUT TIME ZONE DEFAULT (now() AT TIME ZONE 'utc')
+);
@@ -0,0 +1,5 @@
+-- The API key each call was submitted with, so status events can be streamed
+-- per key and campaign streams only carry the subscribing key's calls.
+-- Adding a nullable column without a default does not rewrite the table.
+
+ALTER TABLE calls ADD COLUMN IF NOT EXISTS api_key_id UUID;
@@ -0,0 +1,40 @@
+"""
+Keyset pagination index for calls listed and exported per API key. Built
+concurrently like 0004, partition by partition on a partitioned table.
+"""
+from sqlalchemy import text
+
+NO_TRANSACTION = True
+
+INDEX = 'ix_calls_api_key_created_at_id'
+COLUMNS = 'api_key_id, created_at, id'
+
+
+def _partitions(conn):
+    """Partitions of calls, or None if it is a plain table"""
+    partitioned = conn.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('public.calls'))"
+    )).scalar()
+    if not partitioned:
+        return None
+    return conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'public.calls'::regclass"
+    )).scalars().all()
+
+
+def upgrade(conn):
+    valid = conn.execute(text(
+        "SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"
+    ), {"name": INDEX}).scalar()
+    if valid:
+        return
+    partitions = _partitions(conn)
+    if partitions is None:
+        conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {INDEX} ON calls ({COLUMNS})"))
+        return
+    conn.execute(text(f"CREATE INDEX IF NOT EXISTS {INDEX} ON ONLY calls ({COLUMNS})"))
+    for partition in partitions:
+        partition_index = f"{partition}_{INDEX[len('ix_calls_'):]}"
+        conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {partition_index} ON {partition} ({COLUMNS})"))
+        conn.execute(text(f"ALTER INDEX {INDEX} ATTACH PARTITION {partition_index}"))
@@ -2,18 +2,43 @@
 Database models for SESPCLSwitch
 """
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
+from datetime import datetime, timedelta
 import uuid
 
 db = SQLAlchemy()
 
+# Pipeline stages recorded per call, in order. Call.stage_times stores them as
+# millisecond offsets from created_at (NULL for stages the call never reached)
+CALL_STAGES = (
+    'dequeued', 'tts_start', 'tts_end', 'convert_end',
+    'invite_sent', 'ringing', 'answered', 'hangup'
+)
+
+def parse_call_id(value):
+    """Return value as a UUID, or None if it is not a valid call ID"""
+    try:
+        return uuid.UUID(str(value))
+    except ValueError:
+        return None
+
+class Message(db.Model):
+    __tablename__ = 'messages'
+    
+    # SHA-256 of the UTF-8 body; calls reference the shared row by hash
+    hash = db.Column(db.LargeBinary(32), primary_key=True)
+    body = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<Message {self.hash.hex()[:12]}>'
+
 class Call(db.Model):
     __tablename__ = 'calls'
     
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = db.Column(db.Uuid, primary_key=True, default=uuid.uuid4)
     to_number = db.Column(db.String(20), nullable=False)
     from_number = db.Column(db.String(20), nullable=False)
-    text = db.Column(db.Text, nullable=True)
+    message_hash = db.Column(db.LargeBinary(32), nullable=True)  # messages.hash of the call text
     audio_url = db.Column(db.String(500), nullable=True)
     status = db.Column(db.String(20), default='pending')  # pending, processing, completed, failed
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -21,15 +46,45 @@ class Call(db.Model):
     completed_at = db.Column(db.DateTime, nullable=True)
     error_message = db.Column(db.Text, nullable=True)
     audio_file_path = db.Column(db.String(500), nullable=True)
-    task_id = db.Column(db.String(36), nullable=True)  # Celery task ID
+    task_id = db.Column(db.Uuid, nullable=True)  # Celery task ID
     duration = db.Column(db.Integer, nullable=True)  # Call duration in seconds
+    campaign_id = db.Column(db.String(36), nullable=True)  # Groups calls submitted together
+    status_callback_url = db.Column(db.String(500), nullable=True)  # Webhook for status changes
+    api_key_id = db.Column(db.Uuid, nullable=True)  # api_keys.id of the submitting key, if any
+    stage_times = db.Column(db.ARRAY(db.Integer), nullable=True)  # ms offsets from created_at, see CALL_STAGES
+    
+    # No foreign key: messages are inserted before the calls referencing them
+    # and never deleted, and bulk inserts skip a lookup per row
+    message = db.relationship(
+        'Message', primaryjoin='foreign(Call.message_hash) == Message.hash', lazy='joined', viewonly=True
+    )
     
     def __repr__(self):
         return f'<Call {self.id}: {self.from_number} -> {self.to_number}>'
     
+    @property
+    def text(self):
+        """Message body of the call"""
+        return self.message.body if self.message else None
+    
+    def set_stage_times(self, times):
+        """Store a {stage: datetime} mapping as offsets from created_at"""
+        self.stage_times = [
+            round((times[stage] - self.created_at).total_seconds() * 1000) if times.get(stage) else None
+            for stage in CALL_STAGES
+        ]
+    
+    def get_stage_times(self):
+        """Return the recorded stages as a {stage: datetime} mapping"""
+        return {
+            stage: self.created_at + timedelta(milliseconds=offset)
+            for stage, offset in zip(CALL_STAGES, self.stage_times or ())
+            if offset is not None
+        }
+    
     def to_dict(self):
         return {
-            'id': self.id,
+            'id': str(self.id),
             'to_number': self.to_number,
             'from_number': self.from_number,
             'text': self.text,
@@ -39,24 +94,56 @@ class Call(db.Model):
             'started_at': self.started_at.isoformat() if self.started_at else None,
             'completed_at': self.completed_at.isoformat() if self.completed_at else None,
             'error_message': self.error_message,
-            'duration': self.duration
+            'duration': self.duration,
+            'campaign_id': self.campaign_id,
+            'status_callback_url': self.status_callback_url
         }
 
 class CallQueue(db.Model):
     __tablename__ = 'call_queue'
     
     id = db.Column(db.Integer, primary_key=True)
-    call_id = db.Column(db.String(36), db.ForeignKey('calls.id'), nullable=False)
+    # No foreign key: migration 0003 dropped it, and once calls is partitioned its
+    # key is (id, created_at), which call_queue cannot reference. The table is unused
+    call_id = db.Column(db.Uuid, nullable=False)
     priority = db.Column(db.Integer, default=1)  # 1 = high, 2 = medium, 3 = low
     queued_at = db.Column(db.DateTime, default=datetime.utcnow)
     processing_started = db.Column(db.DateTime, nullable=True)
     worker_id = db.Column(db.String(50), nullable=True)
     
-    call = db.relationship('Call', backref='queue_entry')
+    call = db.relationship('Call', primaryjoin='foreign(CallQueue.call_id) == Call.id', viewonly=True)
     
     def __repr__(self):
         return f'<CallQueue {self.id}: Call {self.call_id}>'
 
+class CallOutbox(db.Model):
+    __tablename__ = 'call_outbox'
+
+    id = db.Column(db.BigInteger, primary_key=True, autoincrement=True)
+    call_id = db.Column(db.Uuid, nullable=False)
+    task_id = db.Column(db.Uuid, nullable=False)  # Pre-generated Celery task ID
+    task_name = db.Column(db.String(100), nullable=False, default='tasks.tts_and_call_task')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<CallOutbox {self.id}: Call {self.call_id}>'
+
+class ApiKey(db.Model):
+    __tablename__ = 'api_keys'
+
+    id = db.Column(db.Uuid, primary_key=True, default=uuid.uuid4)
+    name = db.Column(db.String(100), nullable=False)
+    key_hash = db.Column(db.LargeBinary(32), nullable=False, unique=True)  # SHA-256 of the key
+    requests_per_second = db.Column(db.Float, nullable=False)  # 0 = unlimited
+    request_burst = db.Column(db.Integer, nullable=False)
+    calls_per_second = db.Column(db.Float, nullable=False)  # 0 = unlimited
+    call_burst = db.Column(db.Integer, nullable=False)
+    active = db.Column(db.Boolean, nullable=False, default=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ApiKey {self.id}: {self.name}>'
+
 class SystemMetrics(db.Model):
     __tablename__ = 'system_metrics'
     
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Outbox Relay
+Drains the call_outbox table to Celery in batches. Submissions only write
+the call and its outbox entry in one transaction; this process publishes
+the tasks. Several relays can run side by side (rows are claimed with
+SKIP LOCKED), and a task published twice after a crash is discarded by the
+worker's atomic pending -> processing claim.
+"""
+import logging
+import os
+import time
+
+from celery_app import celery_app, flask_app
+from models import db, CallOutbox
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+RELAY_BATCH_SIZE = int(os.getenv('OUTBOX_RELAY_BATCH_SIZE', 500))
+RELAY_POLL_INTERVAL = float(os.getenv('OUTBOX_RELAY_POLL_INTERVAL', 0.2))
+
+
+def relay_batch(batch_size=RELAY_BATCH_SIZE):
+    """Publish one batch of outbox entries and delete them. Returns the number relayed"""
+    entries = db.session.execute(
+        db.select(CallOutbox)
+        .order_by(CallOutbox.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    ).scalars().all()
+    if not entries:
+        db.session.commit()
+        return 0
+
+    # One broker connection for the whole batch
+    with celery_app.producer_or_acquire() as producer:
+        for entry in entries:
+            celery_app.send_task(
+                entry.task_name,
+                args=[str(entry.call_id)],
+                task_id=str(entry.task_id),
+                producer=producer
+            )
+
+    db.session.execute(
+        db.delete(CallOutbox).where(CallOutbox.id.in_([entry.id for entry in entries]))
+    )
+    db.session.commit()
+    return len(entries)
+
+
+def run_relay():
+    """Relay outbox entries forever, polling when the outbox is empty"""
+    logger.info(f"Outbox relay started (batch size {RELAY_BATCH_SIZE})")
+    with flask_app.app_context():
+        while True:
+            try:
+                relayed = relay_batch()
+                if relayed:
+                    logger.info(f"Relayed {relayed} call tasks")
+                # Keep draining without sleeping while there is a backlog
+                if relayed < RELAY_BATCH_SIZE:
+                    time.sleep(RELAY_POLL_INTERVAL)
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Outbox relay failed: {str(e)}")
+                time.sleep(1)
+
+
+if __name__ == '__main__':
+    run_relay()
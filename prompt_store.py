@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Pre-packetized G.711 Prompt Store
+A rendered prompt is stored once as µ-law or A-law, already cut into RTP
+frames, behind a small header with its duration and frame count. Workers map
+the file read-only, so every process on the host plays from the same
+page-cache pages, and each repeat call hands rtp.py a view of the mapping
+with no read, decode or transcode. The last frame is padded with silence so
+every frame is exactly frame_bytes long.
+
+Usage:
+    python prompt_store.py render prompt.wav --key <message hash>        # Encode a WAV into the store
+    python prompt_store.py info <message hash> --codec pcma
+    python prompt_store.py list
+    python prompt_store.py play <message hash> 192.0.2.10:40000         # Stream it with rtp.py
+"""
+import argparse
+import asyncio
+import logging
+import mmap
+import os
+import re
+import struct
+import sys
+import tempfile
+import threading
+
+from rtp import CODECS, PCMA, PCMU, RTP_PTIME, SAMPLE_RATE, RtpSender, g711_from_wav
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+PROMPT_STORE_DIR = os.getenv('PROMPT_STORE_DIR', os.path.join(os.getcwd(), 'prompt_store'))
+
+# Header: magic, format version, RTP payload type, ms per frame, bytes per
+# frame, frame count, audio length in bytes before padding. Frames start at
+# HEADER_SIZE, which keeps them aligned for the mapping.
+MAGIC = b'G711'
+VERSION = 1
+HEADER = struct.Struct('<4sBBHHxxII')
+HEADER_SIZE = 64
+SILENCE = {PCMU: b'\xff', PCMA: b'\xd5'}  # Encoded zero sample
+EXTENSIONS = {PCMU: 'pcmu', PCMA: 'pcma'}
+
+KEY_PATTERN = re.compile(r'^[A-Za-z0-9_.-]{1,128}$')
+
+
+class PromptStoreError(Exception):
+    """Raised for a prompt file that is not in the store's format"""
+
+
+def prompt_path(key, payload_type=PCMU, directory=PROMPT_STORE_DIR):
+    """Path of a prompt; keys are file names, e.g. the hex of the call's message hash"""
+    if not KEY_PATTERN.match(key):
+        raise ValueError(f"Invalid prompt key: {key!r}")
+    return os.path.join(directory, f"{key}.{EXTENSIONS[payload_type]}")
+
+
+class Prompt:
+    """A mapped prompt; audio is a read-only view of its frames, ready for RtpSender.start"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < HEADER_SIZE:
+                raise PromptStoreError(f"{path}: too short for a prompt header")
+            # The mapping outlives the file descriptor
+            self._map = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+        magic, version, self.payload_type, ptime_ms, self.frame_bytes, self.frame_count, self.audio_bytes = \
+            HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != VERSION:
+            raise PromptStoreError(f"{path}: not a version {VERSION} prompt file")
+        if size != HEADER_SIZE + self.frame_count * self.frame_bytes:
+            raise PromptStoreError(f"{path}: truncated")
+        self.path = path
+        self.ptime = ptime_ms / 1000
+        self.audio = memoryview(self._map)[HEADER_SIZE:]
+
+    @property
+    def duration(self):
+        """Seconds of audio, without the padding"""
+        return self.audio_bytes / SAMPLE_RATE
+
+    def frame(self, index):
+        """One frame's payload, without copying"""
+        return self.audio[index * self.frame_bytes:(index + 1) * self.frame_bytes]
+
+
+def write_prompt(key, audio, payload_type=PCMU, directory=PROMPT_STORE_DIR, ptime=RTP_PTIME):
+    """Store G.711 audio under key; replaces any earlier version atomically. Returns the path"""
+    frame_bytes = int(SAMPLE_RATE * ptime)
+    frame_count = -(-len(audio) // frame_bytes)
+    path = prompt_path(key, payload_type, directory)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='prompt-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            header = HEADER.pack(MAGIC, VERSION, payload_type, round(ptime * 1000), frame_bytes, frame_count,
+                                 len(audio))
+            f.write(header.ljust(HEADER_SIZE, b'\0'))
+            f.write(audio)
+            f.write(SILENCE[payload_type] * (frame_count * frame_bytes - len(audio)))
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(temp_path, 0o644)  # mkstemp creates files readable by the owner only
+        # Processes already playing the old file keep their mapping of it
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return path
+
+
+def render_wav(key, wav_path, payload_type=PCMU, directory=PROMPT_STORE_DIR):
+    """Encode a WAV file into the store; the one transcode the prompt ever gets"""
+    return write_prompt(key, g711_from_wav(wav_path, payload_type), payload_type, directory)
+
+
+class PromptStore:
+    """Prompts mapped by this process, one mapping per prompt shared by every call playing it"""
+
+    def __init__(self, directory=PROMPT_STORE_DIR):
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.prompts = {}
+
+    def get(self, key, payload_type=PCMU):
+        """The prompt stored under key, or None if it has not been rendered"""
+        prompt = self.prompts.get((key, payload_type))
+        if prompt is not None:
+            return prompt
+        with self.lock:
+            prompt = self.prompts.get((key, payload_type))
+            if prompt is None:
+                try:
+                    prompt = Prompt(prompt_path(key, payload_type, self.directory))
+                except FileNotFoundError:
+                    return None
+                self.prompts[(key, payload_type)] = prompt
+        return prompt
+
+    def stats(self):
+        return {
+            "mapped_prompts": len(self.prompts),
+            "mapped_bytes": sum(len(prompt.audio) for prompt in self.prompts.values())
+        }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_prompt_store():
+    """Return the process-wide store, created on first use"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = PromptStore()
+    return _store
+
+
+def get_prompt(key, payload_type=PCMU):
+    """The mapped prompt stored under key, or None"""
+    return get_prompt_store().get(key, payload_type)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Manage pre-packetized G.711 prompts")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    render = subparsers.add_parser('render', help="Encode a WAV file into the store")
+    render.add_argument('wav')
+    render.add_argument('--key', required=True)
+    info = subparsers.add_parser('info', help="Show a prompt's header")
+    info.add_argument('key')
+    play = subparsers.add_parser('play', help="Stream a prompt to host:port as RTP")
+    play.add_argument('key')
+    play.add_argument('destination', help="host:port of the receiver's RTP socket")
+    for command in (render, info, play):
+        command.add_argument('--codec', choices=sorted(CODECS), default='pcmu')
+    subparsers.add_parser('list')
+    args = parser.parse_args()
+
+    if args.command == 'render':
+        print(render_wav(args.key, args.wav, CODECS[args.codec]))
+    elif args.command == 'list':
+        if not os.path.isdir(PROMPT_STORE_DIR):
+            return 0
+        for name in sorted(os.listdir(PROMPT_STORE_DIR)):
+            key, _, extension = name.rpartition('.')
+            if extension in EXTENSIONS.values():
+                prompt = Prompt(os.path.join(PROMPT_STORE_DIR, name))
+                print(f"{key:66} {extension}  {prompt.duration:7.2f} s  {prompt.frame_count:6} frames")
+    else:
+        prompt = get_prompt(args.key, CODECS[args.codec])
+        if prompt is None:
+            print(f"No {args.codec} prompt stored under {args.key}")
+            return 1
+        if args.command == 'info':
+            print(f"Path:      {prompt.path}")
+            print(f"Codec:     {args.codec} (payload type {prompt.payload_type})")
+            print(f"Duration:  {prompt.duration:.2f} s")
+            print(f"Frames:    {prompt.frame_count} x {prompt.frame_bytes} bytes ({prompt.ptime * 1000:g} ms)")
+        else:
+            host, _, port = args.destination.rpartition(':')
+            stats = asyncio.run(RtpSender(ptime=prompt.ptime).play(prompt.audio, host, int(port), prompt.payload_type))
+            print(f"Sent {stats['packets']} packets, {stats['skipped']} skipped, {stats['send_errors']} send errors")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
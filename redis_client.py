@@ -0,0 +1,33 @@
+"""
+Shared Redis Clients
+Lazily created, process-wide Redis connection pools for application state
+and for read-only inspection of the Celery broker
+"""
+import os
+import redis
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/1')
+CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/0')
+
+_client = None
+_broker_client = None
+
+
+def get_redis():
+    """Return the process-wide Redis client (the pool reconnects safely after fork)"""
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(REDIS_URL, decode_responses=True)
+    return _client
+
+
+def get_broker_redis():
+    """Return a client for the Celery broker database, used to inspect queue depths"""
+    global _broker_client
+    if _broker_client is None:
+        _broker_client = redis.Redis.from_url(CELERY_BROKER_URL, decode_responses=True)
+    return _broker_client
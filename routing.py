@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+"""
+Least-Cost Routing
+Destination numbers are matched against a routing table loaded from a
+routes file by longest prefix, and the cheapest route with a free
+concurrency slot is used for the call. Tables are rebuilt in a background
+thread when the routes or trunks file changes and swapped in whole, so
+lookups never wait for a reload and calls keep the route they were given.
+
+Routes file (CSV, one route per line, a prefix may be listed once per trunk):
+    prefix,trunk,rate,max_concurrent
+    44,carrier_a,0.0120,200
+    447,carrier_b,0.0450,50
+
+Trunks file (JSON, trunk name -> SIP settings):
+    {"carrier_a": {"host": "sip.carrier-a.net", "port": 5060, "username": "...", "password": "..."}}
+
+Usage:
+    python routing.py check +442071234567 ...   # Show the routes a number would use
+    python routing.py stats
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+from dnc import normalize_number
+from redis_client import get_redis
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+ROUTES_FILE = os.getenv('ROUTES_FILE', os.path.join(os.getcwd(), 'routes.csv'))
+TRUNKS_FILE = os.getenv('TRUNKS_FILE', os.path.join(os.getcwd(), 'trunks.json'))
+ROUTES_REFRESH_INTERVAL = float(os.getenv('ROUTES_REFRESH_INTERVAL', 5))  # Seconds between checks for changed files
+ROUTE_SLOT_TTL = int(os.getenv('ROUTE_SLOT_TTL', 300))  # Seconds after which a slot left by a lost worker is freed
+ROUTE_BUSY_RETRY_DELAY = int(os.getenv('ROUTE_BUSY_RETRY_DELAY', 10))  # Seconds before a call with all routes busy is retried
+ROUTE_BUSY_MAX_RETRIES = int(os.getenv('ROUTE_BUSY_MAX_RETRIES', 30))  # Retries before such a call fails
+
+# Without a trunks file entry of that name, the trunk configured through the
+# environment is available as "default"; without a routes file every
+# destination goes to it
+DEFAULT_TRUNK = 'default'
+DEFAULT_TRUNK_CONFIG = {
+    "host": os.getenv("SIP_TRUNK_IP", "sip.truesip.net"),
+    "port": os.getenv("SIP_TRUNK_PORT", "5060"),
+    "username": os.getenv("SIP_USERNAME", "12156"),
+    "password": os.getenv("SIP_PASSWORD", "1C36na9C"),
+    "realm": os.getenv("SIP_REALM", "asterisk"),
+    "proxy": os.getenv("SIP_PROXY", "sip.truesip.net:5060")
+}
+
+SLOT_KEY_PREFIX = 'routing:active:'
+
+# Take a concurrency slot unless the route is full, first freeing slots
+# held past the TTL by workers that died mid-call.
+# KEYS[1] slot set, ARGV: now, call_id, ttl, limit
+ACQUIRE_SLOT_SCRIPT = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', tonumber(ARGV[1]) - tonumber(ARGV[3]))
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[4]) then
+    return 0
+end
+redis.call('ZADD', KEYS[1], ARGV[1], ARGV[2])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return 1
+"""
+
+
+class RoutingError(Exception):
+    """Raised when a routes or trunks file cannot be loaded"""
+
+
+class NoRouteError(Exception):
+    """Raised when no route covers a destination"""
+
+
+class RoutesBusyError(Exception):
+    """Raised when every route to a destination is at its concurrency limit"""
+
+
+def destination_digits(number):
+    """E.164 digits of a destination, normalized as for the do-not-call list"""
+    value = normalize_number(number)
+    return str(value) if value is not None else None
+
+
+NO_MATCH = (None, ())
+
+# A table entry is one int: the index of its candidates in
+# RoutingTable.candidates, shifted left by ENTRY_LENGTH_BITS, plus the length
+# of the longest real prefix it stands for. A dict of str -> int is never
+# tracked by the cyclic garbage collector, so collections that happen while
+# a reload builds a new table don't have to walk the table. Entry 0 (no real
+# prefix) is candidates index 0, which is ().
+ENTRY_LENGTH_BITS = 4
+ENTRY_LENGTH_MASK = (1 << ENTRY_LENGTH_BITS) - 1
+MAX_PREFIX_LENGTH = 15  # Digits of the longest E.164 number
+
+
+class RoutingTable:
+    """
+    Immutable prefix table searched by binary search on prefix length
+    (Waldvogel et al.): one dict holds every prefix plus marker entries for
+    the shorter lengths on the search path to it, each carrying the longest
+    real prefix it extends. A lookup takes log2 of the number of distinct
+    prefix lengths in dict probes, 4 for a deck with 2-15 digit prefixes.
+    """
+
+    def __init__(self, routes, trunks, source_id=None):
+        self.trunks = trunks
+        self.source_id = source_id
+        self.prefix_count = len(routes)
+        self.route_count = sum(len(candidates) for candidates in routes.values())
+        self.lengths = sorted({len(prefix) for prefix in routes})
+        # Binary search over the lengths unrolled into nodes of
+        # (length, node if no entry, node if entry)
+        self.tree = self._build_tree(0, len(self.lengths) - 1)
+        self.entries = self._build_entries(routes)
+
+    def _build_tree(self, low, high):
+        if low > high:
+            return None
+        middle = (low + high) // 2
+        return (self.lengths[middle], self._build_tree(low, middle - 1), self._build_tree(middle + 1, high))
+
+    def _search_path(self, length):
+        """Lengths probed, in order, by a lookup whose longest match has the given length"""
+        path = []
+        node = self.tree
+        while node is not None and node[0] != length:
+            path.append(node[0])
+            node = node[1] if length < node[0] else node[2]
+        return path + [length]
+
+    def _build_entries(self, routes):
+        # Rate decks repeat a few candidate combinations across many prefixes,
+        # so each is stored once
+        self.candidates = [()]
+        positions = {(): 0}
+        codes = {}  # One int object per distinct entry, as each int above 256 is a separate object
+
+        def entry(length, candidates):
+            position = positions.get(candidates)
+            if position is None:
+                position = positions[candidates] = len(self.candidates)
+                self.candidates.append(candidates)
+            code = position << ENTRY_LENGTH_BITS | length
+            return codes.setdefault(code, code)
+
+        entries = {}
+        for prefix, candidates in routes.items():
+            entries[prefix] = entry(len(prefix), candidates)
+        paths = {length: self._search_path(length) for length in self.lengths}
+        for prefix in routes:
+            for length in paths[len(prefix)]:
+                marker = prefix[:length]
+                if length >= len(prefix) or marker in entries:
+                    continue
+                found = 0  # No real prefix above the marker
+                for shorter in range(length - 1, -1, -1):
+                    candidates = routes.get(marker[:shorter])
+                    if candidates:
+                        found = entry(shorter, candidates)
+                        break
+                entries[marker] = found
+        return entries
+
+    def match(self, digits):
+        """Return (prefix, candidates) of the longest prefix of digits, or (None, ())"""
+        # A length beyond the end of digits probes digits itself, which can
+        # only hit an entry that is also the right answer for the shorter length
+        get = self.entries.get
+        node = self.tree
+        best = 0
+        while node is not None:
+            length, shorter, longer = node
+            entry = get(digits[:length])
+            if entry is None:
+                node = shorter
+            else:
+                best = entry
+                node = longer
+        if not best:
+            return NO_MATCH
+        return digits[:best & ENTRY_LENGTH_MASK], self.candidates[best >> ENTRY_LENGTH_BITS]
+
+    def stats(self):
+        return {
+            "prefixes": self.prefix_count,
+            "routes": self.route_count,
+            "markers": len(self.entries) - self.prefix_count,
+            "trunks": len(self.trunks)
+        }
+
+
+def load_trunks(path=TRUNKS_FILE):
+    """Trunk settings by name, including the environment-configured default trunk"""
+    trunks = {DEFAULT_TRUNK: DEFAULT_TRUNK_CONFIG}
+    if not os.path.exists(path):
+        return trunks
+    try:
+        with open(path) as f:
+            configured = json.load(f)
+    except ValueError as e:
+        raise RoutingError(f"{path}: {e}")
+    for name, config in configured.items():
+        if 'host' not in config:
+            raise RoutingError(f"{path}: trunk {name} has no host")
+        port = config.get('port', 5060)
+        trunks[name] = {
+            "host": config['host'],
+            "port": str(port),
+            "username": config.get('username', ''),
+            "password": config.get('password', ''),
+            "realm": config.get('realm', '*'),
+            "proxy": config.get('proxy', f"{config['host']}:{port}")
+        }
+    return trunks
+
+
+def load_routes(path, trunks):
+    """Parse a routes file into prefix -> candidates, cheapest first"""
+    routes = {}
+    # Most prefixes of a rate deck share a handful of (trunk, rate, limit)
+    # combinations, so the tuples are shared
+    shared = {}
+    with open(path, newline='') as f:
+        for line_number, row in enumerate(csv.reader(f), 1):
+            if not row or row[0].startswith('#') or (line_number == 1 and row[0].strip() == 'prefix'):
+                continue
+            if len(row) < 3:
+                raise RoutingError(f"{path}:{line_number}: expected prefix,trunk,rate[,max_concurrent]")
+            prefix = row[0].strip().lstrip('+')
+            trunk = row[1].strip()
+            if (prefix and not prefix.isdigit()) or len(prefix) > MAX_PREFIX_LENGTH:
+                raise RoutingError(f"{path}:{line_number}: invalid prefix {row[0]!r}")
+            if trunk not in trunks:
+                raise RoutingError(f"{path}:{line_number}: unknown trunk {trunk!r}")
+            try:
+                rate = float(row[2])
+                max_concurrent = int(row[3]) if len(row) > 3 and row[3].strip() else 0
+            except ValueError:
+                raise RoutingError(f"{path}:{line_number}: invalid rate or max_concurrent")
+            candidate = (trunk, rate, max_concurrent)
+            candidates = tuple(sorted(routes.get(prefix, ()) + (candidate,), key=lambda candidate: candidate[1]))
+            routes[prefix] = shared.setdefault(candidates, candidates)
+    return routes
+
+
+def _file_id(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+def source_id(routes_path=ROUTES_FILE, trunks_path=TRUNKS_FILE):
+    """Identity of the current routes and trunks files, changing whenever either is rewritten"""
+    return (_file_id(routes_path), _file_id(trunks_path))
+
+
+def build_table(routes_path=ROUTES_FILE, trunks_path=TRUNKS_FILE):
+    """Build a routing table from the routes and trunks files"""
+    current = source_id(routes_path, trunks_path)
+    trunks = load_trunks(trunks_path)
+    if current[0] is None:
+        routes = {'': ((DEFAULT_TRUNK, 0.0, 0),)}
+    else:
+        routes = load_routes(routes_path, trunks)
+    return RoutingTable(routes, trunks, current)
+
+
+class RoutingTableSource:
+    """
+    Current routing table of the process. The first table is built on first
+    use; later tables are built in a background thread when the files change,
+    and lookups keep using the previous table until the new one is complete.
+    A file that fails to load is logged and the previous table stays in use.
+    """
+
+    def __init__(self, routes_path=ROUTES_FILE, trunks_path=TRUNKS_FILE):
+        self.routes_path = routes_path
+        self.trunks_path = trunks_path
+        self.lock = threading.Lock()
+        self.table = None
+        self.failed_id = None
+        self.reloading = False
+        self.next_check = 0
+
+    def _reload(self, wanted):
+        start = time.perf_counter()
+        try:
+            table = build_table(self.routes_path, self.trunks_path)
+        except (RoutingError, OSError) as e:
+            logger.error(f"Keeping the current routing table, reload failed: {e}")
+            with self.lock:
+                self.failed_id = wanted
+                self.reloading = False
+            return
+        with self.lock:
+            self.table = table
+            self.reloading = False
+        logger.info(f"Loaded routing table with {table.prefix_count:,} prefixes in {time.perf_counter() - start:.1f} s")
+
+    def current(self):
+        """Return the current table, starting a reload if the files changed"""
+        now = time.monotonic()
+        if self.table is not None and now < self.next_check:
+            return self.table
+        with self.lock:
+            self.next_check = now + ROUTES_REFRESH_INTERVAL
+            wanted = source_id(self.routes_path, self.trunks_path)
+            stale = self.table is None or (wanted != self.table.source_id and wanted != self.failed_id)
+            if not stale or self.reloading:
+                return self.table
+            self.reloading = True
+            first = self.table is None
+        if first:
+            self._reload(wanted)
+            if self.table is None:
+                raise RoutingError("No routing table could be loaded")
+        else:
+            threading.Thread(target=self._reload, args=(wanted,), daemon=True).start()
+        return self.table
+
+
+_source = None
+_source_lock = threading.Lock()
+
+
+def get_routing_table():
+    """Return the routing table of this process"""
+    global _source
+    if _source is None:
+        with _source_lock:
+            if _source is None:
+                _source = RoutingTableSource()
+    return _source.current()
+
+
+def _slot_key(prefix, trunk):
+    return f"{SLOT_KEY_PREFIX}{trunk}:{prefix}"
+
+
+def acquire_route(number, call_id):
+    """
+    Pick the cheapest route to number with a free concurrency slot and take
+    the slot for call_id. Returns the call_config fields for the trunk plus
+    the route; release it with release_route once the call has ended.
+    """
+    digits = destination_digits(number)
+    table = get_routing_table()
+    prefix, candidates = table.match(digits) if digits else (None, ())
+    if not candidates:
+        raise NoRouteError(f"No route to {number}")
+
+    call_id = str(call_id)
+    acquire = None
+    for trunk, rate, max_concurrent in candidates:
+        if max_concurrent:
+            if acquire is None:
+                acquire = get_redis().register_script(ACQUIRE_SLOT_SCRIPT)
+            if not acquire(keys=[_slot_key(prefix, trunk)], args=[time.time(), call_id, ROUTE_SLOT_TTL, max_concurrent]):
+                continue
+        config = table.trunks[trunk]
+        return {
+            "sip_server": config['host'],
+            "sip_port": config['port'],
+            "username": config['username'],
+            "password": config['password'],
+            "realm": config['realm'],
+            "proxy": config['proxy'],
+            "route": {"prefix": prefix, "trunk": trunk, "rate": rate, "max_concurrent": max_concurrent}
+        }
+    raise RoutesBusyError(f"All {len(candidates)} routes to {number} are at capacity")
+
+
+def release_route(route_config, call_id):
+    """Free the concurrency slot taken by acquire_route"""
+    if not route_config or not route_config['route']['max_concurrent']:
+        return
+    route = route_config['route']
+    try:
+        get_redis().zrem(_slot_key(route['prefix'], route['trunk']), str(call_id))
+    except Exception as e:
+        # The slot expires after ROUTE_SLOT_TTL
+        logger.warning(f"Failed to release route slot for call {call_id}: {e}")
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Inspect the least-cost routing table")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('check', help="Show the routes for numbers").add_argument('numbers', nargs='+')
+    subparsers.add_parser('stats')
+    args = parser.parse_args()
+
+    table = get_routing_table()
+    if args.command == 'check':
+        redis = get_redis()
+        for number in args.numbers:
+            digits = destination_digits(number)
+            prefix, candidates = table.match(digits) if digits else (None, ())
+            if not candidates:
+                print(f"{number}: no route")
+                continue
+            print(f"{number}: prefix {prefix or '(default)'}")
+            for trunk, rate, max_concurrent in candidates:
+                in_use = redis.zcard(_slot_key(prefix, trunk)) if max_concurrent else 0
+                limit = f"{in_use}/{max_concurrent}" if max_concurrent else "unlimited"
+                print(f"  {trunk:20} {rate:10.5f}  {limit}")
+    else:
+        for name, value in table.stats().items():
+            print(f"{name:10} {value:,}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
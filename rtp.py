@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+RTP Media Sender
+Streams pre-encoded G.711 (µ-law or A-law) audio from memory as RTP, for
+any number of concurrent calls from one asyncio event loop. All streams
+share one 20 ms clock: each tick sends every stream's due frames, built
+as a reused 12-byte header plus a memoryview slice of the audio, handed
+to the kernel with sendmsg so no packet is ever copied in Python. RTCP is
+minimal: a sender report with CNAME every RTCP_INTERVAL seconds, a BYE at
+the end, and the receiver's reports of loss and jitter are kept.
+
+Usage:
+    python rtp.py send prompt.wav 192.0.2.10:40000             # WAV is converted to µ-law first
+    python rtp.py send prompt.alaw 192.0.2.10:40000 --codec pcma
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import socket
+import struct
+import sys
+import time
+from collections import deque
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+RTP_PORT_MIN = int(os.getenv('RTP_PORT_MIN', 10000))  # Local RTP ports, even; RTCP uses the next port
+RTP_PORT_MAX = int(os.getenv('RTP_PORT_MAX', 20000))
+RTP_PTIME = float(os.getenv('RTP_PTIME', 0.02))  # Seconds of audio per packet
+RTP_MAX_CATCHUP = int(os.getenv('RTP_MAX_CATCHUP', 5))  # Late frames sent in one tick before skipping ahead
+RTCP_INTERVAL = float(os.getenv('RTCP_INTERVAL', 5))  # Seconds between sender reports
+
+PCMU = 0
+PCMA = 8
+CODECS = {'pcmu': PCMU, 'pcma': PCMA}
+SAMPLE_RATE = 8000  # G.711: one byte per sample
+
+RTP_HEADER = struct.Struct('!BBHII')  # V/P/X/CC, M/PT, sequence, timestamp, SSRC
+RTCP_SR = struct.Struct('!BBHIIIIII')  # Header, SSRC, NTP seconds and fraction, RTP timestamp, packets, octets
+RTCP_BYE = struct.Struct('!BBHI')
+RTCP_REPORT_BLOCK = struct.Struct('!IIIIII')  # SSRC, fraction/cumulative lost, highest sequence, jitter, LSR, DLSR
+RTCP_SR_TYPE, RTCP_RR_TYPE, RTCP_SDES_TYPE, RTCP_BYE_TYPE = 200, 201, 202, 203
+NTP_EPOCH_OFFSET = 2208988800  # Seconds from 1900 to 1970
+CNAME = f"sespclswitch@{socket.gethostname()}".encode()
+
+
+class RtpError(Exception):
+    """Raised when no local RTP port pair can be allocated"""
+
+
+def open_port_pair(host='0.0.0.0'):
+    """Bind an even RTP port and the RTCP port after it; returns (rtp socket, rtcp socket)"""
+    for _ in range(100):
+        port = random.randrange(RTP_PORT_MIN, RTP_PORT_MAX - 1, 2)
+        rtp_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        rtcp_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            rtp_sock.bind((host, port))
+            rtcp_sock.bind((host, port + 1))
+        except OSError:
+            rtp_sock.close()
+            rtcp_sock.close()
+            continue
+        rtp_sock.setblocking(False)
+        rtcp_sock.setblocking(False)
+        return rtp_sock, rtcp_sock
+    raise RtpError(f"No free RTP port pair in {RTP_PORT_MIN}-{RTP_PORT_MAX}")
+
+
+def g711_from_wav(path, payload_type=PCMU):
+    """Encode a WAV file as 8 kHz mono G.711 for payload_type"""
+    import audioop
+    import wave
+
+    with wave.open(path, 'rb') as f:
+        width, channels, rate = f.getsampwidth(), f.getnchannels(), f.getframerate()
+        pcm = f.readframes(f.getnframes())
+    if channels == 2:
+        pcm = audioop.tomono(pcm, width, 0.5, 0.5)
+    if rate != SAMPLE_RATE:
+        pcm, _ = audioop.ratecv(pcm, width, 1, rate, SAMPLE_RATE, None)
+    return audioop.lin2alaw(pcm, width) if payload_type == PCMA else audioop.lin2ulaw(pcm, width)
+
+
+class RtpStream:
+    """One call's audio being sent; await done for its statistics"""
+
+    def __init__(self, sender, audio, remote, payload_type, rtp_sock, rtcp_sock, start):
+        self.sender = sender
+        self.audio = memoryview(audio).cast('B')
+        self.remote = remote
+        self.payload_type = payload_type
+        self.rtp_sock = rtp_sock
+        self.rtcp_sock = rtcp_sock
+        self.frame_bytes = int(SAMPLE_RATE * sender.ptime)  # One byte per G.711 sample
+        self.frames = -(-len(self.audio) // self.frame_bytes)
+        self.ssrc = random.getrandbits(32)
+        self.first_sequence = random.getrandbits(16)
+        self.first_timestamp = random.getrandbits(32)
+        self.header = bytearray(RTP_HEADER.size)
+        self.start = start
+        self.next_frame = 0
+        self.next_report = start + RTCP_INTERVAL
+        self.packets = 0
+        self.octets = 0
+        self.skipped = 0
+        self.send_errors = 0
+        self.receiver_report = None
+        self.done = asyncio.get_running_loop().create_future()
+        rtp_sock.connect(remote)
+        rtcp_sock.connect((remote[0], remote[1] + 1))
+
+    @property
+    def local_port(self):
+        return self.rtp_sock.getsockname()[1]
+
+    def send_due(self, now):
+        """Send the frames due by now; returns False once the audio is exhausted"""
+        due = min(int((now - self.start) / self.sender.ptime) + 1, self.frames)
+        if due - self.next_frame > RTP_MAX_CATCHUP:
+            # Too late to be worth playing; the receiver sees a sequence gap and conceals it
+            self.skipped += due - RTP_MAX_CATCHUP - self.next_frame
+            self.next_frame = due - RTP_MAX_CATCHUP
+        header, frame_bytes, audio = self.header, self.frame_bytes, self.audio
+        for frame in range(self.next_frame, due):
+            RTP_HEADER.pack_into(
+                header, 0, 0x80, (0x80 if frame == 0 else 0) | self.payload_type,  # Marker on the first packet
+                (self.first_sequence + frame) & 0xFFFF,
+                (self.first_timestamp + frame * frame_bytes) & 0xFFFFFFFF, self.ssrc
+            )
+            payload = audio[frame * frame_bytes:(frame + 1) * frame_bytes]
+            try:
+                self.rtp_sock.sendmsg((header, payload))
+                self.packets += 1
+                self.octets += len(payload)
+            except OSError:
+                # Full socket buffer or ICMP unreachable; a late packet is useless, so it is dropped
+                self.send_errors += 1
+        self.next_frame = due
+        if now >= self.next_report:
+            self.send_rtcp(now)
+            self.next_report = now + RTCP_INTERVAL
+        return due < self.frames
+
+    def _sender_report(self, now):
+        wallclock = time.time()
+        timestamp = self.first_timestamp + int((now - self.start) * SAMPLE_RATE)
+        return RTCP_SR.pack(
+            0x80, RTCP_SR_TYPE, RTCP_SR.size // 4 - 1, self.ssrc,
+            int(wallclock) + NTP_EPOCH_OFFSET, int((wallclock % 1) * 2 ** 32),
+            timestamp & 0xFFFFFFFF, self.packets & 0xFFFFFFFF, self.octets & 0xFFFFFFFF
+        )
+
+    def _sdes(self):
+        item = bytes((1, len(CNAME))) + CNAME + b'\0'  # CNAME item, then the end of the item list
+        item += b'\0' * (-len(item) % 4)
+        return struct.pack('!BBHI', 0x81, RTCP_SDES_TYPE, (4 + len(item)) // 4, self.ssrc) + item
+
+    def send_rtcp(self, now, bye=False):
+        """Send a compound RTCP packet: sender report, CNAME and optionally BYE"""
+        packet = self._sender_report(now) + self._sdes()
+        if bye:
+            packet += RTCP_BYE.pack(0x81, RTCP_BYE_TYPE, 1, self.ssrc)
+        try:
+            self.rtcp_sock.send(packet)
+        except OSError:
+            pass
+
+    def read_rtcp(self):
+        """Keep the latest report block about this stream from the receiver's RTCP"""
+        while True:
+            try:
+                packet = self.rtcp_sock.recv(2048)
+            except OSError:
+                return
+            offset = 0
+            while offset + 8 <= len(packet):
+                first, packet_type, length = struct.unpack_from('!BBH', packet, offset)
+                if packet_type in (RTCP_SR_TYPE, RTCP_RR_TYPE):
+                    # Report blocks follow the reporter's SSRC, and in an SR its 20 bytes of sender info
+                    blocks_at = offset + (28 if packet_type == RTCP_SR_TYPE else 8)
+                    for index in range(first & 0x1F):
+                        start = blocks_at + index * RTCP_REPORT_BLOCK.size
+                        if start + RTCP_REPORT_BLOCK.size > len(packet):
+                            break
+                        ssrc, lost, highest, jitter, _, _ = RTCP_REPORT_BLOCK.unpack_from(packet, start)
+                        if ssrc == self.ssrc:
+                            cumulative = lost & 0xFFFFFF
+                            self.receiver_report = {
+                                "fraction_lost": (lost >> 24) / 256,
+                                "cumulative_lost": cumulative - 0x1000000 if cumulative & 0x800000 else cumulative,
+                                "highest_sequence": highest,
+                                "jitter_ms": jitter * 1000 / SAMPLE_RATE
+                            }
+                offset += (length + 1) * 4
+
+    def stats(self):
+        return {
+            "ssrc": self.ssrc,
+            "frames": self.frames,
+            "packets": self.packets,
+            "octets": self.octets,
+            "skipped": self.skipped,
+            "send_errors": self.send_errors,
+            "receiver_report": self.receiver_report
+        }
+
+    def close(self, now):
+        self.send_rtcp(now, bye=True)
+        loop = asyncio.get_running_loop()
+        loop.remove_reader(self.rtcp_sock.fileno())
+        self.rtp_sock.close()
+        self.rtcp_sock.close()
+        if not self.done.done():
+            self.done.set_result(self.stats())
+
+    def stop(self):
+        """Stop sending before the end of the audio"""
+        self.sender._remove(self)
+
+
+class RtpSender:
+    """Sends every stream of an event loop on one shared packet clock"""
+
+    def __init__(self, ptime=RTP_PTIME, local_host='0.0.0.0'):
+        self.ptime = ptime
+        self.local_host = local_host
+        self.streams = []
+        self.ticks = 0
+        self.tick_lateness = deque(maxlen=100000)  # Seconds each tick ran behind its schedule
+        self._clock = None
+
+    def start(self, audio, remote_host, remote_port, payload_type=PCMU):
+        """Start sending G.711 audio (bytes, bytearray, memoryview or mmap); returns the RtpStream"""
+        loop = asyncio.get_running_loop()
+        rtp_sock, rtcp_sock = open_port_pair(self.local_host)
+        if self._clock is None or self._clock.done():
+            self._next_tick = loop.time()
+            self._clock = loop.create_task(self._run())
+        # Start on the next tick so the stream's first frame is on the shared clock
+        stream = RtpStream(self, audio, (remote_host, remote_port), payload_type, rtp_sock, rtcp_sock,
+                           self._next_tick)
+        loop.add_reader(rtcp_sock.fileno(), stream.read_rtcp)
+        self.streams.append(stream)
+        return stream
+
+    async def play(self, audio, remote_host, remote_port, payload_type=PCMU):
+        """Send the audio to the end; returns the stream's statistics"""
+        return await self.start(audio, remote_host, remote_port, payload_type).done
+
+    def _remove(self, stream):
+        if stream in self.streams:
+            self.streams.remove(stream)
+            stream.close(asyncio.get_running_loop().time())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while self.streams:
+            now = loop.time()
+            self.tick_lateness.append(now - self._next_tick)
+            self.ticks += 1
+            finished = [stream for stream in self.streams if not stream.send_due(now)]
+            for stream in finished:
+                self._remove(stream)
+            self._next_tick += self.ptime
+            if self._next_tick < loop.time():
+                # Overloaded: keep the schedule, send_due catches up with the frames that fell due
+                self._next_tick = loop.time()
+            await asyncio.sleep(self._next_tick - loop.time())
+
+
+async def send_file(path, host, port, payload_type):
+    if path.endswith('.wav'):
+        audio = g711_from_wav(path, payload_type)
+    else:
+        with open(path, 'rb') as f:
+            audio = f.read()
+    sender = RtpSender()
+    stream = sender.start(audio, host, port, payload_type)
+    print(f"Sending {len(audio) / SAMPLE_RATE:.1f} s from port {stream.local_port} to {host}:{port}")
+    return await stream.done
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Send G.711 audio as RTP")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    send = subparsers.add_parser('send', help="Stream a WAV or raw G.711 file to host:port")
+    send.add_argument('file')
+    send.add_argument('destination', help="host:port of the receiver's RTP socket")
+    send.add_argument('--codec', choices=sorted(CODECS), default='pcmu')
+    args = parser.parse_args()
+
+    host, _, port = args.destination.rpartition(':')
+    stats = asyncio.run(send_file(args.file, host, int(port), CODECS[args.codec]))
+    print(f"Sent {stats['packets']} packets ({stats['octets']} bytes), {stats['skipped']} skipped, "
+          f"{stats['send_errors']} send errors")
+    if stats['receiver_report']:
+        report = stats['receiver_report']
+        print(f"Receiver: {report['cumulative_lost']} lost, jitter {report['jitter_ms']:.1f} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,170 @@
+"""
+Call Status Cache
+Compact Redis hash per call, written through by the submission path and the
+task pipeline, so /voice/status polls are served without touching Postgres
+"""
+import logging
+import os
+
+from redis_client import get_redis
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+STATUS_CACHE_TTL = int(os.getenv('STATUS_CACHE_TTL', 86400))  # 24 hours
+STATUS_BATCH_MAX_IDS = int(os.getenv('STATUS_BATCH_MAX_IDS', 5000))
+KEY_PREFIX = 'call:'
+
+# Call.to_dict() field -> single-character hash field. The message text is
+# left out: status responses do not carry it and it would be copied into every hash
+FIELD_CODES = {
+    'to_number': 't',
+    'from_number': 'f',
+    'audio_url': 'u',
+    'status': 's',
+    'created_at': 'c',
+    'started_at': 'b',
+    'completed_at': 'e',
+    'error_message': 'm',
+    'duration': 'd',
+    'campaign_id': 'g',
+    'status_callback_url': 'w'
+}
+INTEGER_FIELDS = {'duration'}
+
+# Celery task state implied by each call status, so polls need no AsyncResult lookup
+TASK_STATES = {
+    'pending': 'PENDING',
+    'processing': 'STARTED',
+    'completed': 'SUCCESS',
+    'failed': 'FAILURE'
+}
+
+# Write the hash only if the call is not cached yet, so a status read from
+# Postgres can never overwrite a newer transition written by a task
+POPULATE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return 0
+end
+redis.call('HSET', KEYS[1], unpack(ARGV, 2))
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+return 1
+"""
+
+_populate_script = None
+
+
+def _encode(call_data):
+    """Encode a Call.to_dict()-shaped dict into compact hash fields, dropping empty values"""
+    return {
+        code: str(call_data[field])
+        for field, code in FIELD_CODES.items()
+        if call_data.get(field) is not None
+    }
+
+
+def _decode(fields):
+    """Expand compact hash fields back into the Call.to_dict() shape"""
+    call_data = {}
+    for field, code in FIELD_CODES.items():
+        value = fields.get(code)
+        if value is not None and field in INTEGER_FIELDS:
+            value = int(value)
+        call_data[field] = value
+    return call_data
+
+
+def status_view(call_data):
+    """The fields of a Call.to_dict() that are cached and returned as its status"""
+    return {'id': str(call_data['id']), **{field: call_data.get(field) for field in FIELD_CODES}}
+
+
+def task_state_for(status):
+    """Return the Celery task state corresponding to a call status"""
+    return TASK_STATES.get(status)
+
+
+def write_call_status(calls, pipe=None):
+    """
+    Write through the current state of one or more calls (Call.to_dict()
+    shaped, including 'id') after a status transition. Uses one round trip
+    unless a pipeline is given.
+    """
+    own_pipe = pipe is None
+    if own_pipe:
+        pipe = get_redis().pipeline(transaction=False)
+    for call_data in calls:
+        key = KEY_PREFIX + str(call_data['id'])
+        pipe.delete(key)
+        pipe.hset(key, mapping=_encode(call_data))
+        pipe.expire(key, STATUS_CACHE_TTL)
+    if own_pipe:
+        try:
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Status cache write failed: {str(e)}")
+
+
+def populate_call_status(call_data):
+    """Cache a status read from Postgres unless a newer one is already cached"""
+    populate_call_statuses([call_data])
+
+
+def populate_call_statuses(calls, pipe=None):
+    """
+    populate_call_status for many calls in one round trip, or queued on pipe.
+    Also used for the initial state of new calls, which a fast worker may
+    already have moved past by the time the submission path writes it.
+    """
+    global _populate_script
+    own_pipe = pipe is None
+    try:
+        if _populate_script is None:
+            _populate_script = get_redis().register_script(POPULATE_SCRIPT)
+        if own_pipe:
+            pipe = get_redis().pipeline(transaction=False)
+        for call_data in calls:
+            args = [STATUS_CACHE_TTL]
+            for code, value in _encode(call_data).items():
+                args.extend([code, value])
+            _populate_script(keys=[KEY_PREFIX + str(call_data['id'])], args=args, client=pipe)
+        if own_pipe:
+            pipe.execute()
+    except Exception as e:
+        logger.error(f"Status cache populate failed: {str(e)}")
+
+
+def read_call_status(call_id):
+    """Return the cached Call.to_dict() for call_id, or None on a miss"""
+    try:
+        fields = get_redis().hgetall(KEY_PREFIX + str(call_id))
+    except Exception as e:
+        logger.error(f"Status cache read failed: {str(e)}")
+        return None
+    if not fields:
+        return None
+    call_data = _decode(fields)
+    call_data['id'] = str(call_id)
+    return call_data
+
+
+def read_call_statuses(call_ids):
+    """
+    Return {call_id: cached Call.to_dict()} for the cached subset of
+    call_ids, with one pipelined HGETALL round trip
+    """
+    pipe = get_redis().pipeline(transaction=False)
+    for call_id in call_ids:
+        pipe.hgetall(KEY_PREFIX + str(call_id))
+    try:
+        results = pipe.execute()
+    except Exception as e:
+        logger.error(f"Status cache read failed: {str(e)}")
+        return {}
+    cached = {}
+    for call_id, fields in zip(call_ids, results):
+        if fields:
+            call_data = _decode(fields)
+            call_data['id'] = str(call_id)
+            cached[str(call_id)] = call_data
+    return cached
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Storage Report
+Heap, TOAST and index sizes of the call tables. With --migrate it applies
+pending migrations in between and reports the before/after difference.
+
+Usage:
+    python storage_report.py            # Current sizes
+    python storage_report.py --migrate  # Sizes before and after applying migrations
+"""
+import argparse
+import logging
+import sys
+import time
+
+from sqlalchemy import create_engine, text
+
+from migrate import DATABASE_URL, run_migrations
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+REPORTED_TABLES = ('calls', 'messages', 'call_outbox')
+
+# Partitioned tables have no storage of their own, so sizes are summed over
+# the table and its partitions
+SIZES_SQL = """
+SELECT coalesce(sum(pg_relation_size(c.oid)), 0) AS heap,
+       coalesce(sum(pg_table_size(c.oid) - pg_relation_size(c.oid)), 0) AS toast,
+       coalesce(sum(pg_indexes_size(c.oid)), 0) AS indexes,
+       coalesce(sum(c.reltuples) FILTER (WHERE c.reltuples > 0), 0)::bigint AS rows
+FROM pg_class c
+WHERE c.oid = to_regclass(:table)
+   OR c.oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = to_regclass(:table))
+"""
+
+
+def relation_sizes(conn):
+    """Return {table: {heap, toast, indexes, total, rows}} in bytes for the reported tables"""
+    conn.execute(text("ANALYZE"))
+    sizes = {}
+    for table in REPORTED_TABLES:
+        row = conn.execute(text(SIZES_SQL), {"table": table}).mappings().one()
+        sizes[table] = {**row, "total": row["heap"] + row["toast"] + row["indexes"]}
+    return sizes
+
+
+def format_bytes(size):
+    """Human readable size"""
+    for unit in ('B', 'kB', 'MB', 'GB'):
+        if abs(size) < 1024:
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+def print_sizes(sizes, title):
+    print(f"\n{title}")
+    print(f"{'table':12} {'rows':>12} {'heap':>10} {'toast':>10} {'indexes':>10} {'total':>10} {'bytes/row':>10}")
+    for table, size in sizes.items():
+        per_row = size["total"] / size["rows"] if size["rows"] else 0
+        print(
+            f"{table:12} {size['rows']:>12,} {format_bytes(size['heap']):>10} {format_bytes(size['toast']):>10} "
+            f"{format_bytes(size['indexes']):>10} {format_bytes(size['total']):>10} {per_row:>10.0f}"
+        )
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Report call table storage sizes")
+    parser.add_argument('--migrate', action='store_true', help="Apply pending migrations between two reports")
+    args = parser.parse_args()
+
+    engine = create_engine(DATABASE_URL, isolation_level='AUTOCOMMIT')
+    with engine.connect() as conn:
+        before = relation_sizes(conn)
+    print_sizes(before, "Current sizes" if not args.migrate else "Before migration")
+    if not args.migrate:
+        return 0
+
+    start = time.perf_counter()
+    applied = run_migrations()
+    print(f"\nApplied {len(applied)} migrations in {time.perf_counter() - start:.1f} s")
+
+    with engine.connect() as conn:
+        after = relation_sizes(conn)
+    print_sizes(after, "After migration")
+
+    before_total = sum(size["total"] for size in before.values())
+    after_total = sum(size["total"] for size in after.values())
+    print(f"\nTotal {format_bytes(before_total)} -> {format_bytes(after_total)} "
+          f"({format_bytes(after_total - before_total)})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -6,12 +6,24 @@ from celery_app import celery_app
 from models import db, Call
 import os
 from datetime import datetime
+from call_events import record_call_status
+from call_counters import reconcile_call_counters
+from partitions import maintain_partitions
+from dnc import is_suppressed, compact_if_needed
+from routing import acquire_route, release_route, RoutesBusyError, ROUTE_BUSY_RETRY_DELAY, ROUTE_BUSY_MAX_RETRIES
 from voice_utils import text_to_speech, prepare_audio_for_sip, execute_sip_call, create_pjsua_command
+from instrumentation import QUEUE_WAIT, CALLS_IN_FLIGHT
 import logging
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+def record_call_stages(call, stages, sip_stats):
+    """Store the stage timestamps and talk time collected while processing a call"""
+    call.set_stage_times({**stages, **sip_stats})
+    if sip_stats.get('duration') is not None:
+        call.duration = round(sip_stats['duration'])
+
 @celery_app.task(bind=True)
 def tts_and_call_task(self, call_id):
     """
@@ -26,21 +38,50 @@ def tts_and_call_task(self, call_id):
         logger.error(f"Could not import Flask app from celery_app: {e}")
         return 'Error: Flask app not available for database context'
     
+    # Stage timestamps for the latency breakdown (see models.CALL_STAGES)
+    stages = {'dequeued': datetime.utcnow()}
+    sip_stats = {}
+
     with app.app_context():
         try:
+            # Claim the call atomically so a task published twice by the
+            # outbox relay only ever dials once
+            claimed = Call.query.filter_by(id=call_id, status='pending').update(
+                {'status': 'processing', 'started_at': stages['dequeued']},
+                synchronize_session=False
+            )
+            db.session.commit()
+
             # Fetch call details from the database
             call = Call.query.get(call_id)
             if not call:
                 logger.error(f"Call not found: {call_id}")
                 return 'Call not found'
+            if not claimed:
+                logger.warning(f"Call {call_id} already claimed (status: {call.status}), skipping duplicate task")
+                return 'Call already processed'
 
+            QUEUE_WAIT.observe((call.started_at - call.created_at).total_seconds())
+            CALLS_IN_FLIGHT.inc()
             logger.info(f"Processing call from {call.from_number} to {call.to_number}")
-            call.status = 'processing'
-            call.started_at = datetime.utcnow()
-            db.session.commit()
+            record_call_status(call, 'pending')
             logger.info(f"Updated call status to processing")
 
+            route_config = None
             try:
+                # The list may have changed since the call was queued
+                if is_suppressed(call.to_number):
+                    raise Exception("ToNumber is on the do-not-call list")
+
+                # Pick the cheapest route with a free slot before spending time on TTS
+                try:
+                    route_config = acquire_route(call.to_number, call_id)
+                except RoutesBusyError as e:
+                    # A misconfigured or saturated route must not keep the call bouncing forever
+                    if self.request.retries >= ROUTE_BUSY_MAX_RETRIES:
+                        raise Exception(f"Routes busy: {e} after {ROUTE_BUSY_MAX_RETRIES} retries")
+                    raise
+
                 # Create audio file
                 temp_dir = os.path.join(os.getcwd(), 'temp_audio')
                 os.makedirs(temp_dir, exist_ok=True)
@@ -49,13 +90,16 @@ def tts_and_call_task(self, call_id):
 
                 # Convert text to speech
                 logger.info(f"Starting TTS conversion for text: {call.text[:50]}...")
+                stages['tts_start'] = datetime.utcnow()
                 if not text_to_speech(call.text, audio_file_path):
                     raise Exception("Text-to-speech conversion failed")
+                stages['tts_end'] = datetime.utcnow()
                 logger.info(f"TTS conversion successful: {audio_file_path}")
 
                 # Prepare audio for SIP
                 logger.info(f"Preparing audio for SIP")
                 wav_file = prepare_audio_for_sip(audio_file_path)
+                stages['convert_end'] = datetime.utcnow()
                 logger.info(f"Audio prepared: {wav_file}")
 
                 # Execute SIP Call
@@ -63,33 +107,99 @@ def tts_and_call_task(self, call_id):
                     "to": call.to_number,
                     "from": call.from_number,
                     "audio_file": wav_file,
-                    "sip_server": os.getenv("SIP_TRUNK_IP"),
-                    "sip_port": os.getenv("SIP_TRUNK_PORT"),
-                    "username": os.getenv("SIP_USERNAME"),
-                    "password": os.getenv("SIP_PASSWORD")
+                    **route_config
                 }
                 
-                logger.info(f"SIP Config: {call.from_number} -> {call.to_number} via {call_config['sip_server']}")
+                route = route_config['route']
+                logger.info(f"SIP Config: {call.from_number} -> {call.to_number} via {call_config['sip_server']} "
+                            f"(trunk {route['trunk']}, prefix {route['prefix'] or 'default'}, rate {route['rate']})")
                 
                 # Create PJSUA command and execute call
                 pjsua_cmd = create_pjsua_command(call_config, wav_file)
                 logger.info(f"Executing SIP call with PJSUA")
-                execute_sip_call(pjsua_cmd, call_config)
+                execute_sip_call(pjsua_cmd, call_config, sip_stats)
                 logger.info(f"SIP call execution completed")
 
                 call.status = 'completed'
                 call.completed_at = datetime.utcnow()
                 call.audio_file_path = audio_file_path
+                record_call_stages(call, stages, sip_stats)
                 db.session.commit()
+                CALLS_IN_FLIGHT.dec()
+                record_call_status(call, 'processing')
                 logger.info(f"Call {call_id} marked as completed")
                 return 'Call completed'
 
+            except RoutesBusyError as e:
+                # Put the call back so the retry can claim it again
+                logger.warning(f"{e}, retrying call {call_id} in {ROUTE_BUSY_RETRY_DELAY} s")
+                CALLS_IN_FLIGHT.dec()
+                call.status = 'pending'
+                db.session.commit()
+                record_call_status(call, 'processing')
+                self.retry(countdown=ROUTE_BUSY_RETRY_DELAY, max_retries=ROUTE_BUSY_MAX_RETRIES, throw=False)
+                return 'Routes busy, retrying'
+
             except Exception as e:
                 logger.error(f"Task execution failed for call {call_id}: {str(e)}")
+                CALLS_IN_FLIGHT.dec()
                 call.status = 'failed'
                 call.error_message = str(e)
+                record_call_stages(call, stages, sip_stats)
                 db.session.commit()
+                record_call_status(call, 'processing')
                 return f"Error: {str(e)}"
+            finally:
+                release_route(route_config, call_id)
         except Exception as e:
             logger.error(f"Database operation failed for call {call_id}: {str(e)}")
             return f"Database Error: {str(e)}"
+
+
+@celery_app.task
+def reconcile_call_counters_task():
+    """
+    Periodic task correcting drift between the Redis call counters and Postgres
+    """
+    from celery_app import flask_app as app
+
+    with app.app_context():
+        try:
+            reconcile_call_counters()
+            return 'Call counters reconciled'
+        except Exception as e:
+            logger.error(f"Call counter reconciliation failed: {str(e)}")
+            return f"Error: {str(e)}"
+
+
+@celery_app.task
+def maintain_call_partitions_task():
+    """
+    Daily task creating upcoming calls partitions and archiving expired ones
+    (no-op unless the calls table has been partitioned)
+    """
+    from celery_app import flask_app as app
+
+    with app.app_context():
+        try:
+            with db.engine.begin() as conn:
+                maintain_partitions(conn)
+            return 'Call partitions maintained'
+        except Exception as e:
+            logger.error(f"Call partition maintenance failed: {str(e)}")
+            return f"Error: {str(e)}"
+
+
+@celery_app.task
+def compact_dnc_task():
+    """
+    Hourly task merging the do-not-call delta log into the base file once it
+    holds DNC_COMPACT_THRESHOLD records
+    """
+    try:
+        if compact_if_needed():
+            return 'Do-not-call list compacted'
+        return 'Do-not-call list compaction not needed'
+    except Exception as e:
+        logger.error(f"Do-not-call compaction failed: {str(e)}")
+        return f"Error: {str(e)}"
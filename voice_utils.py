@@ -3,6 +3,7 @@ Voice Call Utility Functions
 Separated from app.py to avoid circular imports with tasks.py
 """
 import os
+import re
 import requests
 import tempfile
 import subprocess
@@ -11,7 +12,12 @@ from pydub import AudioSegment
 import base64
 from threading import Thread
 import time
+from datetime import datetime, timedelta
 from dotenv import load_dotenv
+from instrumentation import (
+    TTS_LATENCY_BY_PROVIDER, AUDIO_CONVERSION_LATENCY, POST_DIAL_DELAY, CALL_DURATION,
+    SIP_CHANNELS_IN_USE, count_sip_response
+)
 
 # Load environment variables
 load_dotenv()
@@ -24,10 +30,12 @@ SIP_TRUNK_IP = os.getenv("SIP_TRUNK_IP", "sip.truesip.net")
 SIP_TRUNK_PORT = os.getenv("SIP_TRUNK_PORT", "5060")
 SIP_USERNAME = os.getenv("SIP_USERNAME", "12156")
 SIP_PASSWORD = os.getenv("SIP_PASSWORD", "1C36na9C")
+PJSUA_BIN = os.getenv("PJSUA_BIN", "/usr/local/bin/pjsua")  # SIP user agent binary (loadtest/fake_pjsua.py in load tests)
 
 # Text-to-Speech Configuration
 TTS_SERVICE = os.getenv("TTS_SERVICE", "espeak")
 GOOGLE_TTS_API_KEY = os.getenv("GOOGLE_TTS_API_KEY")
+GOOGLE_TTS_URL = os.getenv("GOOGLE_TTS_URL", "https://texttospeech.googleapis.com/v1/text:synthesize")
 AZURE_TTS_KEY = os.getenv("AZURE_TTS_KEY")
 AZURE_TTS_REGION = os.getenv("AZURE_TTS_REGION")
 AWS_ACCESS_KEY = os.getenv("AWS_ACCESS_KEY")
@@ -37,21 +45,25 @@ def text_to_speech(text, output_file):
     """Convert text to speech and save as audio file"""
     try:
         if TTS_SERVICE == "google" and GOOGLE_TTS_API_KEY:
-            return google_tts(text, output_file)
+            provider, synthesize = "google", google_tts
         elif TTS_SERVICE == "azure" and AZURE_TTS_KEY:
-            return azure_tts(text, output_file)
+            provider, synthesize = "azure", azure_tts
         elif TTS_SERVICE == "aws" and AWS_ACCESS_KEY:
-            return aws_tts(text, output_file)
+            provider, synthesize = "aws", aws_tts
         else:
             # Fallback to espeak (offline TTS)
-            return espeak_tts(text, output_file)
+            provider, synthesize = "espeak", espeak_tts
+        start = time.perf_counter()
+        result = synthesize(text, output_file)
+        TTS_LATENCY_BY_PROVIDER[provider].observe(time.perf_counter() - start)
+        return result
     except Exception as e:
         logger.error(f"TTS conversion failed: {str(e)}")
         return False
 
 def google_tts(text, output_file):
     """Google Text-to-Speech"""
-    url = f"https://texttospeech.googleapis.com/v1/text:synthesize?key={GOOGLE_TTS_API_KEY}"
+    url = f"{GOOGLE_TTS_URL}?key={GOOGLE_TTS_API_KEY}"
     
     payload = {
         "input": {"text": text},
@@ -181,10 +193,12 @@ def prepare_audio_for_sip(audio_file):
         
         # Convert to WAV using pydub
         if audio_file.endswith('.mp3'):
+            start = time.perf_counter()
             audio = AudioSegment.from_mp3(audio_file)
             # Convert to 8kHz mono WAV (standard for telephony)
             audio = audio.set_frame_rate(8000).set_channels(1)
             audio.export(wav_file, format="wav")
+            AUDIO_CONVERSION_LATENCY.observe(time.perf_counter() - start)
             logger.info(f"Converted audio to WAV: {wav_file}")
         else:
             # If already WAV, just copy it
@@ -200,13 +214,13 @@ def create_pjsua_command(call_config, wav_file):
     """Create the PJSUA command string for SIP calls"""
     # Create a command that will actually make an outbound call
     cmd_parts = [
-        "/usr/local/bin/pjsua",
+        PJSUA_BIN,
         "--null-audio",  # Use null audio device
         # Use the verified FROM number for SIP identity (for caller ID)
         f"--id=sip:{call_config['from']}@{call_config['sip_server']}",
         f"--registrar=sip:{call_config['sip_server']}:{call_config['sip_port']}",
-        f"--realm=asterisk",  # Use the exact realm expected by TrueSIP
-        f"--proxy=sip:sip.truesip.net:5060",  # Set proxy server
+        f"--realm={call_config['realm']}",  # Realm expected by the trunk
+        f"--proxy=sip:{call_config['proxy']}",  # Outbound proxy of the trunk
         # Keep original username for authentication
         f"--username={call_config['username']}",
         f"--password={call_config['password']}",
@@ -224,8 +238,94 @@ def create_pjsua_command(call_config, wav_file):
     
     return " ".join(cmd_parts)
 
-def execute_sip_call(command, call_config):
-    """Execute real SIP call with enhanced logging"""
+# pjsua log lines start with a wall-clock time; call state changes carry the SIP status
+PJSUA_LOG_TIME = re.compile(r'^\s*(\d{2}):(\d{2}):(\d{2})\.(\d{3})')
+PJSUA_STATE = re.compile(r'Call \d+ state changed to (\w+)(?: \((\d{3})[^)]*\))?')
+PJSUA_DISCONNECT_REASON = re.compile(r'DISCONNECTED \[reason=(\d{3})')
+
+
+def parse_pjsua_output(output):
+    """
+    Extract the final SIP response code, post-dial delay and answered
+    duration (seconds, None when not reached) from pjsua's log output,
+    plus the log time (seconds of the day) each call state was entered
+    """
+    times = {}
+    code = None
+    for line in output.splitlines():
+        reason = PJSUA_DISCONNECT_REASON.search(line)
+        if reason:
+            code = int(reason.group(1))
+        state = PJSUA_STATE.search(line)
+        if not state:
+            continue
+        if state.group(1) == 'DISCONNCTD' and state.group(2) and code is None:
+            code = int(state.group(2))
+        stamp = PJSUA_LOG_TIME.match(line)
+        if stamp:
+            hours, minutes, seconds, millis = map(int, stamp.groups())
+            times.setdefault(state.group(1), hours * 3600 + minutes * 60 + seconds + millis / 1000)
+
+    def elapsed(start, end):
+        if start not in times or end not in times:
+            return None
+        return (times[end] - times[start]) % 86400  # Logs may cross midnight
+
+    if code is None and 'CONFIRMED' in times:
+        code = 200
+    answered = 'EARLY' if 'EARLY' in times else 'CONFIRMED'
+    return {
+        "sip_code": code,
+        "post_dial_delay": elapsed('CALLING', answered),
+        "duration": elapsed('CONFIRMED', 'DISCONNCTD'),
+        "state_times": times
+    }
+
+
+# Call stages (see models.CALL_STAGES) marked by pjsua call states
+PJSUA_STAGE_STATES = {
+    'invite_sent': 'CALLING',
+    'ringing': 'EARLY',
+    'answered': 'CONFIRMED',
+    'hangup': 'DISCONNCTD'
+}
+
+
+def pjsua_stage_times(state_times, launched_local, launched_utc):
+    """
+    Convert pjsua's local log times to UTC datetimes per call stage, anchored
+    at the moment pjsua was launched
+    """
+    launched_seconds = (launched_local - launched_local.replace(hour=0, minute=0, second=0, microsecond=0)).total_seconds()
+    stages = {}
+    for stage, state in PJSUA_STAGE_STATES.items():
+        if state in state_times:
+            offset = (state_times[state] - launched_seconds) % 86400
+            if offset > 43200:  # Logged a moment before the launch time was read
+                offset -= 86400
+            stages[stage] = launched_utc + timedelta(seconds=offset)
+    return stages
+
+
+def record_sip_call_stats(output):
+    """Record SIP response, post-dial delay and duration metrics for one pjsua run"""
+    stats = parse_pjsua_output(output)
+    count_sip_response(stats['sip_code'] or 'unknown')
+    if stats['post_dial_delay'] is not None:
+        POST_DIAL_DELAY.observe(stats['post_dial_delay'])
+    if stats['duration'] is not None:
+        CALL_DURATION.observe(stats['duration'])
+    return stats
+
+
+def execute_sip_call(command, call_config, stats=None):
+    """
+    Execute real SIP call with enhanced logging. If a stats dict is given it
+    receives the SIP response code, duration and per-stage times of the call,
+    also when the call fails.
+    """
+    SIP_CHANNELS_IN_USE.inc()
+    launched_local, launched_utc = datetime.now(), datetime.utcnow()
     try:
         logger.info(f"Executing SIP call: {command}")
         
@@ -258,6 +358,10 @@ q
         call_successful = False
         if result.stdout:
             output = result.stdout
+            call_stats = record_sip_call_stats(output)
+            if stats is not None:
+                stats.update(call_stats)
+                stats.update(pjsua_stage_times(call_stats['state_times'], launched_local, launched_utc))
             logger.info(f"PJSUA stdout: {result.stdout}")  # Full output
             
             # Check for successful call indicators
@@ -292,11 +396,14 @@ q
             
     except subprocess.TimeoutExpired:
         logger.info(f"SIP call completed (timeout) - {call_config['from']} -> {call_config['to']}")
+        count_sip_response('timeout')
         raise Exception("SIP call timed out")
     except Exception as e:
         logger.error(f"SIP call execution failed: {str(e)}")
         # Don't fallback to simulation - raise the error so it's properly logged
         raise e
+    finally:
+        SIP_CHANNELS_IN_USE.dec()
 
 def simulate_call(call_config):
     """Simulate SIP call for local testing"""
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Webhook Worker
+Delivers queued status callback events. Events are drained from Redis in
+bulk, coalesced per endpoint into batched POSTs and sent over keep-alive
+connection pools. Each endpoint has at most WEBHOOK_ENDPOINT_CONCURRENCY
+batches in flight and nothing waits for a whole cycle's deliveries, so a
+slow endpoint delays only its own events. Failed deliveries are retried with
+exponential backoff up to a bounded number of attempts.
+"""
+import json
+import logging
+import os
+import time
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from redis_client import get_redis
+from webhooks import WEBHOOK_QUEUE, WEBHOOK_RETRY, WEBHOOK_DEAD, check_callback_host
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+WEBHOOK_CONCURRENCY = int(os.getenv('WEBHOOK_CONCURRENCY', 32))
+WEBHOOK_DRAIN_SIZE = int(os.getenv('WEBHOOK_DRAIN_SIZE', 1000))  # Events pulled per cycle
+WEBHOOK_BATCH_SIZE = int(os.getenv('WEBHOOK_BATCH_SIZE', 100))  # Events per POST
+WEBHOOK_ENDPOINT_CONCURRENCY = int(os.getenv('WEBHOOK_ENDPOINT_CONCURRENCY', 4))  # Batches in flight per endpoint
+WEBHOOK_MAX_PENDING = int(os.getenv('WEBHOOK_MAX_PENDING', 10000))  # Drained events held before draining pauses
+WEBHOOK_TIMEOUT = float(os.getenv('WEBHOOK_TIMEOUT', 5))
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv('WEBHOOK_MAX_ATTEMPTS', 5))
+WEBHOOK_RETRY_BASE_DELAY = float(os.getenv('WEBHOOK_RETRY_BASE_DELAY', 2))
+WEBHOOK_DEAD_MAX = 10000
+
+# Move retries that are due back onto the delivery queue atomically
+PROMOTE_RETRIES_SCRIPT = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+if #due > 0 then
+    redis.call('ZREM', KEYS[1], unpack(due))
+    redis.call('RPUSH', KEYS[2], unpack(due))
+end
+return #due
+"""
+
+
+class WebhookDispatcher:
+    """Drains the webhook queue and delivers batched events per endpoint"""
+
+    def __init__(self, concurrency=WEBHOOK_CONCURRENCY):
+        self.concurrency = concurrency
+        self.redis = get_redis()
+        self.promote_retries = self.redis.register_script(PROMOTE_RETRIES_SCRIPT)
+        self.executor = ThreadPoolExecutor(max_workers=concurrency)
+        self.waiting = defaultdict(deque)  # url -> drained events not yet handed to a delivery thread
+        self.in_flight = {}  # future -> (url, batch)
+        self.busy = defaultdict(int)  # url -> batches in flight
+        self.pending = 0  # Events waiting or in flight
+
+        # Keep-alive connections shared by all delivery threads
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({
+            'Content-Type': 'application/json',
+            'User-Agent': 'SESPCLSwitch-Webhooks/1.0'
+        })
+
+    def drain(self, block_timeout=1, limit=WEBHOOK_DRAIN_SIZE):
+        """Pull up to limit queued events, waiting up to block_timeout seconds for the first one if any"""
+        head = []
+        if block_timeout:
+            first = self.redis.blpop(WEBHOOK_QUEUE, timeout=block_timeout)
+            if not first:
+                return []
+            head, limit = [first[1]], limit - 1
+        # LRANGE 0 -1 would read the whole list, so stop once the limit is used up
+        if limit <= 0:
+            return [json.loads(item) for item in head]
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.lrange(WEBHOOK_QUEUE, 0, limit - 1)
+        pipe.ltrim(WEBHOOK_QUEUE, limit, -1)
+        rest, _ = pipe.execute()
+        return [json.loads(item) for item in [*head, *rest]]
+
+    def deliver(self, url, items):
+        """POST one batch of events to url. Returns the items that should be retried"""
+        # The URL was checked when submitted; its host may resolve elsewhere by now
+        host_error = check_callback_host(urlparse(url).hostname)
+        if host_error:
+            logger.error(f"Dropping {len(items)} webhook events for {url}: {host_error}")
+            self.redis.lpush(WEBHOOK_DEAD, *(json.dumps(item) for item in items))
+            return []
+        try:
+            response = self.session.post(
+                url,
+                data=json.dumps({"events": [item['event'] for item in items]}),
+                timeout=WEBHOOK_TIMEOUT,
+                allow_redirects=False  # A redirect could point anywhere, including internal addresses
+            )
+            if response.status_code < 300:
+                return []
+            logger.warning(f"Webhook {url} responded {response.status_code} for {len(items)} events")
+        except requests.RequestException as e:
+            logger.warning(f"Webhook {url} delivery failed for {len(items)} events: {str(e)}")
+        return items
+
+    def schedule_retries(self, items):
+        """Schedule failed items with exponential backoff, dropping those out of attempts"""
+        if not items:
+            return
+        now = time.time()
+        pipe = self.redis.pipeline(transaction=False)
+        for item in items:
+            item['attempt'] += 1
+            if item['attempt'] >= WEBHOOK_MAX_ATTEMPTS:
+                logger.error(f"Giving up on webhook event for call {item['event'].get('call_id')} to {item['url']}")
+                pipe.lpush(WEBHOOK_DEAD, json.dumps(item))
+                continue
+            delay = WEBHOOK_RETRY_BASE_DELAY * (2 ** (item['attempt'] - 1))
+            pipe.zadd(WEBHOOK_RETRY, {json.dumps(item): now + delay})
+        pipe.ltrim(WEBHOOK_DEAD, 0, WEBHOOK_DEAD_MAX - 1)
+        pipe.execute()
+
+    def dispatch(self):
+        """Hand waiting events to delivery threads in batches, up to each endpoint's concurrency"""
+        for url in list(self.waiting):
+            queue = self.waiting[url]
+            while queue and self.busy[url] < WEBHOOK_ENDPOINT_CONCURRENCY:
+                batch = [queue.popleft() for _ in range(min(WEBHOOK_BATCH_SIZE, len(queue)))]
+                self.in_flight[self.executor.submit(self.deliver, url, batch)] = (url, batch)
+                self.busy[url] += 1
+            if not queue:
+                del self.waiting[url]
+
+    def collect(self, timeout):
+        """Wait up to timeout for a delivery to finish, then schedule retries for every finished one"""
+        if not self.in_flight:
+            return
+        done, _ = wait(self.in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+        failed = []
+        for future in done:
+            url, batch = self.in_flight.pop(future)
+            self.pending -= len(batch)
+            self.busy[url] -= 1
+            if not self.busy[url]:
+                del self.busy[url]
+            try:
+                failed.extend(future.result())
+            except Exception as e:
+                logger.error(f"Webhook {url} delivery raised for {len(batch)} events: {str(e)}")
+                failed.extend(batch)
+        self.schedule_retries(failed)
+
+    def run_once(self):
+        """Run one drain/dispatch/collect cycle. Returns the number of events drained"""
+        self.promote_retries(keys=[WEBHOOK_RETRY, WEBHOOK_QUEUE], args=[time.time(), WEBHOOK_DRAIN_SIZE])
+        items = []
+        room = WEBHOOK_MAX_PENDING - self.pending
+        if room > 0:
+            # Only block for new events when there is nothing else to do
+            items = self.drain(block_timeout=0 if self.in_flight else 1, limit=min(room, WEBHOOK_DRAIN_SIZE))
+        # Coalesce events per endpoint
+        for item in items:
+            self.waiting[item['url']].append(item)
+        self.pending += len(items)
+        self.dispatch()
+        # Wake up when any delivery finishes, or shortly to drain new events; only
+        # wait for a delivery when too many events are held to drain more
+        self.collect(timeout=None if room <= 0 else 0.1)
+        return len(items)
+
+    def run(self):
+        """Deliver webhooks forever"""
+        logger.info(f"Webhook worker started (concurrency {self.concurrency})")
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Webhook worker cycle failed: {str(e)}")
+                time.sleep(1)
+
+
+if __name__ == '__main__':
+    WebhookDispatcher().run()
@@ -0,0 +1,92 @@
+"""
+Status Callback Webhooks
+Producer side of webhook delivery: status events are queued in Redis and
+delivered in batches by webhook_worker.py
+"""
+import ipaddress
+import json
+import os
+import socket
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlparse
+
+WEBHOOK_QUEUE = 'webhook:queue'
+WEBHOOK_RETRY = 'webhook:retry'  # Sorted set scored by next attempt time
+WEBHOOK_DEAD = 'webhook:dead'  # Capped list of undeliverable events
+WEBHOOK_URL_MAX_LENGTH = 500  # Matches Call.status_callback_url
+# Callbacks to loopback, private, link-local (cloud metadata) and other
+# non-public addresses are refused unless explicitly allowed
+WEBHOOK_ALLOW_PRIVATE_ADDRESSES = os.getenv('WEBHOOK_ALLOW_PRIVATE_ADDRESSES', 'false').lower() == 'true'
+WEBHOOK_HOST_CACHE_TTL = 60  # Seconds a host's check is reused when validating submitted URLs
+WEBHOOK_HOST_CACHE_MAX = 10000
+
+WEBHOOK_EVENT_FIELDS = [
+    'id', 'campaign_id', 'status', 'to_number', 'from_number',
+    'created_at', 'started_at', 'completed_at', 'error_message', 'duration'
+]
+
+
+_host_checks = {}  # host -> (checked at, error or None)
+_host_checks_lock = threading.Lock()
+
+
+def check_callback_host(host):
+    """
+    Resolve host and return an error message if any of its addresses is not
+    a public one, or None. Checked when a URL is submitted and again before
+    every delivery, as DNS may have changed in between.
+    """
+    if WEBHOOK_ALLOW_PRIVATE_ADDRESSES:
+        return None
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, None, proto=socket.IPPROTO_TCP)}
+    except (socket.gaierror, UnicodeError):
+        return f"StatusCallbackUrl host {host} does not resolve"
+    for address in addresses:
+        if not ipaddress.ip_address(address.split('%')[0]).is_global:  # Drop an IPv6 zone
+            return f"StatusCallbackUrl host {host} resolves to a non-public address"
+    return None
+
+
+def _cached_host_check(host):
+    now = time.monotonic()
+    cached = _host_checks.get(host)
+    if cached and now - cached[0] < WEBHOOK_HOST_CACHE_TTL:
+        return cached[1]
+    error = check_callback_host(host)
+    with _host_checks_lock:
+        if len(_host_checks) >= WEBHOOK_HOST_CACHE_MAX:
+            _host_checks.clear()
+        _host_checks[host] = (now, error)
+    return error
+
+
+def validate_callback_url(url):
+    """Return an error message for an unusable callback URL, or None"""
+    if not isinstance(url, str) or len(url) > WEBHOOK_URL_MAX_LENGTH:
+        return f"StatusCallbackUrl must be a string of at most {WEBHOOK_URL_MAX_LENGTH} characters"
+    parsed = urlparse(url)
+    try:
+        host = parsed.hostname
+        parsed.port  # Raises for a port out of range
+    except ValueError:
+        host = None
+    if parsed.scheme not in ('http', 'https') or not host:
+        return "StatusCallbackUrl must be an absolute http(s) URL"
+    return _cached_host_check(host)
+
+
+def build_status_event(call_data):
+    """Build the webhook payload for a call status transition from Call.to_dict()"""
+    event = {field: call_data.get(field) for field in WEBHOOK_EVENT_FIELDS}
+    event['call_id'] = str(event.pop('id'))
+    event['event'] = 'call.status'
+    event['timestamp'] = datetime.utcnow().isoformat()
+    return event
+
+
+def enqueue_webhook_event(url, event, pipe):
+    """Queue an event for delivery to url on a Redis pipeline"""
+    pipe.rpush(WEBHOOK_QUEUE, json.dumps({"url": url, "event": event, "attempt": 0}))